@@ -0,0 +1,26 @@
+"""
+Xác thực các endpoint / tính năng chỉ dành cho admin (profiling, debug bộ nhớ).
+
+ADMIN_TOKEN để trống => tắt toàn bộ tính năng admin.
+"""
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependency: yêu cầu header X-Admin-Token đúng."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
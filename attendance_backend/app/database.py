@@ -1,12 +1,18 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables (trước khi import module đọc env lúc import, vd app.sql_logging)
 load_dotenv()
 
+from app.sql_logging import install_sql_logging  # noqa: E402
+from services.metrics import db_pool_checkout_seconds  # noqa: E402
+
 # Lấy thông tin database từ .env
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
@@ -14,17 +20,60 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_NAME = os.getenv("DB_NAME", "attendance_db")
 
-# Tạo database URL
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Tạo database URL (DATABASE_URL ghi đè toàn bộ, vd DB giả lập SQLite của benchmarks/loadtest.py)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # Xuất DB_URL cho database_service sử dụng
 DB_URL = DATABASE_URL
 
-# Tạo engine
-engine = create_engine(DB_URL)
+# Read replica (tùy chọn) cho report / thống kê; để trống = dùng chung DB chính
+DB_READ_URL = os.getenv("DB_READ_URL", "")
+
+# Cấu hình pool dùng chung cho mọi engine (mỗi worker chỉ giữ 1 pool / DB)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool ghi lại thời gian chờ lấy kết nối (metric db_pool_checkout_seconds)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - started)
+
+
+def pool_options(url: str, is_async: bool = False) -> dict:
+    """Tham số pool theo env (SQLite dùng pool mặc định, async engine dùng pool async mặc định)."""
+    if url.startswith("sqlite"):
+        return {}
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+    if not is_async:
+        options["poolclass"] = TimedQueuePool
+    return options
+
+
+# Engine ghi (DB chính) - dùng chung cho db_service, session_router, script
+engine = create_engine(DB_URL, **pool_options(DB_URL))
+install_sql_logging(engine)
+
+# Engine đọc: replica nếu có, không thì chính là engine ghi
+read_engine = create_engine(DB_READ_URL, **pool_options(DB_READ_URL)) if DB_READ_URL else engine
+install_sql_logging(read_engine)
 
 # Tạo SessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Tạo Base cho models
 Base = declarative_base()
@@ -35,4 +84,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency cho query chỉ đọc chấp nhận trễ replica (report, thống kê)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -4,9 +4,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 
-from app.database import engine
+from app.database import engine, SessionLocal
 from models.session_class_model import SessionClass
-from routers import student_router, class_router, session_router, face_router, attendance_router
+from services.memory_debug import memory_tracer
+from services.request_profiler import request_profiler
+from routers import student_router, class_router, session_router, face_router, attendance_router, metrics_router, admin_router
 
 app = FastAPI(
     title="Attendance System API",
@@ -23,12 +25,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profiling theo yêu cầu (header X-Profile: <ADMIN_TOKEN>)
+app.middleware("http")(request_profiler)
+# Đo mức tăng bộ nhớ của route face / report
+app.middleware("http")(memory_tracer)
+
 # Include routers
 app.include_router(student_router.router, prefix="/api")
 app.include_router(class_router.router, prefix="/api")
 app.include_router(session_router.router, prefix="/api")
 app.include_router(face_router.router)  # Already has /api prefix
 app.include_router(attendance_router.router)  # Already has /api prefix
+app.include_router(metrics_router.router)  # /metrics cho Prometheus
+app.include_router(admin_router.router)  # Already has /api prefix
 
 
 @app.on_event("startup")
@@ -57,6 +66,83 @@ def ensure_session_classes_table() -> None:
                 )
             )
 
+@app.on_event("startup")
+def ensure_face_encodings_table_exists() -> None:
+    """Tạo bảng face_encodings (lần đầu sẽ copy encoding từ students sang)."""
+    from services.face_encoding_store import ensure_face_encodings_table
+
+    try:
+        ensure_face_encodings_table(engine)
+    except OperationalError as exc:
+        # Schema cũ lỗi FK: gallery vẫn đọc được từ cột students.face_encoding
+        print(f"⚠️  Warning: Cannot create face_encodings table: {exc}")
+
+@app.on_event("startup")
+def ensure_attendance_summary_table_exists() -> None:
+    """Tạo bảng attendance_daily_summary (lần đầu sẽ tính từ attendance)."""
+    from services.attendance_summary import ensure_attendance_summary_table
+
+    try:
+        ensure_attendance_summary_table(engine)
+    except OperationalError as exc:
+        print(f"⚠️  Warning: Cannot create attendance_daily_summary table: {exc}")
+
+@app.on_event("startup")
+def warm_face_gallery() -> None:
+    """Nạp sẵn gallery khuôn mặt (từ shared memory / snapshot trên đĩa / DB)."""
+    from services.face_gallery import face_gallery
+
+    db = SessionLocal()
+    try:
+        face_gallery.ensure_loaded(db)
+    except Exception as exc:
+        # Không chặn server khởi động, request đầu tiên sẽ thử nạp lại
+        print(f"⚠️  Warning: Face gallery warm-up failed: {exc}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_attendance_queue() -> None:
+    """Bật write-behind điểm danh nếu ATTENDANCE_WRITE_BEHIND=1 (nạp lại spool còn sót)."""
+    from services.attendance_queue import ATTENDANCE_WRITE_BEHIND, attendance_queue
+
+    if ATTENDANCE_WRITE_BEHIND:
+        attendance_queue.start()
+
+@app.on_event("startup")
+def start_live_feed() -> None:
+    """Nhiều worker: đọc sự kiện check-in từ file SQLite dùng chung (LIVE_FEED_SQLITE)."""
+    from services.live_feed import live_feed
+
+    live_feed.start()
+
+@app.on_event("shutdown")
+def stop_live_feed() -> None:
+    from services.live_feed import live_feed
+
+    live_feed.stop()
+
+@app.on_event("shutdown")
+def stop_attendance_queue() -> None:
+    """Ghi nốt hàng đợi điểm danh trước khi tắt (DB lỗi thì ghi ra file spool)."""
+    from services.attendance_queue import attendance_queue
+
+    attendance_queue.stop()
+
+@app.on_event("shutdown")
+async def close_async_engine() -> None:
+    """Đóng pool của async engine (nếu DB_ASYNC=1)."""
+    from services.async_database import dispose_async_engine
+
+    await dispose_async_engine()
+
+@app.on_event("shutdown")
+def stop_face_worker_pool() -> None:
+    """Tắt process pool xử lý ảnh hàng loạt (nếu đã tạo)."""
+    from services.face_worker_pool import shutdown_process_pool
+
+    shutdown_process_pool()
+
 @app.get("/")
 async def root():
     return {"message": "Face Recognition Attendance System API v2.0"}
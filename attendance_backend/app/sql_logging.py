@@ -0,0 +1,83 @@
+"""
+Log SQL theo cấu hình (thay cho echo=True).
+
+SQL_LOG_MODE:
+- off: không log
+- slow (mặc định): chỉ log câu chạy lâu hơn SQL_SLOW_MS ms
+- sample: log ngẫu nhiên SQL_LOG_SAMPLE_RATE phần câu lệnh, câu chậm vẫn luôn được log
+- all: log mọi câu (chỉ dùng khi debug)
+Tham số chỉ được log khi SQL_LOG_PARAMS=1 (tránh lộ dữ liệu SV).
+Thời gian đo qua event before/after_cursor_execute của SQLAlchemy.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_LOG_MODE = os.getenv("SQL_LOG_MODE", "slow").lower()
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0.01"))
+SQL_LOG_PARAMS = os.getenv("SQL_LOG_PARAMS", "0").lower() in {"1", "true", "yes"}
+# Cắt câu SQL dài (executemany, IN (...) lớn)
+SQL_LOG_MAX_CHARS = 1000
+
+logger = logging.getLogger("attendance.sql")
+if not logger.handlers:
+    # Giống echo=True: log ra stderr kể cả khi app không cấu hình logging
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [sql] %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_stats_lock = threading.Lock()
+sql_stats = {"statements": 0, "slow": 0, "total_ms": 0.0}
+
+
+def _format(statement: str, parameters, executemany: bool, elapsed_ms: float) -> str:
+    sql = " ".join(statement.split())
+    if len(sql) > SQL_LOG_MAX_CHARS:
+        sql = sql[:SQL_LOG_MAX_CHARS] + "..."
+    message = f"{elapsed_ms:.1f}ms {'[many] ' if executemany else ''}{sql}"
+    if SQL_LOG_PARAMS:
+        message += f" | params={parameters!r}"[: SQL_LOG_MAX_CHARS]
+    return message
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_sql_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    slow = elapsed_ms >= SQL_SLOW_MS
+
+    with _stats_lock:
+        sql_stats["statements"] += 1
+        sql_stats["total_ms"] += elapsed_ms
+        if slow:
+            sql_stats["slow"] += 1
+
+    if slow:
+        logger.warning("🐢 Slow query " + _format(statement, parameters, executemany, elapsed_ms))
+    elif SQL_LOG_MODE == "all" or (SQL_LOG_MODE == "sample" and random.random() < SQL_LOG_SAMPLE_RATE):
+        logger.info(_format(statement, parameters, executemany, elapsed_ms))
+
+
+def install_sql_logging(engine: Engine) -> None:
+    """Gắn event đo thời gian vào engine (bỏ qua nếu SQL_LOG_MODE=off)."""
+    if SQL_LOG_MODE == "off":
+        return
+    target = getattr(engine, "sync_engine", engine)  # AsyncEngine
+    if event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Benchmark pipeline nhận diện (services/face_service.py) và so khớp gallery.
+
+Ảnh test sinh offline, cố định seed: khuôn mặt vẽ (hoặc ảnh mẫu OpenCV nếu có) trên nền nhiễu
+ở 640p / 1080p / 4K, thêm ảnh tương phản thấp để buộc detect_faces chạy các nhánh dự phòng.
+Đo preprocess_image, detect_faces, extract_face_encoding, compare_faces, match gallery 100 / 1k / 10k / 100k.
+
+    python benchmarks/bench_face_pipeline.py                          # chạy, in kết quả
+    python benchmarks/bench_face_pipeline.py --save before-lbp        # lưu benchmarks/baselines/before-lbp.json
+    python benchmarks/bench_face_pipeline.py --compare before-lbp     # so với baseline, exit 1 nếu chậm hơn ngưỡng
+    python benchmarks/bench_face_pipeline.py --gallery-sizes 100,1000 --repeat 5
+
+Chỉ so baseline chạy trên cùng máy (meta ghi CPU, phiên bản numpy / OpenCV).
+Gallery 100k cần ~1.7 GB RAM (4144 float32 / SV).
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from services.face_gallery import GalleryEntry, GalleryPartition, _GallerySnapshot
+from services.face_service import ENCODING_DIM, face_service
+from services.metrics import face_detect_fallback_total
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+RESOLUTIONS = {"640p": (640, 480), "1080p": (1920, 1080), "4k": (3840, 2160)}
+SEED = 20240901
+# Số SV mỗi lớp khi dựng gallery giả (match theo 1 lớp)
+CLASS_SIZE = 40
+
+
+# --- Sinh dữ liệu ---
+
+def _sample_face() -> Optional[np.ndarray]:
+    """Ảnh mẫu OpenCV (nếu cài opencv samples), không có thì vẽ."""
+    path = cv2.samples.findFile("lena.jpg", required=False, silentMode=True) if hasattr(cv2, "samples") else ""
+    return cv2.imread(path) if path else None
+
+
+def _draw_face(size: int, rng: np.random.Generator) -> np.ndarray:
+    face = np.full((size, size, 3), 40, np.uint8)
+    center = (size // 2, size // 2)
+    skin = tuple(int(c) for c in rng.integers(140, 220, 3))
+    cv2.ellipse(face, center, (int(size * 0.38), int(size * 0.48)), 0, 0, 360, skin, -1)
+    for dx in (-1, 1):
+        eye = (center[0] + dx * int(size * 0.16), center[1] - int(size * 0.1))
+        cv2.ellipse(face, eye, (int(size * 0.08), int(size * 0.04)), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(face, eye, int(size * 0.03), (30, 30, 30), -1)
+        brow = (eye[0] - int(size * 0.09), eye[1] - int(size * 0.08))
+        cv2.line(face, brow, (brow[0] + int(size * 0.18), brow[1]), (50, 40, 30), max(size // 40, 1))
+    cv2.line(face, center, (center[0], center[1] + int(size * 0.12)), (100, 80, 70), max(size // 60, 1))
+    cv2.ellipse(face, (center[0], center[1] + int(size * 0.24)), (int(size * 0.12), int(size * 0.04)), 0, 0, 180, (60, 40, 120), -1)
+    return face
+
+
+def make_frame(width: int, height: int, faces: int, rng: np.random.Generator, sample: Optional[np.ndarray]) -> np.ndarray:
+    """Nền nhiễu + vật thể ngẫu nhiên + `faces` khuôn mặt."""
+    img = rng.integers(60, 200, (height, width, 3), dtype=np.uint8)
+    img = cv2.GaussianBlur(img, (0, 0), 3)
+    for _ in range(30):
+        p1 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        p2 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        if rng.random() < 0.5:
+            cv2.rectangle(img, p1, p2, color, -1 if rng.random() < 0.3 else 2)
+        else:
+            cv2.line(img, p1, p2, color, int(rng.integers(1, 6)))
+
+    face_size = max(min(width, height) // 4, 80)
+    for i in range(faces):
+        face = cv2.resize(sample, (face_size, face_size)) if sample is not None else _draw_face(face_size, rng)
+        x = int((i + 0.5) * width / faces - face_size / 2)
+        y = int(rng.integers(0, height - face_size))
+        img[y:y + face_size, x:x + face_size] = face
+    return img
+
+
+def make_low_contrast_frame(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """Ảnh gần như phẳng: primary pass không ra mặt => chạy bilateral + contour."""
+    return (rng.integers(118, 122, (height, width, 3), dtype=np.uint8))
+
+
+def encode_jpeg(img: np.ndarray) -> bytes:
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("Cannot encode JPEG")
+    return buf.tobytes()
+
+
+def make_gallery(size: int, rng: np.random.Generator) -> _GallerySnapshot:
+    # Đặc trưng thật không âm và đã chuẩn hoá => dùng phân phối tương tự
+    matrix = rng.random((size, ENCODING_DIM), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    entries = [
+        GalleryEntry(student_id=f"SV{i:06d}", name=f"Student {i}", email=None, class_id=f"C{i // CLASS_SIZE:05d}")
+        for i in range(size)
+    ]
+    return _GallerySnapshot(entries, matrix)
+
+
+# --- Đo ---
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 4),
+        "mean_ms": round(statistics.fmean(times), 4),
+        "min_ms": round(times[0], 4),
+        "p95_ms": round(times[min(int(len(times) * 0.95), len(times) - 1)], 4),
+        "repeat": repeat,
+    }
+
+
+def _fallback_counts() -> Dict[str, float]:
+    counts = {}
+    for line in face_detect_fallback_total.samples():
+        labels, value = line.rsplit(" ", 1)
+        counts[labels.split('"')[1]] = float(value)
+    return counts
+
+
+def run_benchmarks(repeat: int, warmup: int, gallery_sizes: List[int], resolutions: List[str]) -> Dict[str, Dict]:
+    if face_service is None or face_service.face_cascade is None:
+        raise RuntimeError("Face detection unavailable (Haar cascade not loaded)")
+
+    rng = np.random.default_rng(SEED)
+    sample = _sample_face()
+    results: Dict[str, Dict] = {}
+
+    def record(name: str, fn: Callable[[], object], n: int = repeat, **extra) -> None:
+        results[name] = {**measure(fn, n, warmup), **extra}
+        print(f"  {name:<45} median {results[name]['median_ms']:>10.3f} ms   p95 {results[name]['p95_ms']:>10.3f} ms")
+
+    face_box = None
+    face_img = None
+    for res in resolutions:
+        width, height = RESOLUTIONS[res]
+        print(f"📷 {res} ({width}x{height})")
+        frames = {
+            "faces": make_frame(width, height, 3, rng, sample),
+            "low_contrast": make_low_contrast_frame(width, height, rng),
+        }
+        for kind, frame in frames.items():
+            data = encode_jpeg(frame)
+            record(f"preprocess_image[{res},{kind}]", lambda: face_service.preprocess_image(data), bytes=len(data))
+
+            img = face_service.preprocess_image(data)
+            before = _fallback_counts()
+            detected = face_service.detect_faces(img)
+            after = _fallback_counts()
+            fallbacks = {k: after.get(k, 0) - before.get(k, 0) for k in ("bilateral", "contour")}
+            record(
+                f"detect_faces[{res},{kind}]",
+                lambda: face_service.detect_faces(img),
+                faces=len(detected),
+                fallbacks_per_call=fallbacks,
+            )
+            if detected and face_box is None:
+                face_img, face_box = img, detected[0]
+
+    if face_box is None:
+        # Không phát hiện được mặt nào: dùng vùng giữa ảnh
+        face_img = face_service.preprocess_image(encode_jpeg(make_frame(640, 480, 1, rng, sample)))
+        h, w = face_img.shape[:2]
+        face_box = {"x": w // 3, "y": h // 4, "w": w // 3, "h": w // 3}
+    print("🧬 encode / compare")
+    record("extract_face_encoding", lambda: face_service.extract_face_encoding(face_img, face_box))
+    query = face_service.extract_face_encoding(face_img, face_box)
+    other = rng.random(ENCODING_DIM, dtype=np.float32)
+    record("compare_faces", lambda: face_service.compare_faces(query, other), n=repeat * 20)
+
+    for size in gallery_sizes:
+        print(f"🗂️  gallery {size} (~{size * ENCODING_DIM * 4 / 1024 / 1024:.0f} MB)")
+        snap = make_gallery(size, rng)
+        full = GalleryPartition(snap, [(0, size)], 0)
+        one_class = GalleryPartition(snap, [snap.partitions["C00000"]], 0)
+        record(f"match_full[{size}]", lambda: full.match(query))
+        record(f"match_one_class[{size}]", lambda: one_class.match(query))
+        if size <= 1000:
+            # Cách cũ: compare_faces từng SV (để thấy chênh lệch với bản batch)
+            rows = snap.matrix
+            record(
+                f"compare_faces_loop[{size}]",
+                lambda: [face_service.compare_faces(query, rows[i]) for i in range(size)],
+                n=max(repeat // 4, 3),
+            )
+        del snap, full, one_class
+
+    return results
+
+
+# --- Baseline ---
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _baseline_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, max_regression: float) -> bool:
+    """In % thay đổi median so với baseline; False nếu có bước chậm hơn max_regression %."""
+    ok = True
+    print(f"\n📊 Compare with baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('created_at')})")
+    for name, current in results.items():
+        old = baseline["results"].get(name)
+        if old is None or not old["median_ms"]:
+            continue
+        change = (current["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+        flag = "✅"
+        if change > max_regression:
+            flag, ok = "❌", False
+        elif change < -max_regression:
+            flag = "🚀"
+        print(f"  {flag} {name:<45} {old['median_ms']:>10.3f} → {current['median_ms']:>10.3f} ms ({change:+.1f}%)")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark face pipeline")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--gallery-sizes", default="100,1000,10000,100000")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS))
+    parser.add_argument("--save", help="Tên baseline (lưu vào benchmarks/baselines/<tên>.json) hoặc đường dẫn .json")
+    parser.add_argument("--compare", help="Baseline để so sánh")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Ngưỡng chậm hơn (%%) coi là regression")
+    args = parser.parse_args()
+
+    cv2.setRNGSeed(SEED)
+    results = run_benchmarks(
+        args.repeat,
+        args.warmup,
+        [int(s) for s in args.gallery_sizes.split(",") if s.strip()],
+        [r.strip() for r in args.resolutions.split(",") if r.strip()],
+    )
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "opencv_threads": cv2.getNumThreads(),
+        },
+        "results": results,
+    }
+
+    if args.save:
+        path = _baseline_path(args.save)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Saved baseline to {path}")
+
+    if args.compare:
+        with open(_baseline_path(args.compare), encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Load test HTTP end-to-end: /api/face/recognize, /api/attendance/checkin-by-face, /api/attendance/report.
+
+Mặc định chạy app.main:app (uvicorn, trong process) trên DB giả lập SQLite (benchmarks/sqlite_standin.py)
+với N sinh viên + encoding sinh ngẫu nhiên, rồi bắn request song song bằng httpx.AsyncClient.
+Kết quả: throughput, p50/p95/p99, tỉ lệ lỗi theo endpoint.
+
+    python benchmarks/loadtest.py                                   # 1000 SV, 16 kết nối, 20 giây
+    python benchmarks/loadtest.py --students 20000 --concurrency 64 --duration 60
+    python benchmarks/loadtest.py --mix checkin=1                   # chỉ check-in
+    python benchmarks/loadtest.py --url http://localhost:8000 --session-id 12 --class-id CSE101   # server thật (MySQL)
+    python benchmarks/loadtest.py --json /tmp/run.json
+
+Lưu ý:
+- SQLite ghi tuần tự và không qua mạng: dùng để so sánh tương đối giữa các thay đổi, không thay cho test trên MySQL.
+- Server và client cùng process (chung GIL): với CPU ít, nên chạy server riêng và dùng --url.
+- Cần httpx (pip install httpx).
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+ENDPOINTS = ("recognize", "checkin", "report")
+
+
+# --- Chuẩn bị server + dữ liệu ---
+
+def _make_probe_images(count: int, seed: int) -> List[Tuple[bytes, "object"]]:
+    """Ảnh 1 khuôn mặt (vẽ) + encoding tính bằng đúng pipeline của server; bỏ ảnh không detect được."""
+    import numpy as np
+    from benchmarks.bench_face_pipeline import encode_jpeg, make_frame
+    from services.face_service import face_service
+
+    rng = np.random.default_rng(seed)
+    probes = []
+    attempts = 0
+    while len(probes) < count and attempts < count * 10:
+        attempts += 1
+        data = encode_jpeg(make_frame(640, 480, 1, rng, None))
+        img = face_service.preprocess_image(data)
+        faces = face_service.detect_faces(img) if img is not None else []
+        if len(faces) != 1:
+            continue
+        encoding = face_service.extract_face_encoding(img, faces[0])
+        if encoding is not None:
+            probes.append((data, encoding))
+    if not probes:
+        raise RuntimeError("Cannot generate probe images (face detection unavailable?)")
+    return probes
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def boot_standin_server(args) -> Tuple[str, Dict[str, int], List[Tuple[bytes, str, str]], "object"]:
+    """Tạo DB SQLite, seed dữ liệu, chạy uvicorn ở thread riêng.
+
+    Trả về (base_url, {class_id: session_id}, [(ảnh, student_id, class_id)], server).
+    """
+    db_path = args.db_path or os.path.join(tempfile.gettempdir(), "attendance_loadtest.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SQL_LOG_MODE", "off")
+
+    # Gắn shim trước khi services mở kết nối đầu tiên
+    from app.database import engine
+    from benchmarks.sqlite_standin import create_schema, install_mysql_shim, seed
+
+    install_mysql_shim(engine)
+    create_schema(engine)
+
+    from services.face_service import ENCODING_DIM, FACE_ENCODING_VERSION
+
+    probes = _make_probe_images(args.probes, args.seed)
+    started = time.perf_counter()
+    probe_ids = seed(
+        engine,
+        students=max(args.students, len(probes)),
+        classes=args.classes,
+        probe_encodings=[enc for _, enc in probes],
+        dim=ENCODING_DIM,
+        version=FACE_ENCODING_VERSION,
+        seed_value=args.seed,
+    )
+    print(f"🌱 Seeded {max(args.students, len(probes))} students / {args.classes} classes into {db_path} "
+          f"({time.perf_counter() - started:.1f}s), {len(probes)} probe image(s)")
+
+    from sqlalchemy import bindparam, text
+    with engine.connect() as conn:
+        sessions = {row[1]: row[0] for row in conn.execute(text("SELECT session_id, class_id FROM sessions"))}
+        classes = dict(
+            conn.execute(
+                text("SELECT student_id, class_id FROM students WHERE student_id IN :ids").bindparams(
+                    bindparam("ids", expanding=True)
+                ),
+                {"ids": probe_ids},
+            ).fetchall()
+        )
+
+    import uvicorn
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, name="loadtest-server", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 120
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("Server failed to start")
+        time.sleep(0.1)
+
+    probe_items = [(data, sid, classes[sid]) for (data, _), sid in zip(probes, probe_ids)]
+    return f"http://127.0.0.1:{port}", sessions, probe_items, server
+
+
+# --- Tải ---
+
+def _parse_mix(raw: str) -> Dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run_load(
+    base_url: str,
+    *,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: float,
+    probes: List[Tuple[bytes, str, Optional[str]]],
+    sessions: Dict[str, int],
+    report_class_id: Optional[str],
+    seed: int,
+) -> Dict[str, List[Tuple[float, Optional[int], Optional[str]]]]:
+    """Trả về {endpoint: [(latency_ms, status_code, error)]}."""
+    import httpx
+
+    samples: Dict[str, List[Tuple[float, Optional[int], Optional[str]]]] = defaultdict(list)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    today = date.today().isoformat()
+
+    def build(name: str, rng: random.Random):
+        image, _, class_id = rng.choice(probes)
+        files = {"file": ("probe.jpg", image, "image/jpeg")}
+        if name == "recognize":
+            return "POST", "/api/face/recognize", {"files": files}
+        if name == "checkin":
+            data = {}
+            if class_id is not None and class_id in sessions:
+                data["session_id"] = str(sessions[class_id])
+            return "POST", "/api/attendance/checkin-by-face", {"files": files, "data": data}
+        class_id = report_class_id or class_id
+        if class_id is not None and class_id in sessions:
+            return "GET", "/api/attendance/report", {"params": {"session_id": sessions[class_id]}}
+        return "GET", "/api/attendance/report", {"params": {"date": today, **({"class_id": class_id} if class_id else {})}}
+
+    async def worker(worker_id: int, client: "httpx.AsyncClient", stop_at: float) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            method, path, kwargs = build(name, rng)
+            started = time.perf_counter()
+            status, error = None, None
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+                if status >= 400:
+                    error = f"HTTP {status}: {response.text[:120]}"
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+            samples[name].append(((time.perf_counter() - started) * 1000, status, error))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        # Warm-up: mỗi endpoint 1 request (không tính)
+        for name in names:
+            method, path, kwargs = build(name, random.Random(seed))
+            await client.request(method, path, **kwargs)
+        stop_at = time.perf_counter() + duration
+        await asyncio.gather(*(worker(i, client, stop_at) for i in range(concurrency)))
+    return samples
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, len(sorted_values) - 1)
+    return sorted_values[max(index, 0)]
+
+
+def summarize(samples: Dict[str, List[Tuple[float, Optional[int], Optional[str]]]], duration: float) -> Dict[str, Dict]:
+    summary = {}
+    for name, rows in samples.items():
+        latencies = sorted(r[0] for r in rows)
+        errors = [r[2] for r in rows if r[2]]
+        error_kinds: Dict[str, int] = defaultdict(int)
+        for err in errors:
+            error_kinds[err.split(":")[0]] += 1
+        summary[name] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / duration, 2),
+            "error_rate": round(len(errors) / len(rows), 4) if rows else 0.0,
+            "errors": dict(error_kinds),
+            "first_error": errors[0] if errors else None,
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "p99_ms": round(_percentile(latencies, 99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict], duration: float) -> None:
+    print(f"\n📊 Results ({duration:.0f}s)")
+    print(f"  {'endpoint':<10} {'req':>7} {'req/s':>8} {'err%':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, s in summary.items():
+        print(
+            f"  {name:<10} {s['requests']:>7} {s['throughput_rps']:>8.1f} {s['error_rate'] * 100:>6.1f}% "
+            f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}"
+        )
+    for name, s in summary.items():
+        if s["first_error"]:
+            print(f"  ⚠️  {name}: {s['errors']} - first: {s['first_error']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HTTP load test")
+    parser.add_argument("--url", help="Server đang chạy (bỏ qua DB giả lập); cần tự có SV đã enroll")
+    parser.add_argument("--session-id", type=int, help="Với --url: session dùng cho check-in / report")
+    parser.add_argument("--class-id", help="Với --url: lớp của session")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--classes", type=int, default=20)
+    parser.add_argument("--probes", type=int, default=20, help="Số ảnh khuôn mặt khác nhau gửi lên")
+    parser.add_argument("--db-path", help="File SQLite (mặc định trong thư mục tạm, tạo lại mỗi lần chạy)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--mix", default="recognize=1,checkin=2,report=1")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    mix = _parse_mix(args.mix)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server = None
+    if args.url:
+        # Server thật: ảnh probe vẫn sinh offline, kết quả nhận diện tuỳ dữ liệu đã enroll
+        probes = [(data, "", args.class_id) for data, _ in _make_probe_images(args.probes, args.seed)]
+        sessions = {args.class_id: args.session_id} if args.class_id and args.session_id else {}
+        base_url = args.url.rstrip("/")
+    else:
+        base_url, sessions, probes, server = boot_standin_server(args)
+
+    print(f"🚀 {args.concurrency} connection(s) x {args.duration:.0f}s against {base_url} (mix {mix})")
+    try:
+        samples = asyncio.run(
+            run_load(
+                base_url,
+                mix=mix,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                probes=probes,
+                sessions=sessions,
+                report_class_id=args.class_id,
+                seed=args.seed,
+            )
+        )
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    summary = summarize(samples, args.duration)
+    print_summary(summary, args.duration)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"args": vars(args), "database": "external" if args.url else "sqlite-standin", "results": summary},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        print(f"💾 Saved to {args.json}")
+    return 1 if any(s["error_rate"] > 0 for s in summary.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
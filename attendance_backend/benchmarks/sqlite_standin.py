@@ -0,0 +1,184 @@
+"""
+DB giả lập SQLite cho load test (không dùng cho production).
+
+Code trong routers/services viết cho MySQL (SHOW COLUMNS, ON DUPLICATE KEY UPDATE, TIMESTAMP(), INTERVAL...).
+Module này gắn vào engine SQLite:
+- hàm MySQL đăng ký bằng create_function (TIMESTAMP, GREATEST, NOW, TIMESTAMPDIFF, ADD_MINUTES);
+- event before_cursor_execute viết lại các cú pháp còn lại sang SQLite.
+Chỉ phủ các câu mà các endpoint load test chạy tới (schema attendance_date + attendance_time).
+Độ trễ DB đo được chỉ mang tính tương đối: SQLite ghi tuần tự, không có pool / mạng như MySQL.
+"""
+import re
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+# Adapter tường minh (text() truyền nguyên đối tượng Python xuống sqlite3)
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(time, lambda v: v.isoformat())
+
+_REWRITES = [
+    (re.compile(r"SHOW\s+COLUMNS\s+FROM\s+(\w+)", re.I), r"SELECT name AS Field, type AS Type FROM pragma_table_info('\1')"),
+    (
+        re.compile(r"SHOW\s+INDEX\s+FROM\s+(\w+)", re.I),
+        r"SELECT il.name AS Key_name, NOT il.[unique] AS Non_unique, ii.name AS Column_name, ii.seqno + 1 AS Seq_in_index "
+        r"FROM pragma_index_list('\1') il, pragma_index_info(il.name) ii ORDER BY il.name, ii.seqno",
+    ),
+    (re.compile(r"SHOW\s+TABLES", re.I), "SELECT name FROM sqlite_master WHERE type = 'table'"),
+    (re.compile(r"\bFOR\s+UPDATE\b", re.I), ""),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"\bDIV\b", re.I), "/"),
+    (re.compile(r"\bLAST_INSERT_ID\(\)", re.I), "last_insert_rowid()"),
+    (re.compile(r"TIMESTAMPDIFF\(\s*SECOND\s*,", re.I), "TIMESTAMPDIFF('SECOND',"),
+    (re.compile(r"TIMESTAMP\(([^()]*)\)\s*\+\s*INTERVAL\s+(\S+)\s+MINUTE", re.I), r"ADD_MINUTES(TIMESTAMP(\1), \2)"),
+]
+
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_ts(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.fromisoformat(str(value))
+
+
+def _timestamp(day, clock=None) -> Optional[str]:
+    if day is None:
+        return None
+    if clock is None:
+        return _parse_ts(day).strftime(_TS_FORMAT)
+    return f"{str(day)[:10]} {str(clock)[:8]}"
+
+
+def _add_minutes(ts, minutes) -> Optional[str]:
+    if ts is None:
+        return None
+    return (_parse_ts(ts) + timedelta(minutes=float(minutes))).strftime(_TS_FORMAT)
+
+
+def _timestampdiff(unit, start, end) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    seconds = (_parse_ts(end) - _parse_ts(start)).total_seconds()
+    return int(seconds) if unit.upper() == "SECOND" else int(seconds // 60)
+
+
+def _rewrite(conn, cursor, statement, parameters, context, executemany):
+    for pattern, replacement in _REWRITES:
+        statement = pattern.sub(replacement, statement)
+    return statement, parameters
+
+
+def _on_connect(dbapi_conn, _):
+    dbapi_conn.create_function("TIMESTAMP", -1, _timestamp, deterministic=True)
+    dbapi_conn.create_function("ADD_MINUTES", 2, _add_minutes, deterministic=True)
+    dbapi_conn.create_function("TIMESTAMPDIFF", 3, _timestampdiff, deterministic=True)
+    dbapi_conn.create_function("GREATEST", -1, lambda *args: max(args), deterministic=True)
+    dbapi_conn.create_function("NOW", 0, lambda: datetime.now().strftime(_TS_FORMAT))
+    # Nhiều request ghi song song: chờ khoá thay vì lỗi ngay
+    dbapi_conn.execute("PRAGMA journal_mode=WAL")
+    dbapi_conn.execute("PRAGMA busy_timeout=30000")
+    dbapi_conn.execute("PRAGMA synchronous=NORMAL")
+
+
+def install_mysql_shim(engine: Engine) -> None:
+    """Gắn các hàm / rewrite MySQL vào engine SQLite (gọi trước khi mở kết nối đầu tiên)."""
+    event.listen(engine, "connect", _on_connect)
+    event.listen(engine, "before_cursor_execute", _rewrite, retval=True)
+
+
+def create_schema(engine: Engine) -> None:
+    """Tạo bảng từ models + unique key như setup_database.py (cần cho upsert)."""
+    from app.database import Base
+    import models.attendance_model  # noqa: F401 - đăng ký bảng vào Base.metadata
+    import models.attendance_summary_model  # noqa: F401
+    import models.class_model  # noqa: F401
+    import models.face_encoding_model  # noqa: F401
+    import models.session_class_model  # noqa: F401
+    import models.session_model  # noqa: F401
+    import models.student  # noqa: F401
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_student_class_date "
+                "ON attendance (student_id, class_id, attendance_date)"
+            )
+        )
+
+
+def seed(
+    engine: Engine,
+    *,
+    students: int,
+    classes: int,
+    probe_encodings: List[np.ndarray],
+    dim: int,
+    version: str,
+    seed_value: int = 0,
+) -> List[str]:
+    """Sinh lớp, SV, encoding và 1 buổi học hôm nay cho mỗi lớp.
+
+    probe_encodings[i] được gán cho SV thứ i (ảnh probe tương ứng sẽ nhận diện ra SV đó);
+    SV còn lại có encoding ngẫu nhiên. Trả về student_id của các SV probe.
+    """
+    rng = np.random.default_rng(seed_value)
+    now = datetime.now()
+    class_ids = [f"LT{i:04d}" for i in range(classes)]
+    student_rows = []
+    encoding_rows = []
+    probe_ids = []
+    for i in range(students):
+        student_id = f"SV{i:07d}"
+        if i < len(probe_encodings):
+            vector = probe_encodings[i].astype(np.float32)
+            probe_ids.append(student_id)
+        else:
+            vector = rng.random(dim, dtype=np.float32)
+            vector /= np.linalg.norm(vector)
+        student_rows.append(
+            {
+                "student_id": student_id,
+                "name": f"Student {i}",
+                "email": f"sv{i}@example.edu",
+                "class_id": class_ids[i % classes],
+                "face_encoding": vector.tobytes(),
+                "version": version,
+                "now": now,
+            }
+        )
+        encoding_rows.append({"student_id": student_id, "version": version, "dim": dim, "vector": vector.tobytes(), "now": now})
+
+    start = (now - timedelta(minutes=5)).time().replace(microsecond=0)
+    end = (now + timedelta(hours=2)).time().replace(microsecond=0)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO classes (class_id, class_name, subject_name, lecturer_name) VALUES (:c, :c, 'Load test', 'N/A')"),
+            [{"c": c} for c in class_ids],
+        )
+        conn.execute(
+            text(
+                "INSERT INTO students (student_id, name, email, class_id, face_encoding, face_encoding_version, created_at, updated_at) "
+                "VALUES (:student_id, :name, :email, :class_id, :face_encoding, :version, :now, :now)"
+            ),
+            student_rows,
+        )
+        conn.execute(
+            text("INSERT INTO face_encodings (student_id, version, dim, vector, created_at) VALUES (:student_id, :version, :dim, :vector, :now)"),
+            encoding_rows,
+        )
+        conn.execute(
+            text("INSERT INTO sessions (class_id, session_date, start_time, end_time) VALUES (:c, :d, :s, :e)"),
+            [{"c": c, "d": now.date(), "s": start, "e": end} for c in class_ids],
+        )
+        conn.execute(text("INSERT INTO session_classes (session_id, class_id) SELECT session_id, class_id FROM sessions"))
+    return probe_ids
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 """
 Script để kiểm tra schema của bảng students
+
+    python check_schema.py            # schema + dữ liệu mẫu bảng students
+    python check_schema.py --explain  # EXPLAIN các query nóng của attendance
 """
 
 import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
+from datetime import date, timedelta
 from sqlalchemy import text
 from app.database import SessionLocal, engine
 
@@ -56,5 +60,105 @@ def check_students_schema():
     finally:
         db.close()
 
+def _hot_queries(columns, sample):
+    """Các query nóng trong attendance_router theo schema attendance hiện có"""
+    day = sample["day"]
+    queries = []
+    if "checkin_time" in columns:
+        queries.append((
+            "Dedupe check-in theo ngày",
+            "SELECT attendance_id FROM attendance WHERE student_id = :student_id "
+            "AND checkin_time >= :day_start AND checkin_time < :day_end LIMIT 1",
+            {"student_id": sample["student_id"], "day_start": day, "day_end": day + timedelta(days=1)},
+        ))
+        queries.append((
+            "Report theo ngày",
+            "SELECT a.attendance_id FROM attendance a LEFT JOIN students s ON s.student_id = a.student_id "
+            "WHERE a.checkin_time >= :day_start AND a.checkin_time < :day_end ORDER BY a.checkin_time DESC",
+            {"day_start": day, "day_end": day + timedelta(days=1)},
+        ))
+    if "session_id" in columns:
+        queries.append((
+            "Dedupe check-in theo session",
+            "SELECT attendance_id FROM attendance WHERE student_id = :student_id AND session_id = :session_id LIMIT 1",
+            {"student_id": sample["student_id"], "session_id": sample["session_id"]},
+        ))
+        queries.append((
+            "SV đã điểm danh của session",
+            "SELECT student_id, status FROM attendance WHERE session_id = :session_id",
+            {"session_id": sample["session_id"]},
+        ))
+    if "attendance_date" in columns and "class_id" in columns:
+        queries.append((
+            "Upsert theo (SV, lớp, ngày)",
+            "SELECT status FROM attendance WHERE student_id = :student_id "
+            "AND class_id = :class_id AND attendance_date = :day",
+            {"student_id": sample["student_id"], "class_id": sample["class_id"], "day": day},
+        ))
+        queries.append((
+            "Report theo lớp + ngày",
+            "SELECT a.id FROM attendance a LEFT JOIN students s ON s.student_id = a.student_id "
+            "WHERE a.attendance_date = :day AND a.class_id = :class_id "
+            "ORDER BY a.attendance_date DESC, a.attendance_time DESC",
+            {"class_id": sample["class_id"], "day": day},
+        ))
+        queries.append((
+            "Report theo session (roster LEFT JOIN attendance)",
+            "SELECT st.student_id, a.id FROM students st "
+            "LEFT JOIN attendance a ON a.student_id = st.student_id AND a.class_id = st.class_id "
+            "AND a.attendance_date = :day WHERE st.class_id IN (:class_id)",
+            {"class_id": sample["class_id"], "day": day},
+        ))
+    return queries
+
+
+def explain_hot_queries():
+    """Chạy EXPLAIN cho các query nóng và cảnh báo full scan"""
+    db = SessionLocal()
+    try:
+        columns = {row[0] for row in db.execute(text("SHOW COLUMNS FROM attendance")).fetchall()}
+
+        # Lấy giá trị mẫu thật (nếu có) để optimizer ước lượng sát thực tế
+        sample = {"student_id": "SV001", "class_id": "20DTHE4", "session_id": 1, "day": date.today()}
+        row = db.execute(text("SELECT student_id, class_id FROM students LIMIT 1")).fetchone()
+        if row:
+            sample["student_id"], sample["class_id"] = row[0], row[1]
+        row = db.execute(text("SELECT session_id, session_date FROM sessions ORDER BY session_id DESC LIMIT 1")).fetchone()
+        if row:
+            sample["session_id"], sample["day"] = row[0], row[1] or sample["day"]
+
+        print("=== EXPLAIN CÁC QUERY NÓNG (attendance) ===")
+        warnings = 0
+        for title, sql, params in _hot_queries(columns, sample):
+            result = db.execute(text("EXPLAIN " + sql), params)
+            keys = list(result.keys())
+            print(f"\n▶ {title}")
+            for plan_row in result.fetchall():
+                plan = dict(zip(keys, plan_row))
+                access = plan.get("type")
+                flag = "✅"
+                if access == "ALL":
+                    flag, warnings = "❌ FULL SCAN", warnings + 1
+                elif access == "index":
+                    flag, warnings = "⚠️  FULL INDEX SCAN", warnings + 1
+                print(
+                    f"  {flag:<18} table={plan.get('table')} type={access} key={plan.get('key')} "
+                    f"rows={plan.get('rows')} extra={plan.get('Extra')}"
+                )
+
+        if warnings:
+            print(f"\n⚠️  {warnings} bước quét toàn bảng/index - chạy migrate_attendance_indexes.py")
+            print("   (bảng rất nhỏ thì optimizer vẫn có thể chọn ALL)")
+        else:
+            print("\n✅ Tất cả query nóng đều dùng index")
+
+    except Exception as e:
+        print(f"❌ Lỗi khi EXPLAIN: {e}")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    check_students_schema()
+    if "--explain" in sys.argv[1:]:
+        explain_hot_queries()
+    else:
+        check_students_schema()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Sinh dữ liệu giả lập quy mô lớn để đo index / report / gallery (KHÔNG chạy trên DB production).
+
+Tạo lớp, SV (kèm encoding), buổi học cả học kỳ (một phần học chung 2 lớp qua session_classes)
+và điểm danh cho từng SV từng buổi. Ghi theo lô bằng executemany (pymysql gộp thành INSERT nhiều dòng).
+Tự nhận 2 schema attendance: attendance_date/attendance_time (present/late) hoặc checkin_time/session_id (ON_TIME/LATE).
+Mọi mã sinh ra đều bắt đầu bằng --prefix, chạy lại với --reset để xoá bộ dữ liệu cũ cùng prefix.
+
+    python generate_scale_data.py                                     # 200 lớp, 100k SV, 15 tuần x 2 buổi (~2.5M điểm danh)
+    python generate_scale_data.py --students 10000 --classes 40 --weeks 4 --reset
+    python generate_scale_data.py --encodings synthetic               # encoding từ ảnh khuôn mặt vẽ + nhiễu
+    python generate_scale_data.py --encodings none --weeks 30         # chỉ đo attendance / report
+
+Sau khi chạy: python migrate_attendance_indexes.py, python check_schema.py --explain
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from app.database import DB_URL
+from services.attendance_summary import rebuild_attendance_summary
+from services.face_encoding_store import ensure_face_encodings_table
+from services.face_service import ENCODING_DIM, FACE_ENCODING_VERSION
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Giờ bắt đầu các ca học (mỗi cặp lớp 1 ca), mỗi buổi 2 tiếng
+SLOT_STARTS = [time(7, 0), time(9, 30), time(12, 30), time(15, 0), time(17, 30)]
+SESSION_HOURS = 2
+
+
+def _table_columns(conn, table: str) -> set:
+    return {row[0] for row in conn.execute(text(f"SHOW COLUMNS FROM {table}")).fetchall()}
+
+
+def _insert_many(conn, table: str, rows: List[Dict[str, Any]], batch: int) -> None:
+    """INSERT theo lô (executemany)."""
+    if not rows:
+        return
+    fields = list(rows[0])
+    sql = text(f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join(':' + f for f in fields)})")
+    for i in range(0, len(rows), batch):
+        conn.execute(sql, rows[i : i + batch])
+
+
+def reset_generated(engine, prefix: str) -> None:
+    """Xoá dữ liệu sinh trước đó (theo prefix) - con trước, cha sau."""
+    like = {"like": f"{prefix}%"}
+    with engine.begin() as conn:
+        att_cols = _table_columns(conn, "attendance")
+        statements = ["DELETE FROM attendance WHERE student_id LIKE :like"]
+        if "session_id" in att_cols:
+            statements.append(
+                "DELETE FROM attendance WHERE session_id IN (SELECT session_id FROM sessions WHERE class_id LIKE :like)"
+            )
+        statements += [
+            "DELETE FROM session_classes WHERE class_id LIKE :like",
+            "DELETE FROM sessions WHERE class_id LIKE :like",
+            "DELETE FROM face_encodings WHERE student_id LIKE :like",
+            "DELETE FROM students WHERE student_id LIKE :like",
+            "DELETE FROM attendance_daily_summary WHERE class_id LIKE :like",
+            "DELETE FROM classes WHERE class_id LIKE :like",
+        ]
+        for sql in statements:
+            try:
+                deleted = conn.execute(text(sql), like).rowcount
+                logger.info(f"🧹 {sql.split(' WHERE ')[0]}: {deleted} row(s)")
+            except Exception as e:
+                # Bảng tùy chọn (face_encodings, summary) có thể chưa có
+                logger.warning(f"⚠️  Skip: {sql.split(' WHERE ')[0]} ({e.__class__.__name__})")
+
+
+def _synthetic_encodings(count: int, rng: np.random.Generator) -> np.ndarray:
+    """count encoding gốc tính bằng đúng pipeline nhận diện từ ảnh khuôn mặt vẽ."""
+    from benchmarks.bench_face_pipeline import encode_jpeg, make_frame
+    from services.face_service import face_service
+
+    base: List[np.ndarray] = []
+    attempts = 0
+    while len(base) < count and attempts < count * 10:
+        attempts += 1
+        img = face_service.preprocess_image(encode_jpeg(make_frame(640, 480, 1, rng, None)))
+        faces = face_service.detect_faces(img) if img is not None else []
+        if len(faces) == 1:
+            encoding = face_service.extract_face_encoding(img, faces[0])
+            if encoding is not None:
+                base.append(encoding.astype(np.float32))
+    if not base:
+        raise RuntimeError("Face detection unavailable, use --encodings random")
+    return np.stack(base)
+
+
+def _student_vectors(args, count: int, base: Optional[np.ndarray], rng: np.random.Generator) -> np.ndarray:
+    if base is None:
+        vectors = rng.random((count, ENCODING_DIM), dtype=np.float32)
+    else:
+        # Mỗi SV = 1 khuôn mặt gốc + nhiễu nhỏ (giống nhiều người có nét gần nhau)
+        vectors = base[rng.integers(0, len(base), count)] + rng.normal(0, args.noise, (count, ENCODING_DIM)).astype(
+            np.float32
+        )
+        np.clip(vectors, 0, None, out=vectors)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-7
+    return vectors
+
+
+def generate_students(engine, args, class_ids: List[str], rng: np.random.Generator) -> List[Tuple[str, str]]:
+    """Tạo SV (chia đều các lớp) kèm encoding ngay trong câu INSERT. Trả về [(student_id, class_id)].
+
+    students.face_encoding và face_encodings đều ghi bằng INSERT nhiều dòng (không UPDATE từng SV).
+    """
+    students = [(f"{args.prefix}{i:0{max(len(str(args.students)), 6)}d}", class_ids[i % len(class_ids)]) for i in range(args.students)]
+
+    with_encodings = args.encodings != "none"
+    base = None
+    batch = args.batch
+    if with_encodings:
+        ensure_face_encodings_table(engine)
+        base = _synthetic_encodings(args.synthetic_faces, rng) if args.encodings == "synthetic" else None
+        # Vector 16 KB/SV (x2 bảng): lô nhỏ hơn để giới hạn RAM và gói tin (max_allowed_packet)
+        batch = max(args.batch // 10, 100)
+
+    started = time_module.perf_counter()
+    now = datetime.now()
+    for start in range(0, len(students), batch):
+        chunk = students[start : start + batch]
+        rows = [
+            {
+                "student_id": sid,
+                "name": f"Scale Student {start + i}",
+                "email": f"{sid.lower()}@scale.test",
+                "class_id": cid,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i, (sid, cid) in enumerate(chunk)
+        ]
+        encoding_rows: List[Dict[str, Any]] = []
+        if with_encodings:
+            for row, vector in zip(rows, _student_vectors(args, len(chunk), base, rng)):
+                row["face_encoding"] = vector.tobytes()
+                row["face_encoding_version"] = FACE_ENCODING_VERSION
+                encoding_rows.append(
+                    {
+                        "student_id": row["student_id"],
+                        "version": FACE_ENCODING_VERSION,
+                        "dim": ENCODING_DIM,
+                        "vector": row["face_encoding"],
+                        "created_at": now,
+                    }
+                )
+        with engine.begin() as conn:
+            _insert_many(conn, "students", rows, batch)
+            _insert_many(conn, "face_encodings", encoding_rows, batch)
+
+    suffix = f" with {args.encodings} encodings" if with_encodings else ""
+    logger.info(f"✅ Inserted {len(students)} students{suffix} ({time_module.perf_counter() - started:.1f}s)")
+    return students
+
+
+def generate_sessions(engine, args, class_ids: List[str], rng: random.Random) -> Dict[str, List[Tuple[int, date, time]]]:
+    """Buổi học cả kỳ. Lớp chia cặp, mỗi cặp 1 ca cố định; --shared-ratio số buổi 2 lớp học chung.
+
+    Trả về {class_id: [(session_id, ngày, giờ bắt đầu)]}.
+    """
+    semester_start = args.start_date - timedelta(days=args.start_date.weekday())  # Thứ 2
+    sessions: List[Dict[str, Any]] = []
+    links: List[Tuple[int, str]] = []  # (index trong sessions, class_id) cho session_classes
+    for pair in range(0, len(class_ids), 2):
+        pair_classes = class_ids[pair : pair + 2]
+        start_at = SLOT_STARTS[(pair // 2) % len(SLOT_STARTS)]
+        end_at = time(start_at.hour + SESSION_HOURS, start_at.minute)
+        for week in range(args.weeks):
+            for k in range(args.sessions_per_week):
+                # Cùng cặp lớp: các buổi trong tuần khác thứ => không trùng (SV, lớp, ngày)
+                day = semester_start + timedelta(days=week * 7 + ((pair // 2) + k) % 5)
+                shared = len(pair_classes) == 2 and rng.random() < args.shared_ratio
+                owners = [pair_classes[0]] if shared else pair_classes
+                for owner in owners:
+                    sessions.append({"class_id": owner, "session_date": day, "start_time": start_at, "end_time": end_at})
+                    for cid in (pair_classes if shared else [owner]):
+                        links.append((len(sessions) - 1, cid))
+
+    started = time_module.perf_counter()
+    with engine.begin() as conn:
+        _insert_many(conn, "sessions", sessions, args.batch)
+        # executemany không trả id => đọc lại theo (lớp, ngày): mỗi lớp tối đa 1 buổi/ngày
+        ids = {
+            (row[1], str(row[2])): row[0]
+            for row in conn.execute(
+                text("SELECT session_id, class_id, session_date FROM sessions WHERE class_id LIKE :like"),
+                {"like": f"{args.prefix}%"},
+            )
+        }
+        session_ids = [ids[(s["class_id"], str(s["session_date"]))] for s in sessions]
+        _insert_many(
+            conn,
+            "session_classes",
+            [{"session_id": session_ids[idx], "class_id": cid} for idx, cid in links],
+            args.batch,
+        )
+
+    by_class: Dict[str, List[Tuple[int, date, time]]] = {cid: [] for cid in class_ids}
+    for idx, cid in links:
+        by_class[cid].append((session_ids[idx], sessions[idx]["session_date"], sessions[idx]["start_time"]))
+    shared_count = len(links) - len(sessions)
+    logger.info(
+        f"✅ Inserted {len(sessions)} sessions ({shared_count} shared by 2 classes) "
+        f"({time_module.perf_counter() - started:.1f}s)"
+    )
+    return by_class
+
+
+def generate_attendance(engine, args, students: List[Tuple[str, str]], sessions, rng: random.Random) -> int:
+    """Điểm danh cho từng SV từng buổi đã diễn ra (vắng theo --absent-rate, trễ theo --late-rate)."""
+    with engine.connect() as conn:
+        cols = _table_columns(conn, "attendance")
+    date_schema = "attendance_date" in cols and "attendance_time" in cols
+    if not date_schema and "checkin_time" not in cols:
+        raise RuntimeError("Attendance table schema unsupported")
+    confidence_col = next((c for c in ("recognition_confidence", "confidence") if c in cols), None)
+    with_session = "session_id" in cols
+    now = datetime.now()
+
+    total = 0
+    buffer: List[Dict[str, Any]] = []
+    started = time_module.perf_counter()
+
+    def flush() -> None:
+        nonlocal total
+        with engine.begin() as conn:
+            _insert_many(conn, "attendance", buffer, args.batch)
+        total += len(buffer)
+        buffer.clear()
+        elapsed = time_module.perf_counter() - started
+        logger.info(f"   ... {total} attendance row(s) ({total / elapsed:,.0f} rows/s)")
+
+    for student_id, class_id in students:
+        for session_id, day, start_at in sessions[class_id]:
+            r = rng.random()
+            if r < args.absent_rate:
+                continue
+            late = r < args.absent_rate + args.late_rate
+            # Đúng giờ: tới sớm 10p..trễ 14p; trễ: 16..60p (LATE_AFTER_MINUTES mặc định 15)
+            offset = rng.randint(16 * 60, 60 * 60) if late else rng.randint(-10 * 60, 14 * 60)
+            checkin_at = datetime.combine(day, start_at) + timedelta(seconds=offset)
+            if checkin_at > now:
+                continue
+
+            if date_schema:
+                row = {
+                    "student_id": student_id,
+                    "class_id": class_id,
+                    "attendance_date": day,
+                    "attendance_time": checkin_at.time(),
+                    "status": "late" if late else "present",
+                }
+            else:
+                row = {"student_id": student_id, "checkin_time": checkin_at, "status": "LATE" if late else "ON_TIME"}
+                if with_session:
+                    row["session_id"] = session_id
+            if confidence_col:
+                row[confidence_col] = round(rng.uniform(0.72, 0.99), 4)
+            buffer.append(row)
+            if len(buffer) >= args.batch * 10:
+                flush()
+    if buffer:
+        flush()
+    return total
+
+
+def generate_scale_data(args) -> None:
+    try:
+        engine = create_engine(DB_URL)
+        np_rng = np.random.default_rng(args.seed)
+        rng = random.Random(args.seed)
+
+        if args.reset:
+            logger.info(f"🧹 Removing previously generated data ({args.prefix}*)...")
+            reset_generated(engine, args.prefix)
+
+        class_ids = [f"{args.prefix}C{i:04d}" for i in range(args.classes)]
+        with engine.begin() as conn:
+            _insert_many(
+                conn,
+                "classes",
+                [
+                    {"class_id": cid, "class_name": f"Scale class {i}", "subject_name": "Scale test", "lecturer_name": "N/A"}
+                    for i, cid in enumerate(class_ids)
+                ],
+                args.batch,
+            )
+        logger.info(f"✅ Inserted {len(class_ids)} classes")
+
+        students = generate_students(engine, args, class_ids, np_rng)
+        sessions = generate_sessions(engine, args, class_ids, rng)
+        rows = generate_attendance(engine, args, students, sessions, rng)
+        logger.info(f"✅ Inserted {rows} attendance rows")
+
+        date_from = min((d for items in sessions.values() for _, d, _ in items), default=None)
+        logger.info("🔄 Rebuilding attendance_daily_summary for the generated range...")
+        try:
+            with engine.begin() as conn:
+                summary_rows = rebuild_attendance_summary(conn, date_from, date.today())
+            logger.info(f"✅ Rebuilt {summary_rows} summary row(s)")
+        except Exception as e:
+            logger.warning(f"⚠️  Cannot rebuild summary, run rebuild_attendance_summary.py: {e}")
+
+        logger.info("🎉 Scale data generated!")
+
+    except Exception as e:
+        logger.error(f"❌ Generation failed: {e}")
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic scale data")
+    parser.add_argument("--classes", type=int, default=200)
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--weeks", type=int, default=15, help="Số tuần của học kỳ")
+    parser.add_argument("--sessions-per-week", type=int, default=2, choices=range(1, 6))
+    parser.add_argument("--start-date", type=date.fromisoformat, help="Ngày bắt đầu kỳ (mặc định: lùi --weeks tuần từ hôm nay)")
+    parser.add_argument("--shared-ratio", type=float, default=0.2, help="Tỉ lệ buổi 2 lớp học chung")
+    parser.add_argument("--absent-rate", type=float, default=0.1)
+    parser.add_argument("--late-rate", type=float, default=0.15)
+    parser.add_argument("--encodings", choices=("random", "synthetic", "none"), default="random")
+    parser.add_argument("--synthetic-faces", type=int, default=200, help="Số khuôn mặt gốc với --encodings synthetic")
+    parser.add_argument("--noise", type=float, default=0.002, help="Độ nhiễu cộng vào khuôn mặt gốc")
+    parser.add_argument("--batch", type=int, default=5000, help="Số dòng mỗi lần executemany")
+    parser.add_argument("--prefix", default="SC", help="Tiền tố mã lớp / SV sinh ra")
+    parser.add_argument("--reset", action="store_true", help="Xoá dữ liệu đã sinh trước đó (cùng prefix)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if args.start_date is None:
+        args.start_date = date.today() - timedelta(weeks=args.weeks)
+    return args
+
+
+if __name__ == "__main__":
+    generate_scale_data(_parse_args())
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Migration: tạo composite index khớp với các query nóng trong attendance_router
+(dedupe check-in, report theo session/lớp/ngày, thống kê) và fingerprint gallery khuôn mặt.
+
+Chỉ tạo index khi bảng có đủ cột (2 schema attendance) và chưa có index nào
+bắt đầu bằng đúng các cột đó. Chạy lại nhiều lần vẫn an toàn.
+Schema checkin_time còn được thêm unique key cho upsert 1 câu (restart server sau khi chạy).
+Có dòng trùng theo các key đó thì mặc định dừng lại và in báo cáo, không đổi gì;
+chạy với --dedupe để xoá dòng trùng (giữ attendance_id lớn nhất, dòng bị xoá được chép sang bảng backup trước).
+Kiểm tra kế hoạch thực thi: python check_schema.py --explain
+"""
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import DB_URL
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Số nhóm trùng in ra trong báo cáo cho mỗi key
+DUPLICATE_REPORT_LIMIT = 20
+
+# (bảng, tên index, cột, query dùng tới)
+INDEXES = [
+    # Schema checkin_time + session_id
+    ("attendance", "idx_att_student_session", ("student_id", "session_id"), "dedupe check-in theo session"),
+    ("attendance", "idx_att_session_student", ("session_id", "student_id"), "SV đã điểm danh của session, report theo session"),
+    ("attendance", "idx_att_student_checkin", ("student_id", "checkin_time"), "dedupe check-in theo ngày"),
+    ("attendance", "idx_att_checkin_time", ("checkin_time",), "report theo ngày + ORDER BY checkin_time"),
+    # Schema attendance_date + attendance_time
+    ("attendance", "idx_att_student_class_date", ("student_id", "class_id", "attendance_date"), "upsert theo (SV, lớp, ngày)"),
+    ("attendance", "idx_att_class_date", ("class_id", "attendance_date"), "report/thống kê theo lớp + ngày"),
+    ("attendance", "idx_att_date_time", ("attendance_date", "attendance_time"), "report theo ngày + ORDER BY"),
+    # Roster / thống kê
+    ("students", "idx_class_id", ("class_id",), "danh sách SV theo lớp"),
+    ("sessions", "idx_sessions_date", ("session_date",), "thống kê theo khoảng ngày"),
+    # Fingerprint gallery (COUNT / MAX chỉ đọc index)
+    ("face_encodings", "idx_face_enc_version_created", ("version", "created_at"), "fingerprint gallery theo version"),
+    ("students", "idx_students_updated_at", ("updated_at",), "fingerprint gallery (đổi tên/lớp)"),
+]
+
+
+def _table_columns(conn, table):
+    rows = conn.execute(
+        text(
+            """
+            SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+            """
+        ),
+        {"table": table},
+    ).fetchall()
+    return {row[0] for row in rows}
+
+
+def _existing_indexes(conn, table):
+    """{tên index: (cột theo thứ tự)}"""
+    rows = conn.execute(
+        text(
+            """
+            SELECT INDEX_NAME, COLUMN_NAME
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+            """
+        ),
+        {"table": table},
+    ).fetchall()
+    indexes = {}
+    for name, column in rows:
+        indexes.setdefault(name, []).append(column)
+    return {name: tuple(cols) for name, cols in indexes.items()}
+
+
+def _duplicate_groups(conn, key_expr):
+    """Các nhóm trùng (student_id, giá trị key, số dòng), nhiều dòng nhất trước."""
+    key = key_expr.format(t="a")
+    return conn.execute(
+        text(
+            f"""
+            SELECT a.student_id, {key} AS key_value, COUNT(*) AS row_count
+            FROM attendance a
+            WHERE {key} IS NOT NULL
+            GROUP BY a.student_id, key_value
+            HAVING COUNT(*) > 1
+            ORDER BY row_count DESC
+            """
+        )
+    ).fetchall()
+
+
+def _backup_and_delete_duplicates(conn, name, key_expr):
+    """Chép dòng trùng (trừ attendance_id lớn nhất mỗi nhóm) sang bảng backup rồi xoá. Trả về số dòng đã xoá."""
+    backup = f"attendance_dedupe_{name}_{datetime.now():%Y%m%d%H%M%S}"
+    # CREATE TABLE ... SELECT tự commit: backup có trước khi xoá
+    conn.execute(
+        text(
+            f"""
+            CREATE TABLE {backup} AS
+            SELECT a1.* FROM attendance a1
+            WHERE EXISTS (
+                SELECT 1 FROM attendance a2
+                WHERE a2.student_id = a1.student_id
+                    AND {key_expr.format(t="a2")} = {key_expr.format(t="a1")}
+                    AND a2.attendance_id > a1.attendance_id
+            )
+            """
+        )
+    )
+    backed_up = conn.execute(text(f"SELECT COUNT(*) FROM {backup}")).scalar() or 0
+    logger.info(f"💾 Copied {backed_up} duplicate row(s) to {backup}")
+
+    # Chỉ xoá đúng các dòng đã backup
+    removed = conn.execute(
+        text(f"DELETE a FROM attendance a JOIN {backup} b ON a.attendance_id = b.attendance_id")
+    ).rowcount or 0
+    conn.commit()
+    logger.info(f"🧹 Removed {removed} duplicate row(s) before {name}")
+    return removed
+
+
+def _ensure_checkin_unique_keys(conn, dedupe=False):
+    """Schema checkin_time: unique (student_id, session_id) và (student_id, checkin_day).
+
+    checkin_day là cột sinh = ngày check-in khi không có session (NULL nếu có session),
+    để upsert 1 câu trong attendance_router không thể tạo dòng trùng.
+    Dòng trùng sẵn có: dedupe=False => in báo cáo và trả về None trước mọi ALTER;
+    dedupe=True => backup rồi xoá (giữ attendance_id lớn nhất). Trả về số dòng đã xoá.
+    """
+    columns = _table_columns(conn, "attendance")
+    if "checkin_time" not in columns or "attendance_id" not in columns:
+        return 0
+
+    # (tên key, cột, biểu thức giá trị key theo alias bảng {t})
+    steps = []
+    if "session_id" in columns:
+        steps.append(("uq_att_student_session", ("student_id", "session_id"), "{t}.session_id"))
+    if "checkin_day" in columns:
+        day_expr = "{t}.checkin_day"
+    elif "session_id" in columns:
+        day_expr = "IF({t}.session_id IS NULL, DATE({t}.checkin_time), NULL)"
+    else:
+        day_expr = "DATE({t}.checkin_time)"
+    steps.append(("uq_att_student_day", ("student_id", "checkin_day"), day_expr))
+
+    existing = _existing_indexes(conn, "attendance")
+    pending = []
+    for name, key_columns, key_expr in steps:
+        if key_columns in existing.values() and name in existing:
+            logger.info(f"ℹ️  Unique key {name} already exists")
+        else:
+            pending.append((name, key_columns, key_expr))
+
+    # Kiểm tra trùng trước khi ALTER (ALTER tự commit, không rollback được)
+    duplicates = {name: _duplicate_groups(conn, key_expr) for name, _, key_expr in pending}
+    if any(duplicates.values()) and not dedupe:
+        for name, groups in duplicates.items():
+            if not groups:
+                continue
+            extra = sum(int(g[2]) - 1 for g in groups)
+            logger.warning(f"⚠️  {name}: {len(groups)} duplicate group(s), {extra} extra row(s)")
+            for student_id, key_value, row_count in groups[:DUPLICATE_REPORT_LIMIT]:
+                logger.warning(f"   student_id={student_id} key={key_value} rows={row_count}")
+            if len(groups) > DUPLICATE_REPORT_LIMIT:
+                logger.warning(f"   ... {len(groups) - DUPLICATE_REPORT_LIMIT} more group(s)")
+        logger.error(
+            "❌ Duplicate attendance rows found, nothing changed. "
+            "Review them, then rerun with --dedupe (keeps the newest row, backs up the others)"
+        )
+        return None
+
+    deleted = 0
+    for name, _, key_expr in pending:
+        if duplicates[name]:
+            deleted += _backup_and_delete_duplicates(conn, name, key_expr)
+
+    if pending and "checkin_day" not in columns:
+        day_expr = "IF(session_id IS NULL, DATE(checkin_time), NULL)" if "session_id" in columns else "DATE(checkin_time)"
+        logger.info("🔧 Adding generated column attendance.checkin_day")
+        conn.execute(text(f"ALTER TABLE attendance ADD COLUMN checkin_day DATE GENERATED ALWAYS AS ({day_expr}) STORED"))
+        conn.commit()
+
+    for name, key_columns, _ in pending:
+        try:
+            conn.execute(text(f"ALTER TABLE attendance ADD UNIQUE KEY {name} ({', '.join(key_columns)})"))
+            conn.commit()
+            logger.info(f"✅ Created unique key {name}")
+        except Exception as e:
+            logger.error(f"❌ Cannot create unique key {name}: {e}")
+            conn.rollback()
+
+    return deleted
+
+
+def migrate_attendance_indexes(dedupe=False):
+    """Tạo các composite index còn thiếu (dedupe=True: cho phép xoá dòng trùng trước khi thêm unique key)"""
+    try:
+        engine = create_engine(DB_URL)
+
+        with engine.connect() as conn:
+            logger.info("🔨 Checking attendance indexes...")
+            # Unique key trước: index thường cùng cột sẽ được coi là đã có
+            deleted = _ensure_checkin_unique_keys(conn, dedupe=dedupe)
+            if deleted is None:
+                return
+            if deleted:
+                # Summary đếm cả các dòng trùng vừa xoá => tính lại
+                from services.attendance_summary import rebuild_attendance_summary
+                try:
+                    rows = rebuild_attendance_summary(conn)
+                    conn.commit()
+                    logger.info(f"✅ Rebuilt attendance_daily_summary ({rows} row(s))")
+                except Exception as e:
+                    conn.rollback()
+                    logger.warning(f"⚠️  Cannot rebuild summary, run rebuild_attendance_summary.py: {e}")
+
+            columns_cache = {}
+            indexes_cache = {}
+
+            for table, name, columns, purpose in INDEXES:
+                if table not in columns_cache:
+                    columns_cache[table] = _table_columns(conn, table)
+                    indexes_cache[table] = _existing_indexes(conn, table)
+
+                missing = [c for c in columns if c not in columns_cache[table]]
+                if missing:
+                    logger.info(f"ℹ️  Skip {name}: {table} has no column(s) {missing}")
+                    continue
+
+                covered_by = next(
+                    (n for n, cols in indexes_cache[table].items() if cols[: len(columns)] == columns),
+                    None,
+                )
+                if covered_by:
+                    logger.info(f"ℹ️  {table}({', '.join(columns)}) already covered by {covered_by}")
+                    continue
+
+                try:
+                    logger.info(f"🔧 CREATE INDEX {name} ON {table}({', '.join(columns)}) - {purpose}")
+                    conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+                    conn.commit()
+                    indexes_cache[table][name] = columns
+                    logger.info(f"✅ Created {name}")
+                except Exception as e:
+                    logger.error(f"❌ Cannot create {name}: {e}")
+                    conn.rollback()
+
+            logger.info("🎉 Attendance index migration completed!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+
+if __name__ == "__main__":
+    migrate_attendance_indexes(dedupe="--dedupe" in sys.argv[1:])
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Migration: tách encoding khuôn mặt từ students sang bảng face_encodings
+(student_id, version, dim, vector, created_at).
+
+Chạy lại nhiều lần vẫn an toàn (INSERT IGNORE).
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from app.database import DB_URL
+from models.face_encoding_model import FaceEncoding
+from services.face_encoding_store import backfill_from_students
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_face_encodings():
+    """Tạo bảng face_encodings và copy dữ liệu từ students"""
+    try:
+        engine = create_engine(DB_URL)
+
+        logger.info("🔨 Creating face_encodings table...")
+        FaceEncoding.__table__.create(bind=engine, checkfirst=True)
+
+        with engine.begin() as conn:
+            copied = backfill_from_students(conn)
+            logger.info(f"✅ Copied {copied} encoding(s) from students")
+
+        # Thống kê theo version để kiểm tra rollout
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    """
+                    SELECT version, dim, COUNT(*)
+                    FROM face_encodings
+                    GROUP BY version, dim
+                    ORDER BY version
+                    """
+                )
+            ).fetchall()
+            for version, dim, count in rows:
+                logger.info(f"   version={version} dim={dim}: {count} student(s)")
+
+        logger.info("🎉 face_encodings migration completed!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+
+if __name__ == "__main__":
+    migrate_face_encodings()
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Integer, String
+
+from app.database import Base
+
+
+class AttendanceDailySummary(Base):
+    """Số lượt điểm danh theo (lớp, ngày, status), cập nhật dần khi check-in."""
+    __tablename__ = "attendance_daily_summary"
+
+    class_id = Column(String(20), primary_key=True)
+    summary_date = Column(Date, primary_key=True)
+    status = Column(String(10), primary_key=True)  # ON_TIME / LATE / ABSENT
+    checkin_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now)
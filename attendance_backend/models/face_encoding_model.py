@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String
+
+from app.database import Base
+
+
+class FaceEncoding(Base):
+    """Bảng hẹp chỉ chứa vector đặc trưng, tách khỏi students (có face_image BLOB).
+
+    Mỗi sinh viên có thể giữ nhiều version encoding cùng lúc khi đổi thuật toán.
+    """
+    __tablename__ = "face_encodings"
+
+    student_id = Column(
+        String(20), ForeignKey("students.student_id", ondelete="CASCADE"), primary_key=True
+    )
+    version = Column(String(10), primary_key=True)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 bytes
+    created_at = Column(DateTime, default=datetime.now)
+
+    # COUNT/MAX(created_at) theo version cho fingerprint gallery (không đọc BLOB)
+    __table_args__ = (Index("idx_face_enc_version_created", "version", "created_at"),)
@@ -18,7 +18,7 @@ class Student(Base):
     face_image = Column(LargeBinary)  # Store face image as binary
     face_encoding_version = Column(String(10), default="1.0")  # For future compatibility
     created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
     # Relationship
     class_info = relationship("Class")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tính lại bảng attendance_daily_summary từ attendance.
+
+Dùng để backfill lần đầu hoặc sửa lệch (vd sau khi xoá/sửa attendance trực tiếp trong DB).
+    python rebuild_attendance_summary.py                      # toàn bộ
+    python rebuild_attendance_summary.py 2024-09-01 2024-12-31 # theo khoảng ngày
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date
+from sqlalchemy import create_engine
+from app.database import DB_URL
+from models.attendance_summary_model import AttendanceDailySummary
+from services.attendance_summary import rebuild_attendance_summary
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def rebuild_summary(date_from=None, date_to=None):
+    """Tạo bảng (nếu thiếu) và tính lại summary trong khoảng ngày"""
+    try:
+        engine = create_engine(DB_URL)
+
+        logger.info("🔨 Creating attendance_daily_summary table...")
+        AttendanceDailySummary.__table__.create(bind=engine, checkfirst=True)
+
+        logger.info(f"🔄 Rebuilding summary (from={date_from or '*'}, to={date_to or '*'})...")
+        with engine.begin() as conn:
+            rows = rebuild_attendance_summary(conn, date_from, date_to)
+
+        logger.info(f"🎉 Rebuilt {rows} summary row(s)")
+
+    except Exception as e:
+        logger.error(f"❌ Rebuild failed: {e}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rebuild_summary(
+        date.fromisoformat(args[0]) if len(args) > 0 else None,
+        date.fromisoformat(args[1]) if len(args) > 1 else None,
+    )
@@ -0,0 +1,74 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.admin_auth import require_admin
+from services.memory_debug import memory_tracer
+from services.request_profiler import request_profiler
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+def list_profiles():
+    """Các profile gần nhất (mới nhất trước)."""
+    return {"profiles": request_profiler.list()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: int, format: str = Query("collapsed", pattern="^(collapsed|stats|json)$")):
+    """collapsed: dạng flamegraph.pl / speedscope; stats: bảng pstats (chỉ với cProfile)."""
+    record = request_profiler.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found (rotated out or wrong id)")
+    if format == "json":
+        return {**record.summary(), "collapsed": record.collapsed, "stats": record.stats}
+    if format == "stats":
+        if not record.stats:
+            raise HTTPException(status_code=400, detail="Sampling profiles have no pstats output")
+        return PlainTextResponse(record.stats)
+    return PlainTextResponse(record.collapsed)
+
+
+@router.get("/memory")
+def memory_status():
+    """RSS hiện tại, trạng thái tracemalloc và các request route nặng gần nhất (tăng nhiều nhất trước)."""
+    return memory_tracer.status()
+
+
+@router.post("/memory/tracemalloc/start")
+def start_tracemalloc(nframes: int = Query(1, ge=1, le=25)):
+    """nframes > 1 để diff theo traceback (tốn thêm RAM)."""
+    memory_tracer.start(nframes)
+    return memory_tracer.status()["tracemalloc"]
+
+
+@router.post("/memory/tracemalloc/stop")
+def stop_tracemalloc():
+    memory_tracer.stop()
+    return memory_tracer.status()["tracemalloc"]
+
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot():
+    try:
+        return memory_tracer.take_snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/memory/snapshots/diff")
+def diff_memory_snapshots(
+    base: int,
+    target: Optional[int] = None,
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(30, ge=1, le=500),
+):
+    """Vị trí cấp phát tăng nhiều nhất từ snapshot base tới target (bỏ trống target = chụp mới)."""
+    try:
+        return memory_tracer.diff(base, target, group_by=group_by, limit=limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Snapshot {e.args[0]} not found")
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
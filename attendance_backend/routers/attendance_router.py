@@ -1,11 +1,18 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any, Dict, List, Optional
-
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+import asyncio
+import csv
+import io
+import json
+import time
+from dataclasses import asdict
+from datetime import date as date_type, datetime, time as time_type, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import Session
 
 from models.student import Student
@@ -15,12 +22,29 @@ from models.session_class_model import SessionClass
 from schemas.attendance_schema import (
     AttendanceCheckinByFaceResponse,
     AttendanceRecordResponse,
+    AttendanceStatsResponse,
+    DailyAttendanceSummary,
 )
+from services.async_database import DBRunner, get_db_runner
+from services.attendance_queue import attendance_queue
+from services.attendance_stats import compute_attendance_stats
+from services.attendance_summary import load_daily_summary, record_status_change, summary_status
 from services.database_service import db_service
+from services.face_gallery import GalleryEntry, face_gallery
 from services.face_service import face_service
+from services.live_feed import live_feed
+from services.metrics import face_checkin_total, face_faces_per_frame, face_stage_seconds
+from services.report_cache import REPORT_CACHE_REPLICA_LAG, ReportScope, report_cache
+from services.session_context import SessionContext, session_contexts
 
 router = APIRouter(prefix="/api/attendance", tags=["attendance"])
 
+# Số dòng đọc từ cursor / ghi ra mỗi chunk khi export
+EXPORT_CHUNK_ROWS = 1000
+
+# Chu kỳ gửi keepalive / kiểm tra client SSE đã ngắt (giây)
+LIVE_KEEPALIVE_SECONDS = 15
+
 
 def _status_to_vi(raw: Optional[str]) -> Optional[str]:
     """Chuẩn hoá status hiển thị tiếng Việt (đồng bộ UI)."""
@@ -50,6 +74,16 @@ def _status_to_vi(raw: Optional[str]) -> Optional[str]:
     return s
 
 
+def _parse_day(raw: Optional[str]) -> Optional[date_type]:
+    """Parse 'YYYY-MM-DD'; sai định dạng => None."""
+    if not raw:
+        return None
+    try:
+        return date_type.fromisoformat(raw)
+    except ValueError:
+        return None
+
+
 def _normalize_status_for_date_schema(raw: str) -> str:
     """Schema attendance_date/time chỉ nhận: present/late/absent."""
     if not raw:
@@ -92,6 +126,48 @@ def _ensure_attendance_table(db: Session) -> None:
         Base.metadata.create_all(bind=_db.engine)
 
 
+# Cache danh sách cột attendance: schema không đổi khi server đang chạy
+_attendance_columns: Optional[set[str]] = None
+
+
+def _get_attendance_columns(db: Session) -> set[str]:
+    """Đảm bảo có bảng attendance và trả về các cột (chỉ probe DB lần đầu)."""
+    global _attendance_columns
+    if _attendance_columns is None:
+        _ensure_attendance_table(db)
+        _attendance_columns = _get_table_columns(db, "attendance")
+    return _attendance_columns
+
+
+# Cache các unique key của attendance (tuple cột theo thứ tự)
+_attendance_unique_keys: Optional[set[tuple]] = None
+
+
+def _get_attendance_unique_keys(db: Session) -> set[tuple]:
+    global _attendance_unique_keys
+    if _attendance_unique_keys is None:
+        keys: Dict[str, List[str]] = {}
+        for row in db.execute(text("SHOW INDEX FROM attendance")).mappings():
+            if int(row["Non_unique"]) == 0:
+                keys.setdefault(row["Key_name"], []).append(row["Column_name"])
+        _attendance_unique_keys = {tuple(cols) for cols in keys.values()}
+    return _attendance_unique_keys
+
+
+def _mysql_error_code(exc: Exception) -> Optional[int]:
+    args = getattr(getattr(exc, "orig", None), "args", ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+def _is_duplicate_key(exc: IntegrityError) -> bool:
+    """Lỗi trùng unique key (MySQL 1062; SQLite của benchmarks/sqlite_standin báo 'UNIQUE constraint')."""
+    return _mysql_error_code(exc) == 1062 or "UNIQUE constraint" in str(getattr(exc, "orig", exc))
+
+
+# Số lần chạy lại transaction check-in khi InnoDB báo deadlock (1213)
+ATTENDANCE_DEADLOCK_RETRIES = 3
+
+
 def _ensure_session_classes_table(db: Session) -> None:
     """Tạo table session_classes nếu chưa có (hỗ trợ 1 session nhiều lớp).
 
@@ -139,20 +215,112 @@ def _get_session_class_ids(db: Session, session_id: int) -> List[str]:
     return [str(r[0]) for r in rows]
 
 
+def _load_session_context(db: Session, session_id: int) -> Optional[SessionContext]:
+    """Đọc 1 lần các thông tin cố định của session để dùng cho mọi frame điểm danh."""
+    session_row = db.query(SessionModel).filter(SessionModel.session_id == session_id).first()
+    if session_row is None:
+        return None
+
+    ctx = SessionContext(
+        session_id=session_id,
+        session_date=session_row.session_date,
+        start_time=session_row.start_time,
+        end_time=session_row.end_time,
+        class_ids=set(_get_session_class_ids(db, session_id)),
+    )
+
+    # SV đã điểm danh trước đó (theo schema hiện có)
+    cols = _get_attendance_columns(db)
+    rows: List[Any] = []
+    if "session_id" in cols:
+        rows = db.execute(
+            text("SELECT student_id, status FROM attendance WHERE session_id = :session_id"),
+            {"session_id": session_id},
+        ).fetchall()
+    elif "attendance_date" in cols and ctx.session_date is not None and ctx.class_ids:
+        params: Dict[str, Any] = {"attendance_date": ctx.session_date}
+        placeholders: List[str] = []
+        for idx, cid in enumerate(sorted(ctx.class_ids)):
+            params[f"cid{idx}"] = cid
+            placeholders.append(f":cid{idx}")
+        rows = db.execute(
+            text(
+                f"""
+                SELECT student_id, status FROM attendance
+                WHERE attendance_date = :attendance_date AND class_id IN ({', '.join(placeholders)})
+                """
+            ),
+            params,
+        ).fetchall()
+    ctx.checked_in = {str(r[0]): summary_status(r[1]) for r in rows}
+    return ctx
+
+
+def _get_session_context(db: Session, session_id: int) -> Optional[SessionContext]:
+    return session_contexts.get_or_load(session_id, lambda sid: _load_session_context(db, sid))
+
+
 def _upsert_attendance_compatible(
     db: Session,
     *,
-    student: Student,
+    student: GalleryEntry,
     session_id: Optional[int],
     class_id: Optional[str],
     checkin_at: datetime,
     status: str,
     confidence: Optional[float],
-) -> Optional[int]:
-    """Ghi điểm danh theo schema hiện có của bảng attendance."""
-    _ensure_attendance_table(db)
+    commit: bool = True,
+) -> Tuple[Optional[int], bool]:
+    """Ghi điểm danh theo schema hiện có của bảng attendance.
 
-    cols = _get_table_columns(db, "attendance")
+    Trả về (attendance_id, created) - created=True nếu đã thêm dòng mới, False nếu cập nhật dòng cũ.
+    commit=False: caller tự commit rồi gọi _after_attendance_write (ghi theo lô của write-behind).
+    commit=True: deadlock (1213) thì rollback và chạy lại cả transaction.
+    """
+    for attempt in range(ATTENDANCE_DEADLOCK_RETRIES + 1):
+        try:
+            attendance_id, created = _write_attendance_row(
+                db,
+                student=student,
+                session_id=session_id,
+                class_id=class_id,
+                checkin_at=checkin_at,
+                status=status,
+                confidence=confidence,
+            )
+            if commit:
+                db.commit()
+            break
+        except OperationalError as exc:
+            if not commit or _mysql_error_code(exc) != 1213 or attempt == ATTENDANCE_DEADLOCK_RETRIES:
+                raise
+            db.rollback()
+    if commit:
+        _after_attendance_write(session_id, class_id if class_id is not None else student.class_id, checkin_at)
+    return attendance_id, created
+
+
+def _after_attendance_write(session_id: Optional[int], class_id: Optional[str], checkin_at: datetime) -> None:
+    """Sau khi commit: bỏ các report cache bị ảnh hưởng."""
+    report_cache.invalidate_write(
+        session_id=session_id,
+        class_id=str(class_id) if class_id is not None else None,
+        day=checkin_at.date(),
+    )
+
+
+def _write_attendance_row(
+    db: Session,
+    *,
+    student: GalleryEntry,
+    session_id: Optional[int],
+    class_id: Optional[str],
+    checkin_at: datetime,
+    status: str,
+    confidence: Optional[float],
+) -> Tuple[Optional[int], bool]:
+    """Ghi 1 dòng attendance + summary (chưa commit), trả về (attendance_id, created)."""
+    cols = _get_attendance_columns(db)
 
     # Ưu tiên schema kiểu setup_database.py: attendance_date + attendance_time
     if "attendance_date" in cols and "attendance_time" in cols:
@@ -160,47 +328,15 @@ def _upsert_attendance_compatible(
         cid_value: Any = class_id if class_id is not None else student.class_id
         cid_value = str(cid_value) if cid_value is not None else None
 
-        # UNIQUE thường là (student_id, class_id, attendance_date)
-        insert_sql = text(
-            """
-            INSERT INTO attendance (student_id, class_id, attendance_date, attendance_time, status, recognition_confidence)
-            VALUES (:student_id, :class_id, :attendance_date, :attendance_time, :status, :confidence)
-            ON DUPLICATE KEY UPDATE
-                attendance_time = VALUES(attendance_time),
-                status = VALUES(status),
-                recognition_confidence = VALUES(recognition_confidence)
-            """
+        return _write_attendance_date_row(
+            db,
+            has_id="id" in cols,
+            student_id=student.student_id,
+            class_id=cid_value,
+            checkin_at=checkin_at,
+            status=status,
+            confidence=confidence,
         )
-        db.execute(
-            insert_sql,
-            {
-                "student_id": student.student_id,
-                "class_id": cid_value,
-                "attendance_date": checkin_at.date(),
-                "attendance_time": checkin_at.time().replace(microsecond=0),
-                "status": _normalize_status_for_date_schema(status),
-                "confidence": confidence,
-            },
-        )
-        db.commit()
-
-        # Trả về id mới nhất (nếu có cột id)
-        if "id" in cols:
-            row = db.execute(
-                text(
-                    """
-                    SELECT id FROM attendance
-                    WHERE student_id = :student_id AND class_id = :class_id AND attendance_date = :attendance_date
-                    """
-                ),
-                {
-                    "student_id": student.student_id,
-                    "class_id": cid_value,
-                    "attendance_date": checkin_at.date(),
-                },
-            ).fetchone()
-            return int(row[0]) if row else None
-        return None
 
     # Schema kiểu ORM: checkin_time (+ session_id)
     # Nếu bảng có session_id thì dùng unique (student_id, session_id) nếu tồn tại
@@ -210,12 +346,32 @@ def _upsert_attendance_compatible(
     if not has_checkin_time:
         raise HTTPException(status_code=500, detail="Attendance table schema unsupported")
 
+    # Schema này không có class_id: summary tính theo lớp của SV
+    summary_class_id = class_id if class_id is not None else student.class_id
+    summary_class_id = str(summary_class_id) if summary_class_id is not None else None
+
+    # Có unique key phù hợp (migrate_attendance_indexes.py) => 1 câu upsert nguyên tử
+    unique_keys = _get_attendance_unique_keys(db)
+    if has_session_id and session_id is not None:
+        atomic_key = ("student_id", "session_id")
+    else:
+        atomic_key = ("student_id", "checkin_day")
+    if atomic_key in unique_keys and "attendance_id" in cols:
+        return _upsert_checkin_atomic(
+            db,
+            student_id=student.student_id,
+            session_id=session_id if has_session_id else None,
+            summary_class_id=summary_class_id,
+            checkin_at=checkin_at,
+            status=status,
+        )
+
     # Kiểm tra đã điểm danh trong cùng session hoặc cùng ngày
     if has_session_id and session_id is not None:
         existing = db.execute(
             text(
                 """
-                SELECT attendance_id FROM attendance
+                SELECT attendance_id, status, checkin_time FROM attendance
                 WHERE student_id = :student_id AND session_id = :session_id
                 LIMIT 1
                 """
@@ -227,12 +383,16 @@ def _upsert_attendance_compatible(
         existing = db.execute(
             text(
                 """
-                SELECT attendance_id FROM attendance
-                WHERE student_id = :student_id AND DATE(checkin_time) = :today
+                SELECT attendance_id, status, checkin_time FROM attendance
+                WHERE student_id = :student_id AND checkin_time >= :day_start AND checkin_time < :day_end
                 LIMIT 1
                 """
             ),
-            {"student_id": student.student_id, "today": checkin_at.date()},
+            {
+                "student_id": student.student_id,
+                "day_start": checkin_at.date(),
+                "day_end": checkin_at.date() + timedelta(days=1),
+            },
         ).fetchone()
 
     if existing:
@@ -251,8 +411,15 @@ def _upsert_attendance_compatible(
                 "attendance_id": attendance_id,
             },
         )
-        db.commit()
-        return attendance_id
+        record_status_change(
+            db,
+            class_id=summary_class_id,
+            day=checkin_at.date(),
+            new_status=status,
+            old_status=existing[1],
+            old_day=existing[2].date() if existing[2] is not None else None,
+        )
+        return attendance_id, False
 
     # Insert mới
     fields: List[str] = ["student_id", "checkin_time", "status"]
@@ -270,15 +437,255 @@ def _upsert_attendance_compatible(
         f"INSERT INTO attendance ({', '.join(fields)}) VALUES ({', '.join(':'+f for f in fields)})"
     )
     db.execute(insert, params)
-    db.commit()
+    record_status_change(db, class_id=summary_class_id, day=checkin_at.date(), new_status=status)
 
     # Lấy id nếu có
+    attendance_id: Optional[int] = None
     id_col = "attendance_id" if "attendance_id" in cols else ("id" if "id" in cols else None)
     if id_col:
         row = db.execute(text("SELECT LAST_INSERT_ID()"))
         val = row.fetchone()[0]
-        return int(val) if val is not None else None
-    return None
+        attendance_id = int(val) if val is not None else None
+    return attendance_id, True
+
+
+def _write_attendance_date_row(
+    db: Session,
+    *,
+    has_id: bool,
+    student_id: str,
+    class_id: Optional[str],
+    checkin_at: datetime,
+    status: str,
+    confidence: Optional[float],
+) -> Tuple[Optional[int], bool]:
+    """Ghi schema attendance_date dựa vào UNIQUE (student_id, class_id, attendance_date).
+
+    Giống _upsert_checkin_atomic: INSERT trước, trùng key mới khoá dòng đã có để lấy status cũ cho summary.
+    """
+    params: Dict[str, Any] = {
+        "student_id": student_id,
+        "class_id": class_id,
+        "attendance_date": checkin_at.date(),
+        "attendance_time": checkin_at.time().replace(microsecond=0),
+        "status": _normalize_status_for_date_schema(status),
+        "confidence": confidence,
+    }
+    try:
+        result = db.execute(
+            text(
+                """
+                INSERT INTO attendance (student_id, class_id, attendance_date, attendance_time, status, recognition_confidence)
+                VALUES (:student_id, :class_id, :attendance_date, :attendance_time, :status, :confidence)
+                """
+            ),
+            params,
+        )
+    except IntegrityError as e:
+        if not _is_duplicate_key(e):
+            raise
+    else:
+        record_status_change(db, class_id=class_id, day=checkin_at.date(), new_status=status)
+        return (int(result.lastrowid) if has_id and result.lastrowid else None), True
+
+    id_select = "id, " if has_id else ""
+    previous = db.execute(
+        text(
+            f"""
+            SELECT {id_select}status FROM attendance
+            WHERE student_id = :student_id AND class_id = :class_id AND attendance_date = :attendance_date
+            FOR UPDATE
+            """
+        ),
+        params,
+    ).fetchone()
+    if previous is None:
+        raise HTTPException(status_code=409, detail="Attendance row changed concurrently, please retry")
+
+    db.execute(
+        text(
+            """
+            UPDATE attendance
+            SET attendance_time = :attendance_time, status = :status, recognition_confidence = :confidence
+            WHERE student_id = :student_id AND class_id = :class_id AND attendance_date = :attendance_date
+            """
+        ),
+        params,
+    )
+    record_status_change(db, class_id=class_id, day=checkin_at.date(), new_status=status, old_status=previous[-1])
+    return (int(previous[0]) if has_id else None), False
+
+
+def _upsert_checkin_atomic(
+    db: Session,
+    *,
+    student_id: str,
+    session_id: Optional[int],
+    summary_class_id: Optional[str],
+    checkin_at: datetime,
+    status: str,
+) -> Tuple[Optional[int], bool]:
+    """Ghi schema checkin_time dựa vào unique (student_id, session_id) hoặc (student_id, checkin_day).
+
+    INSERT trước: lượt check-in đầu chỉ 1 câu, 2 frame cùng SV đến đồng thời không thể tạo 2 dòng.
+    Không đọc trước bằng FOR UPDATE: khi dòng chưa có, câu đó khoá gap và 2 lượt đầu đồng thời deadlock.
+    Trùng key thì dòng đã tồn tại => SELECT ... FOR UPDATE chỉ khoá đúng dòng đó để lấy status/giờ cũ cho summary.
+    """
+    fields = ["student_id", "checkin_time", "status"]
+    params: Dict[str, Any] = {"student_id": student_id, "checkin_time": checkin_at, "status": status}
+    if session_id is not None:
+        fields.append("session_id")
+        params["session_id"] = session_id
+        key_where = "session_id = :session_id"
+    else:
+        params["checkin_day"] = checkin_at.date()
+        key_where = "checkin_day = :checkin_day"
+
+    try:
+        result = db.execute(
+            text(f"INSERT INTO attendance ({', '.join(fields)}) VALUES ({', '.join(':' + f for f in fields)})"),
+            {f: params[f] for f in fields},
+        )
+    except IntegrityError as e:
+        if not _is_duplicate_key(e):
+            raise
+    else:
+        record_status_change(db, class_id=summary_class_id, day=checkin_at.date(), new_status=status)
+        return (int(result.lastrowid) if result.lastrowid else None), True
+
+    # MySQL chỉ huỷ câu INSERT lỗi, transaction (vd cả lô write-behind) vẫn dùng tiếp được
+    previous = db.execute(
+        text(
+            f"""
+            SELECT attendance_id, status, checkin_time FROM attendance
+            WHERE student_id = :student_id AND {key_where}
+            FOR UPDATE
+            """
+        ),
+        params,
+    ).fetchone()
+    if previous is None:
+        raise HTTPException(status_code=409, detail="Attendance row changed concurrently, please retry")
+
+    attendance_id = int(previous[0])
+    db.execute(
+        text("UPDATE attendance SET checkin_time = :checkin_time, status = :status WHERE attendance_id = :attendance_id"),
+        {"checkin_time": checkin_at, "status": status, "attendance_id": attendance_id},
+    )
+    record_status_change(
+        db,
+        class_id=summary_class_id,
+        day=checkin_at.date(),
+        new_status=status,
+        old_status=previous[1],
+        old_day=previous[2].date() if previous[2] is not None else None,
+    )
+    return attendance_id, False
+
+
+
+def _publish_checkin(
+    *,
+    student: Dict[str, Any],
+    session_id: Optional[int],
+    class_id: Optional[str],
+    checkin_at: datetime,
+    status: str,
+    confidence: Optional[float],
+    attendance_id: Optional[int],
+) -> None:
+    """Phát sự kiện check-in (delta gọn) cho các màn hình report đang mở."""
+    live_feed.publish(
+        session_id,
+        {
+            "type": "checkin",
+            "attendance_id": attendance_id,
+            "student_id": student["student_id"],
+            "student_name": student.get("name"),
+            "class_id": class_id,
+            "status": _status_to_vi(status),
+            "checkin_time": checkin_at.isoformat(timespec="seconds"),
+            "recognition_confidence": confidence,
+        },
+    )
+
+
+def _write_checkin_batch(items: List[Dict[str, Any]]) -> None:
+    """Ghi 1 lô check-in từ write-behind queue trong 1 transaction."""
+    db = db_service.SessionLocal()
+    attendance_ids: List[Optional[int]] = []
+    started = time.perf_counter()
+    try:
+        for item in items:
+            attendance_id, _ = _upsert_attendance_compatible(
+                db,
+                student=GalleryEntry(**item["student"]),
+                session_id=item["session_id"],
+                class_id=item["class_id"],
+                checkin_at=datetime.fromisoformat(item["checkin_at"]),
+                status=item["status"],
+                confidence=item["confidence"],
+                commit=False,
+            )
+            attendance_ids.append(attendance_id)
+        db.commit()
+        face_stage_seconds.observe(time.perf_counter() - started, stage="upsert_batch")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for item, attendance_id in zip(items, attendance_ids):
+        checkin_at = datetime.fromisoformat(item["checkin_at"])
+        class_id = item["class_id"] if item["class_id"] is not None else item["student"].get("class_id")
+        _after_attendance_write(item["session_id"], class_id, checkin_at)
+        _publish_checkin(
+            student=item["student"],
+            session_id=item["session_id"],
+            class_id=class_id,
+            checkin_at=checkin_at,
+            status=item["status"],
+            confidence=item["confidence"],
+            attendance_id=attendance_id,
+        )
+
+
+attendance_queue.configure(_write_checkin_batch)
+
+
+@router.get("/queue")
+def get_attendance_queue_stats():
+    """Trạng thái write-behind queue (độ sâu hàng đợi, số bản ghi đã ghi/spool)."""
+    return attendance_queue.stats()
+
+
+@router.get("/live")
+async def live_checkins(request: Request, session_id: Optional[int] = None):
+    """SSE: đẩy từng lượt check-in mới (của session_id, bỏ trống = mọi session) tới màn hình report."""
+    subscription = live_feed.subscribe(session_id)
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Giữ kết nối qua proxy
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            live_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/checkin-by-face", response_model=AttendanceCheckinByFaceResponse)
@@ -287,17 +694,20 @@ async def checkin_by_face(
     session_id: Optional[int] = Form(None),
     class_id: Optional[str] = Form(None),
     class_ids: Optional[str] = Form(None),
-    db: Session = Depends(db_service.get_db),
+    db: DBRunner = Depends(get_db_runner),
 ):
     """Điểm danh bằng camera: detect → encode → compare → save."""
     try:
         image_bytes = await file.read()
 
-        img = face_service.preprocess_image(image_bytes)
+        with face_stage_seconds.time(stage="decode"):
+            img = face_service.preprocess_image(image_bytes)
         if img is None:
             raise HTTPException(status_code=400, detail="Invalid image format")
 
-        faces = face_service.detect_faces(img)
+        with face_stage_seconds.time(stage="detect"):
+            faces = face_service.detect_faces(img)
+        face_faces_per_frame.observe(len(faces))
         if not faces:
             return AttendanceCheckinByFaceResponse(
                 success=True,
@@ -308,94 +718,95 @@ async def checkin_by_face(
                 message="No faces detected",
             )
 
-        students = db.query(Student).filter(Student.face_encoding.isnot(None)).all()
+        await face_gallery.ensure_loaded_async(db)
 
         attendances: List[AttendanceRecordResponse] = []
         created_count = 0
+        queued_count = 0
         checkin_at = datetime.now()
 
         # class_ids (multi) ưu tiên hơn class_id (single)
         allowed_class_ids = set(_parse_class_ids(class_ids))
+        if not allowed_class_ids and class_id is not None:
+            allowed_class_ids = {str(class_id)}
 
-        # Nếu có session_id: dùng để tính trạng thái ON_TIME/LATE (cho phép trễ 15p)
-        session_row: Optional[SessionModel] = None
+        # Nếu có session_id: lấy context đã cache (khung giờ, lớp, SV đã điểm danh)
+        ctx: Optional[SessionContext] = None
         if session_id is not None:
-            session_row = db.query(SessionModel).filter(SessionModel.session_id == session_id).first()
-
-        # Nếu chọn session nhưng không truyền class_id(s): auto giới hạn theo session_classes (nếu có)
-        if session_id is not None and not allowed_class_ids and class_id is None:
-            session_cids = _get_session_class_ids(db, session_id)
-            if session_cids:
-                allowed_class_ids = set(session_cids)
+            ctx = await db.run(_get_session_context, session_id)
+
+        # Chỉ so khớp trong partition của các lớp liên quan
+        if allowed_class_ids:
+            partition = face_gallery.partition(allowed_class_ids)
+        elif ctx is not None:
+            # Chọn session nhưng không truyền lớp: giới hạn theo session_classes (nếu có)
+            partition = ctx.partition()
+        else:
+            partition = face_gallery.partition()
 
         for face in faces:
-            face_encoding = face_service.extract_face_encoding(img, face)
+            with face_stage_seconds.time(stage="encode"):
+                face_encoding = face_service.extract_face_encoding(img, face)
             if face_encoding is None:
+                face_checkin_total.inc(result="no_encoding")
                 continue
 
-            best_match: Optional[Student] = None
-            best_similarity = 0.0
-
-            for student in students:
-                student_encoding = student.get_face_encoding()
-                if student_encoding is None:
-                    continue
-
-                is_match, similarity = face_service.compare_faces(
-                    face_encoding, student_encoding, threshold=0.7
-                )
-
-                if is_match and similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = student
-
+            with face_stage_seconds.time(stage="match"):
+                best_match, best_similarity = partition.match(face_encoding, threshold=0.7)
             if not best_match:
+                face_checkin_total.inc(result="unknown")
                 continue
 
-            # Tính status
-            status_value = "present"
-            if session_row is not None and session_row.session_date and session_row.start_time:
-                # Đúng giờ nếu checkin <= start + 15 phút
-                session_start = datetime.combine(session_row.session_date, session_row.start_time)
-                late_after = session_start.timestamp() + 15 * 60
-                status_value = "ON_TIME" if checkin_at.timestamp() <= late_after else "LATE"
+            # Tính status (ON_TIME/LATE nếu có session, cho phép trễ 15p)
+            status_value = ctx.status_for(checkin_at) if ctx is not None else "present"
 
-            # Xác định lớp sẽ ghi điểm danh
-            effective_class_id: Optional[str] = None
+            # Lớp ghi điểm danh = lớp của SV (gallery đã lọc theo lớp được chọn nếu có)
+            effective_class_id: Optional[str] = best_match.class_id
 
-            # Nếu chọn nhiều lớp: chỉ ghi nếu class_id của SV nằm trong danh sách
-            if allowed_class_ids:
-                if best_match.class_id is None:
-                    continue
-                student_cid = str(best_match.class_id)
-                if student_cid not in allowed_class_ids:
-                    continue
-                effective_class_id = student_cid
+            # SV đã điểm danh với cùng status trong session: frame lặp lại, không ghi lại
+            attendance_id: Optional[int] = None
+            if ctx is not None and ctx.checked_in.get(best_match.student_id) == summary_status(status_value):
+                face_checkin_total.inc(result="already_checked_in")
+            # Lưu điểm danh: write-behind (bản ghi tạm, chưa có id) hoặc ghi đồng bộ
+            elif attendance_queue.submit(
+                {
+                    "student": asdict(best_match),
+                    "session_id": session_id,
+                    "class_id": effective_class_id,
+                    "checkin_at": checkin_at.isoformat(),
+                    "status": status_value,
+                    "confidence": float(best_similarity),
+                }
+            ):
+                queued_count += 1
+                face_checkin_total.inc(result="queued")
             else:
-                # Chọn 1 lớp (tùy chọn). Nếu truyền class_id thì chỉ ghi cho SV đúng lớp.
-                if class_id is not None:
-                    if best_match.class_id is None:
-                        continue
-                    if str(best_match.class_id) != str(class_id):
-                        continue
-                    effective_class_id = str(class_id)
-                else:
-                    # Không truyền lớp: mặc định dùng lớp của SV
-                    effective_class_id = (
-                        str(best_match.class_id) if best_match.class_id is not None else None
-                    )
-
-            # Lưu điểm danh
-            attendance_id = _upsert_attendance_compatible(
-                db,
-                student=best_match,
-                session_id=session_id,
-                class_id=effective_class_id,
-                checkin_at=checkin_at,
-                status=status_value,
-                confidence=float(best_similarity),
-            )
-            created_count += 1
+                upsert_started = time.perf_counter()
+                attendance_id, created = await db.run(
+                    _upsert_attendance_compatible,
+                    student=best_match,
+                    session_id=session_id,
+                    class_id=effective_class_id,
+                    checkin_at=checkin_at,
+                    status=status_value,
+                    confidence=float(best_similarity),
+                )
+                face_stage_seconds.observe(time.perf_counter() - upsert_started, stage="upsert")
+                face_checkin_total.inc(result="saved")
+                # Chỉ đếm dòng thực sự được thêm (lượt ghi lô của write-behind chưa biết kết quả)
+                if created:
+                    created_count += 1
+                _publish_checkin(
+                    student=asdict(best_match),
+                    session_id=session_id,
+                    class_id=effective_class_id,
+                    checkin_at=checkin_at,
+                    status=status_value,
+                    confidence=float(best_similarity),
+                    attendance_id=attendance_id,
+                )
+            if ctx is not None:
+                ctx.checked_in[best_match.student_id] = summary_status(status_value)
 
             attendances.append(
                 AttendanceRecordResponse(
@@ -403,13 +814,11 @@ async def checkin_by_face(
                     student_id=best_match.student_id,
                     student_name=best_match.name,
                     student_email=best_match.email,
-                    class_id=effective_class_id
-                    if effective_class_id is not None
-                    else (str(best_match.class_id) if best_match.class_id is not None else None),
+                    class_id=effective_class_id,
                     session_id=session_id,
-                    session_date=session_row.session_date if session_row is not None else None,
-                    start_time=session_row.start_time if session_row is not None else None,
-                    end_time=session_row.end_time if session_row is not None else None,
+                    session_date=ctx.session_date if ctx is not None else None,
+                    start_time=ctx.start_time if ctx is not None else None,
+                    end_time=ctx.end_time if ctx is not None else None,
                     checkin_time=checkin_at,
                     attendance_date=checkin_at.date(),
                     attendance_time=checkin_at.time().replace(microsecond=0),
@@ -424,7 +833,8 @@ async def checkin_by_face(
             recognized_count=len(attendances),
             attendances_created=created_count,
             attendances=attendances,
-            message=f"Checked in {len(attendances)} student(s)",
+            message=f"Checked in {len(attendances)} student(s)"
+            + (f" ({queued_count} queued)" if queued_count else ""),
         )
 
     except HTTPException:
@@ -433,17 +843,24 @@ async def checkin_by_face(
         raise HTTPException(status_code=500, detail=f"Error checkin by face: {str(e)}")
 
 
-@router.get("/report", response_model=List[AttendanceRecordResponse])
-def get_attendance_report(
-    class_id: Optional[str] = None,
-    class_ids: Optional[str] = None,
-    date: Optional[str] = None,
-    session_id: Optional[int] = None,
-    db: Session = Depends(db_service.get_db),
-):
-    """Lấy dữ liệu điểm danh để báo cáo."""
-    _ensure_attendance_table(db)
-    cols = _get_table_columns(db, "attendance")
+ReportRowMapper = Callable[[Any], Dict[str, Any]]
+
+
+def _build_report_query(
+    db: Session,
+    *,
+    class_id: Optional[str],
+    class_ids: Optional[str],
+    date: Optional[str],
+    session_id: Optional[int],
+) -> Tuple[str, Dict[str, Any], ReportRowMapper, ReportScope]:
+    """Dựng câu SQL báo cáo theo schema hiện có.
+
+    Trả về (sql, params, mapper, scope) - mapper chuyển 1 dòng kết quả thành dict theo AttendanceRecordResponse,
+    scope là phạm vi (session, lớp, ngày) của report để invalidate cache.
+    Dùng chung cho /report (trả JSON) và /report/export (stream CSV/NDJSON).
+    """
+    cols = _get_attendance_columns(db)
 
     # Ưu tiên báo cáo theo session_id (đầy đủ môn học + giờ học + vắng)
     if session_id is not None:
@@ -515,103 +932,92 @@ def get_attendance_report(
         # Nếu attendance có schema checkin_time + session_id
         if "session_id" in cols and "checkin_time" in cols:
             conf_select = "a.recognition_confidence" if "recognition_confidence" in cols else "NULL"
-            rows = db.execute(
-                text(
-                    f"""
-                    SELECT
-                        a.attendance_id,
-                        st.student_id,
-                        st.name as student_name,
-                        st.email as student_email,
-                        st.class_id as class_id,
-                        c.class_name as class_name,
-                        c.subject_name as subject_name,
-                        :session_id as session_id,
-                        :session_date as session_date,
-                        :start_time as start_time,
-                        :end_time as end_time,
-                        a.checkin_time,
-                        CASE
-                            WHEN a.attendance_id IS NULL THEN 'ABSENT'
-                            WHEN a.checkin_time <= (TIMESTAMP(:session_date, :start_time) + INTERVAL 15 MINUTE) THEN 'ON_TIME'
-                            ELSE 'LATE'
-                        END as status,
-                        {conf_select} as recognition_confidence
-                    FROM students st
-                    LEFT JOIN classes c ON c.class_id = st.class_id
-                    LEFT JOIN attendance a
-                        ON a.student_id = st.student_id AND a.session_id = :session_id
-                    WHERE st.class_id IN ({in_sql})
-                    ORDER BY st.class_id ASC, st.student_id ASC
-                    """
-                ),
-                base_params,
-            ).fetchall()
+            sql = f"""
+                SELECT
+                    a.attendance_id,
+                    st.student_id,
+                    st.name as student_name,
+                    st.email as student_email,
+                    st.class_id as class_id,
+                    c.class_name as class_name,
+                    c.subject_name as subject_name,
+                    :session_id as session_id,
+                    :session_date as session_date,
+                    :start_time as start_time,
+                    :end_time as end_time,
+                    a.checkin_time,
+                    CASE
+                        WHEN a.attendance_id IS NULL THEN 'ABSENT'
+                        WHEN a.checkin_time <= (TIMESTAMP(:session_date, :start_time) + INTERVAL 15 MINUTE) THEN 'ON_TIME'
+                        ELSE 'LATE'
+                    END as status,
+                    {conf_select} as recognition_confidence
+                FROM students st
+                LEFT JOIN classes c ON c.class_id = st.class_id
+                LEFT JOIN attendance a
+                    ON a.student_id = st.student_id AND a.session_id = :session_id
+                WHERE st.class_id IN ({in_sql})
+                ORDER BY st.class_id ASC, st.student_id ASC
+            """
         # Nếu attendance dùng schema attendance_date + attendance_time (setup_database.py)
         elif "attendance_date" in cols and "attendance_time" in cols and "class_id" in cols:
             conf_select = "a.recognition_confidence" if "recognition_confidence" in cols else "NULL"
             # id có thể là 'id'
-            rows = db.execute(
-                text(
-                    f"""
-                    SELECT
-                        a.id as attendance_id,
-                        st.student_id,
-                        st.name as student_name,
-                        st.email as student_email,
-                        st.class_id as class_id,
-                        c.class_name as class_name,
-                        c.subject_name as subject_name,
-                        :session_id as session_id,
-                        :session_date as session_date,
-                        :start_time as start_time,
-                        :end_time as end_time,
-                        CASE
-                            WHEN a.id IS NULL THEN NULL
-                            ELSE TIMESTAMP(a.attendance_date, a.attendance_time)
-                        END as checkin_time,
-                        CASE
-                            WHEN a.id IS NULL THEN 'ABSENT'
-                            WHEN TIMESTAMP(a.attendance_date, a.attendance_time) <= (TIMESTAMP(:session_date, :start_time) + INTERVAL 15 MINUTE) THEN 'ON_TIME'
-                            ELSE 'LATE'
-                        END as status,
-                        {conf_select} as recognition_confidence
-                    FROM students st
-                    LEFT JOIN classes c ON c.class_id = st.class_id
-                    LEFT JOIN attendance a
-                        ON a.student_id = st.student_id
-                        AND a.class_id = st.class_id
-                        AND a.attendance_date = :session_date
-                    WHERE st.class_id IN ({in_sql})
-                    ORDER BY st.class_id ASC, st.student_id ASC
-                    """
-                ),
-                base_params,
-            ).fetchall()
+            sql = f"""
+                SELECT
+                    a.id as attendance_id,
+                    st.student_id,
+                    st.name as student_name,
+                    st.email as student_email,
+                    st.class_id as class_id,
+                    c.class_name as class_name,
+                    c.subject_name as subject_name,
+                    :session_id as session_id,
+                    :session_date as session_date,
+                    :start_time as start_time,
+                    :end_time as end_time,
+                    CASE
+                        WHEN a.id IS NULL THEN NULL
+                        ELSE TIMESTAMP(a.attendance_date, a.attendance_time)
+                    END as checkin_time,
+                    CASE
+                        WHEN a.id IS NULL THEN 'ABSENT'
+                        WHEN TIMESTAMP(a.attendance_date, a.attendance_time) <= (TIMESTAMP(:session_date, :start_time) + INTERVAL 15 MINUTE) THEN 'ON_TIME'
+                        ELSE 'LATE'
+                    END as status,
+                    {conf_select} as recognition_confidence
+                FROM students st
+                LEFT JOIN classes c ON c.class_id = st.class_id
+                LEFT JOIN attendance a
+                    ON a.student_id = st.student_id
+                    AND a.class_id = st.class_id
+                    AND a.attendance_date = :session_date
+                WHERE st.class_id IN ({in_sql})
+                ORDER BY st.class_id ASC, st.student_id ASC
+            """
         else:
             raise HTTPException(status_code=400, detail="Attendance schema không hỗ trợ report theo session")
 
-        result: List[AttendanceRecordResponse] = []
-        for r in rows:
-            result.append(
-                AttendanceRecordResponse(
-                    attendance_id=r[0],
-                    student_id=r[1],
-                    student_name=r[2],
-                    student_email=r[3],
-                    class_id=r[4],
-                    class_name=r[5],
-                    subject_name=r[6],
-                    session_id=r[7],
-                    session_date=r[8],
-                    start_time=r[9],
-                    end_time=r[10],
-                    checkin_time=r[11],
-                    status=_status_to_vi(r[12]),
-                    recognition_confidence=r[13],
-                )
-            )
-        return result
+        def map_session_row(r: Any) -> Dict[str, Any]:
+            return {
+                "attendance_id": r[0],
+                "student_id": r[1],
+                "student_name": r[2],
+                "student_email": r[3],
+                "class_id": r[4],
+                "class_name": r[5],
+                "subject_name": r[6],
+                "session_id": r[7],
+                "session_date": r[8],
+                "start_time": r[9],
+                "end_time": r[10],
+                "checkin_time": r[11],
+                "status": _status_to_vi(r[12]),
+                "recognition_confidence": r[13],
+            }
+
+        scope = ReportScope(session_id=sid, class_ids=frozenset(target_class_ids), day=sdate)
+        return sql, base_params, map_session_row, scope
 
     where: List[str] = []
     params: Dict[str, Any] = {}
@@ -627,86 +1033,223 @@ def get_attendance_report(
 
         where_sql = ("WHERE " + " AND ".join(where)) if where else ""
 
-        rows = db.execute(
-            text(
-                f"""
-                SELECT
-                    a.id as attendance_id,
-                    a.student_id,
-                    s.name as student_name,
-                    s.email as student_email,
-                    s.class_id as student_class_id,
-                    a.class_id as attendance_class_id,
-                    a.attendance_date,
-                    a.attendance_time,
-                    a.status,
-                    a.recognition_confidence
-                FROM attendance a
-                LEFT JOIN students s ON s.student_id = a.student_id
-                {where_sql}
-                ORDER BY a.attendance_date DESC, a.attendance_time DESC
-                """
-            ),
-            params,
-        ).fetchall()
-
-        result: List[AttendanceRecordResponse] = []
-        for r in rows:
-            result.append(
-                AttendanceRecordResponse(
-                    attendance_id=r[0],
-                    student_id=r[1],
-                    student_name=r[2],
-                    student_email=r[3],
-                    class_id=r[5] if r[5] is not None else r[4],
-                    attendance_date=r[6],
-                    attendance_time=r[7],
-                    status=_status_to_vi(r[8]),
-                    recognition_confidence=r[9],
-                )
-            )
-        return result
-
-    # schema checkin_time
-    if date:
-        where.append("DATE(a.checkin_time) = :today")
-        params["today"] = date
-
-    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
-
-    rows = db.execute(
-        text(
-            f"""
+        sql = f"""
             SELECT
-                a.attendance_id,
+                a.id as attendance_id,
                 a.student_id,
                 s.name as student_name,
                 s.email as student_email,
-                s.class_id as class_id,
-                a.session_id,
-                a.checkin_time,
-                a.status
+                s.class_id as student_class_id,
+                a.class_id as attendance_class_id,
+                a.attendance_date,
+                a.attendance_time,
+                a.status,
+                a.recognition_confidence
             FROM attendance a
             LEFT JOIN students s ON s.student_id = a.student_id
             {where_sql}
-            ORDER BY a.checkin_time DESC
-            """
-        ),
-        params,
-    ).fetchall()
-
-    result: List[AttendanceRecordResponse] = []
-    for r in rows:
-        result.append(
-            AttendanceRecordResponse(
-                attendance_id=r[0],
-                student_id=r[1],
-                student_name=r[2],
-                student_email=r[3],
-                class_id=r[4],
-                session_id=r[5],
-                checkin_time=r[6],
-                status=_status_to_vi(r[7]),
-            )
+            ORDER BY a.attendance_date DESC, a.attendance_time DESC
+        """
+
+        def map_date_row(r: Any) -> Dict[str, Any]:
+            return {
+                "attendance_id": r[0],
+                "student_id": r[1],
+                "student_name": r[2],
+                "student_email": r[3],
+                "class_id": r[5] if r[5] is not None else r[4],
+                "attendance_date": r[6],
+                "attendance_time": r[7],
+                "status": _status_to_vi(r[8]),
+                "recognition_confidence": r[9],
+            }
+
+        scope = ReportScope(
+            class_ids=frozenset([str(class_id)]) if "class_id" in params else None,
+            day=_parse_day(date),
         )
+        return sql, params, map_date_row, scope
+
+    # schema checkin_time
+    if date:
+        # Khoảng nửa mở [ngày, ngày+1) để dùng được index trên checkin_time
+        try:
+            day = date_type.fromisoformat(date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="date phải có dạng YYYY-MM-DD")
+        where.append("a.checkin_time >= :day_start AND a.checkin_time < :day_end")
+        params["day_start"] = day
+        params["day_end"] = day + timedelta(days=1)
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+    sql = f"""
+        SELECT
+            a.attendance_id,
+            a.student_id,
+            s.name as student_name,
+            s.email as student_email,
+            s.class_id as class_id,
+            a.session_id,
+            a.checkin_time,
+            a.status
+        FROM attendance a
+        LEFT JOIN students s ON s.student_id = a.student_id
+        {where_sql}
+        ORDER BY a.checkin_time DESC
+    """
+
+    def map_checkin_row(r: Any) -> Dict[str, Any]:
+        return {
+            "attendance_id": r[0],
+            "student_id": r[1],
+            "student_name": r[2],
+            "student_email": r[3],
+            "class_id": r[4],
+            "session_id": r[5],
+            "checkin_time": r[6],
+            "status": _status_to_vi(r[7]),
+        }
+
+    return sql, params, map_checkin_row, ReportScope(day=params.get("day_start"))
+
+
+@router.get("/report", response_model=List[AttendanceRecordResponse])
+def get_attendance_report(
+    class_id: Optional[str] = None,
+    class_ids: Optional[str] = None,
+    date: Optional[str] = None,
+    session_id: Optional[int] = None,
+    db: Session = Depends(db_service.get_read_db),
+):
+    """Lấy dữ liệu điểm danh để báo cáo (cache theo phạm vi, tự bỏ khi có điểm danh mới)."""
+    cache_key = (session_id, class_id, tuple(sorted(_parse_class_ids(class_ids))), date)
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
+    generation = report_cache.generation()
+    sql, params, mapper, scope = _build_report_query(
+        db, class_id=class_id, class_ids=class_ids, date=date, session_id=session_id
+    )
+    rows = db.execute(text(sql), params).fetchall()
+    result = [AttendanceRecordResponse(**mapper(r)) for r in rows]
+    # Đọc từ replica: chưa cache khi vừa có ghi (replica có thể chưa kịp đồng bộ)
+    settle = REPORT_CACHE_REPLICA_LAG if db_service.has_read_replica else 0.0
+    report_cache.put(cache_key, scope, tuple(result), generation, settle_seconds=settle)
     return result
+
+
+# Thứ tự cột khi export CSV (giống AttendanceRecordResponse)
+EXPORT_FIELDS = list(AttendanceRecordResponse.model_fields.keys())
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date_type, time_type)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        # PyMySQL trả cột TIME dạng timedelta
+        return str(value)
+    return value
+
+
+def _stream_report_rows(sql: str, params: Dict[str, Any], mapper: ReportRowMapper, fmt: str) -> Iterator[str]:
+    """Đọc bằng server-side cursor (stream_results) và ghi ra từng chunk CSV/NDJSON."""
+    with db_service.read_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_CHUNK_ROWS).execute(
+            text(sql), params
+        )
+
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(EXPORT_FIELDS)
+            yield buf.getvalue()
+
+        for rows in result.partitions(EXPORT_CHUNK_ROWS):
+            buf = io.StringIO()
+            if fmt == "csv":
+                writer = csv.writer(buf)
+                for r in rows:
+                    record = mapper(r)
+                    writer.writerow(
+                        ["" if record.get(f) is None else _export_value(record.get(f)) for f in EXPORT_FIELDS]
+                    )
+            else:
+                for r in rows:
+                    record = mapper(r)
+                    buf.write(
+                        json.dumps({f: _export_value(record.get(f)) for f in EXPORT_FIELDS}, ensure_ascii=False)
+                    )
+                    buf.write("\n")
+            yield buf.getvalue()
+
+
+@router.get("/report/export")
+def export_attendance_report(
+    format: str = "csv",
+    class_id: Optional[str] = None,
+    class_ids: Optional[str] = None,
+    date: Optional[str] = None,
+    session_id: Optional[int] = None,
+    db: Session = Depends(db_service.get_read_db),
+):
+    """Xuất báo cáo điểm danh dạng CSV/NDJSON, stream từng chunk (RAM không tăng theo số dòng)."""
+    fmt = format.lower()
+    if fmt not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    sql, params, mapper, _ = _build_report_query(
+        db, class_id=class_id, class_ids=class_ids, date=date, session_id=session_id
+    )
+    # Trả connection của request ngay, phần stream dùng connection riêng
+    db.close()
+
+    media_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    filename = f"attendance_report.{fmt}"
+    return StreamingResponse(
+        _stream_report_rows(sql, params, mapper, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@router.get("/stats", response_model=AttendanceStatsResponse)
+def get_attendance_stats(
+    date_from: Optional[date_type] = None,
+    date_to: Optional[date_type] = None,
+    class_id: Optional[str] = None,
+    class_ids: Optional[str] = None,
+    db: Session = Depends(db_service.get_read_db),
+):
+    """Thống kê đúng giờ/trễ/vắng theo SV, lớp và buổi (tính bằng SQL)."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from phải trước date_to")
+
+    target_class_ids = _parse_class_ids(class_ids) or ([str(class_id)] if class_id is not None else [])
+    cols = _get_attendance_columns(db)
+    _ensure_session_classes_table(db)
+    try:
+        stats = compute_attendance_stats(
+            db, cols, date_from=date_from, date_to=date_to, class_ids=target_class_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return AttendanceStatsResponse(**stats)
+
+
+@router.get("/stats/daily", response_model=List[DailyAttendanceSummary])
+def get_daily_attendance_summary(
+    date_from: Optional[date_type] = None,
+    date_to: Optional[date_type] = None,
+    class_id: Optional[str] = None,
+    class_ids: Optional[str] = None,
+    db: Session = Depends(db_service.get_read_db),
+):
+    """Số lượt đúng giờ/trễ theo lớp và ngày, đọc từ bảng attendance_daily_summary."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from phải trước date_to")
+
+    target_class_ids = _parse_class_ids(class_ids) or ([str(class_id)] if class_id is not None else [])
+    rows = load_daily_summary(db, date_from=date_from, date_to=date_to, class_ids=target_class_ids)
+    return [DailyAttendanceSummary(**r) for r in rows]
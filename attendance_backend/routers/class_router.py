@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from sqlalchemy.orm import Session
+from typing import Optional
+from services.bulk_import import import_records
 from services.database_service import db_service
+from services.report_cache import report_cache
 from models.class_model import Class
 from models.class_schema import ClassCreate
 
@@ -29,6 +32,33 @@ def create_class(data: ClassCreate, db: Session = Depends(db_service.get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Lỗi tạo lớp học: {str(e)}")
 
+@router.post("/import")
+def import_classes(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    db: Session = Depends(db_service.get_db)
+):
+    """Import lớp học từ CSV/NDJSON (cột: class_id, class_name, subject_name, lecturer_name)"""
+    try:
+        result = import_records(
+            db,
+            file,
+            fmt=format,
+            schema=ClassCreate,
+            table="classes",
+            key="class_id",
+            columns=["class_id", "class_name", "subject_name", "lecturer_name"],
+        )
+        # Tên lớp / môn học hiển thị trong report
+        if result["updated"]:
+            report_cache.clear()
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Lỗi import lớp học: {str(e)}")
+
 @router.get("/")
 def get_classes(db: Session = Depends(db_service.get_db)):
     """Lấy danh sách tất cả lớp học"""
@@ -2,18 +2,38 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import cv2
 import numpy as np
 import io
 import json
+import zipfile
 
-from services.database_service import db_service
 from models.student import Student
+from services.async_database import DBRunner, get_db_runner
+from services.bulk_enroll import enroll_faces_bulk
+from services.face_encoding_store import delete_face_encodings, save_face_encoding
+from services.face_gallery import face_gallery
 from services.face_service import face_service, extract_face_encoding
+from services.reencode_job import reencode_job
 
 router = APIRouter(prefix="/api/face", tags=["face-recognition"])
 
+
+def _find_student(db: Session, student_id: str) -> Optional[Student]:
+    return db.query(Student).filter(Student.student_id == student_id).first()
+
+
+def _save_enrollment(db: Session, student: Student, face_encoding: np.ndarray) -> Dict[str, Any]:
+    save_face_encoding(db, student, face_encoding)
+    db.commit()
+    return student.to_dict()
+
+
+def _remove_enrollment(db: Session, student: Student) -> None:
+    delete_face_encodings(db, student)
+    db.commit()
+
 @router.post("/detect", response_model=Dict[str, Any])
 async def detect_faces_endpoint(file: UploadFile = File(...)):
     """API phát hiện khuôn mặt trong ảnh"""
@@ -42,7 +62,7 @@ async def detect_faces_endpoint(file: UploadFile = File(...)):
 @router.post("/recognize")
 async def recognize_faces_endpoint(
     file: UploadFile = File(...),
-    db: Session = Depends(db_service.get_db)
+    db: DBRunner = Depends(get_db_runner)
 ):
     """API nhận diện khuôn mặt và trả về thông tin sinh viên"""
     try:
@@ -66,8 +86,8 @@ async def recognize_faces_endpoint(
                 "message": "No faces detected"
             }
         
-        # Get all students with face encodings
-        students = db.query(Student).filter(Student.face_encoding.isnot(None)).all()
+        # Gallery encoding của sinh viên (nạp 1 lần, dùng lại giữa các request)
+        await face_gallery.ensure_loaded_async(db)
         
         recognized_students = []
         
@@ -79,22 +99,8 @@ async def recognize_faces_endpoint(
                 recognized_students.append(None)
                 continue
             
-            best_match = None
-            best_similarity = 0.0
-            
             # Compare with all known students
-            for student in students:
-                student_encoding = student.get_face_encoding()
-                if student_encoding is None:
-                    continue
-                
-                is_match, similarity = face_service.compare_faces(
-                    face_encoding, student_encoding, threshold=0.7
-                )
-                
-                if is_match and similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = student
+            best_match, best_similarity = face_gallery.match(face_encoding, threshold=0.7)
             
             if best_match:
                 recognized_students.append({
@@ -130,7 +136,7 @@ async def recognize_faces_endpoint(
 @router.post("/recognize-with-image")
 async def recognize_faces_with_image_endpoint(
     file: UploadFile = File(...),
-    db: Session = Depends(db_service.get_db)
+    db: DBRunner = Depends(get_db_runner)
 ):
     """API nhận diện khuôn mặt và trả về ảnh có khoanh vùng + thông tin"""
     try:
@@ -154,8 +160,8 @@ async def recognize_faces_with_image_endpoint(
                 headers={"X-Faces-Count": "0", "X-Recognized-Count": "0"}
             )
         
-        # Get all students with face encodings
-        students = db.query(Student).filter(Student.face_encoding.isnot(None)).all()
+        # Gallery encoding của sinh viên (nạp 1 lần, dùng lại giữa các request)
+        await face_gallery.ensure_loaded_async(db)
         
         recognized_students = []
         
@@ -167,22 +173,8 @@ async def recognize_faces_with_image_endpoint(
                 recognized_students.append(None)
                 continue
             
-            best_match = None
-            best_similarity = 0.0
-            
             # Compare with all known students
-            for student in students:
-                student_encoding = student.get_face_encoding()
-                if student_encoding is None:
-                    continue
-                
-                is_match, similarity = face_service.compare_faces(
-                    face_encoding, student_encoding, threshold=0.7
-                )
-                
-                if is_match and similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = student
+            best_match, best_similarity = face_gallery.match(face_encoding, threshold=0.7)
             
             if best_match:
                 recognized_students.append({
@@ -218,12 +210,12 @@ async def recognize_faces_with_image_endpoint(
 async def enroll_student_face(
     student_id: str,
     file: UploadFile = File(...),
-    db: Session = Depends(db_service.get_db)
+    db: DBRunner = Depends(get_db_runner)
 ):
     """API đăng ký khuôn mặt cho sinh viên"""
     try:
         # Find student
-        student = db.query(Student).filter(Student.student_id == student_id).first()
+        student = await db.run(_find_student, student_id)
         if not student:
             raise HTTPException(status_code=404, detail="Student not found")
         
@@ -236,34 +228,52 @@ async def enroll_student_face(
             raise HTTPException(status_code=400, detail="No face detected in image")
         
         # Save encoding
-        student.set_face_encoding(face_encoding)
-        db.commit()
+        student_data = await db.run(_save_enrollment, student, face_encoding)
+        face_gallery.invalidate()
         
         return {
             "success": True,
             "message": f"Face enrolled successfully for student {student_id}",
-            "student": student.to_dict()
+            "student": student_data
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error enrolling face: {str(e)}")
 
+@router.post("/enroll-bulk")
+async def enroll_faces_bulk_endpoint(
+    files: List[UploadFile] = File(...),
+    batch_size: int = 50,
+    db: DBRunner = Depends(get_db_runner)
+):
+    """API đăng ký khuôn mặt hàng loạt (1 file ZIP hoặc nhiều ảnh, tên file = student_id)"""
+    if batch_size < 1 or batch_size > 500:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 500")
+
+    try:
+        return await enroll_faces_bulk(db, files, batch_size=batch_size)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid ZIP file")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error enrolling faces: {str(e)}")
+
 @router.delete("/enroll/{student_id}")
 async def remove_student_face(
     student_id: str,
-    db: Session = Depends(db_service.get_db)
+    db: DBRunner = Depends(get_db_runner)
 ):
     """API xóa khuôn mặt đã đăng ký của sinh viên"""
     try:
-        student = db.query(Student).filter(Student.student_id == student_id).first()
+        student = await db.run(_find_student, student_id)
         if not student:
             raise HTTPException(status_code=404, detail="Student not found")
         
-        student.face_encoding = None
-        db.commit()
+        await db.run(_remove_enrollment, student)
+        face_gallery.invalidate()
         
         return {
             "success": True,
@@ -273,5 +283,31 @@ async def remove_student_face(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error removing face: {str(e)}")
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error removing face: {str(e)}")
+
+@router.post("/reencode")
+async def start_reencode_job(chunk_size: int = 200, start_after: Optional[str] = None):
+    """Chạy nền job tạo lại encoding (từ face_image) cho SV có encoding version cũ"""
+    if chunk_size < 1 or chunk_size > 2000:
+        raise HTTPException(status_code=400, detail="chunk_size must be between 1 and 2000")
+
+    if not reencode_job.start(chunk_size=chunk_size, start_after=start_after):
+        raise HTTPException(status_code=409, detail="Re-encode job is already running")
+
+    return {
+        "success": True,
+        "message": "Re-encode job started",
+        "job": reencode_job.status()
+    }
+
+@router.get("/reencode/status")
+async def get_reencode_status():
+    """Tiến độ job re-encode"""
+    return reencode_job.status()
+
+@router.post("/reencode/cancel")
+async def cancel_reencode_job():
+    """Dừng job re-encode sau chunk hiện tại (chạy lại sẽ tiếp tục phần còn thiếu)"""
+    reencode_job.cancel()
+    return {"success": True, "job": reencode_job.status()}
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.database import engine, read_engine
+from app.sql_logging import sql_stats
+from services.attendance_queue import attendance_queue
+from services.face_gallery import face_gallery
+from services.live_feed import live_feed
+from services.metrics import metrics
+from services.report_cache import report_cache
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _checked_out(target) -> float:
+    pool = target.pool
+    return float(pool.checkedout()) if hasattr(pool, "checkedout") else 0.0
+
+
+# Gauge đọc trạng thái lúc scrape
+metrics.gauge("face_gallery_size", "Số sinh viên có encoding trong gallery", lambda: face_gallery.size)
+metrics.gauge("attendance_queue_depth", "Số bản ghi đang chờ trong write-behind queue", attendance_queue.depth)
+metrics.gauge("live_feed_subscribers", "Số client SSE đang theo dõi check-in", live_feed.subscriber_count)
+metrics.gauge("db_pool_checked_out", "Số kết nối DB chính đang được dùng", lambda: _checked_out(engine))
+metrics.gauge("db_read_pool_checked_out", "Số kết nối DB đọc (replica) đang được dùng", lambda: _checked_out(read_engine))
+
+# Counter đọc từ bộ đếm sẵn có của các service (chỉ tăng, dùng được với rate())
+metrics.counter(
+    "attendance_queue_spooled_total", "Số bản ghi write-behind đã phải ghi ra spool",
+    lambda: attendance_queue.stats()["spooled"],
+)
+metrics.counter("report_cache_hits_total", "Số lần /report trả từ cache", lambda: report_cache.hits)
+metrics.counter("report_cache_misses_total", "Số lần /report phải query DB", lambda: report_cache.misses)
+metrics.counter(
+    "sql_statements_total", "Số câu SQL đã chạy (khi SQL_LOG_MODE khác off)", lambda: sql_stats["statements"]
+)
+metrics.counter("sql_slow_statements_total", "Số câu SQL vượt SQL_SLOW_MS", lambda: sql_stats["slow"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Metrics dạng text Prometheus của worker hiện tại."""
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -7,10 +7,12 @@ from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session as DBSession
 from typing import List, Optional
-from app.database import SessionLocal
+from app.database import get_db
 from models.session_model import Session as SessionModel
 from models.session_class_model import SessionClass
 from schemas.session_schema import SessionCreate, SessionResponse, SessionUpdate
+from services.report_cache import report_cache
+from services.session_context import session_contexts
 
 router = APIRouter(prefix="/sessions", tags=["Sessions"])
 
@@ -77,13 +79,6 @@ def _get_class_ids_for_session(db: DBSession, session_id: int) -> List[str]:
     ).fetchall()
     return [str(r[0]) for r in rows]
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=SessionResponse)
 def create_session(data: SessionCreate, db: DBSession = Depends(get_db)):
     target_class_ids = _normalize_class_ids(data.class_id, data.class_ids)
@@ -186,6 +181,10 @@ def update_session(session_id: int, data: SessionUpdate, db: DBSession = Depends
             )
         db.commit()
 
+    # Giờ học/lớp đã đổi => bỏ context điểm danh đang cache
+    session_contexts.invalidate(session_id)
+    report_cache.invalidate_session(session_id)
+
     class_ids = _get_class_ids_for_session(db, session_id)
     if not class_ids and getattr(session, "class_id", None):
         class_ids = [str(session.class_id)]
@@ -201,4 +200,6 @@ def delete_session(session_id: int, db: DBSession = Depends(get_db)):
     
     db.delete(session)
     db.commit()
+    session_contexts.invalidate(session_id)
+    report_cache.invalidate_session(session_id)
     return {"message": "Session deleted successfully"}
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from fastapi.responses import Response
 from sqlalchemy.orm import Session
+from services.bulk_import import import_records, timestamp_values
 from services.database_service import db_service
+from services.face_encoding_store import save_face_encoding
+from services.face_gallery import face_gallery
 from services.face_service import extract_face_encoding
+from services.report_cache import report_cache
 from models.student import Student
 from schemas.student_schema import StudentCreate, StudentResponse, StudentUpdate
-from typing import List
+from typing import List, Optional
 router = APIRouter(prefix="/students", tags=["Students"])
 
+# Các cột SV được cache trong face_gallery (GalleryEntry)
+GALLERY_FIELDS = {"name", "email", "class_id"}
+
 
 @router.post("/", response_model=StudentResponse)
 def create_student(student: StudentCreate, db: Session = Depends(db_service.get_db)):
@@ -22,6 +29,8 @@ def create_student(student: StudentCreate, db: Session = Depends(db_service.get_
         db.add(new_student)
         db.commit()
         db.refresh(new_student)
+        # Roster của lớp thay đổi => report theo lớp/session đó cũ
+        report_cache.invalidate_classes([new_student.class_id])
 
         return new_student
     except HTTPException:
@@ -31,6 +40,37 @@ def create_student(student: StudentCreate, db: Session = Depends(db_service.get_
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating student: {str(e)}")
 
+@router.post("/import")
+def import_students(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    db: Session = Depends(db_service.get_db)
+):
+    """Import danh sách sinh viên từ CSV/NDJSON (cột: student_id, name, email, phone, class_id; cột vắng mặt giữ nguyên)"""
+    try:
+        result = import_records(
+            db,
+            file,
+            fmt=format,
+            schema=StudentCreate,
+            table="students",
+            key="student_id",
+            columns=["student_id", "name", "email", "phone", "class_id"],
+            extra_values=timestamp_values(),
+            insert_only=["created_at"],
+        )
+        # Có thể đổi lớp của SV đã đăng ký khuôn mặt
+        if result["updated"]:
+            face_gallery.invalidate()
+        if result["inserted"] or result["updated"]:
+            report_cache.clear()
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error importing students: {str(e)}")
+
 @router.get("/", response_model=List[StudentResponse])
 def get_students(db: Session = Depends(db_service.get_db)):
     """Lấy danh sách tất cả sinh viên"""
@@ -59,6 +99,7 @@ def update_student(student_id: str, student_data: StudentUpdate, db: Session = D
 
         # Cập nhật các trường được cung cấp
         update_data = student_data.model_dump(exclude_unset=True)
+        old_class_id = student.class_id
 
         for field, value in update_data.items():
             if hasattr(student, field):
@@ -71,6 +112,12 @@ def update_student(student_id: str, student_data: StudentUpdate, db: Session = D
         db.commit()
         db.refresh(student)
 
+        # Gallery giữ tên/email (trả về khi nhận diện) và lớp (partition) của SV
+        if GALLERY_FIELDS & update_data.keys():
+            face_gallery.invalidate()
+        # Tên/email/lớp hiển thị trong report của cả lớp cũ và mới
+        report_cache.invalidate_classes({old_class_id, student.class_id})
+
         return student
 
     except HTTPException:
@@ -88,8 +135,11 @@ def delete_student(student_id: str, db: Session = Depends(db_service.get_db)):
         if not student:
             raise HTTPException(status_code=404, detail="Student not found")
 
+        class_id = student.class_id
         db.delete(student)
         db.commit()
+        face_gallery.invalidate()
+        report_cache.invalidate_classes([class_id])
         return {"message": f"Student {student_id} deleted successfully"}
     except HTTPException:
         db.rollback()
@@ -125,9 +175,10 @@ async def upload_face(
             raise HTTPException(status_code=400, detail="No face detected in image. Please upload a clear photo with a visible face.")
 
         # Lưu encoding và face image sử dụng method từ model
-        student.set_face_encoding(encoding)
+        save_face_encoding(db, student, encoding)
         student.set_face_image(image_bytes)
         db.commit()
+        face_gallery.invalidate()
 
         return {
             "message": "Face encoding saved successfully",
@@ -33,3 +33,50 @@ class AttendanceCheckinByFaceResponse(BaseModel):
     attendances_created: int
     attendances: List[AttendanceRecordResponse]
     message: str
+
+
+class AttendanceStatsCounts(BaseModel):
+    total: int = 0
+    on_time: int = 0
+    late: int = 0
+    absent: int = 0
+    attendance_rate: float = 0.0
+    late_rate: float = 0.0
+    absent_rate: float = 0.0
+    # Trung bình số phút check-in so với start_time (âm = đến sớm)
+    avg_checkin_offset_minutes: Optional[float] = None
+
+
+class StudentAttendanceStats(AttendanceStatsCounts):
+    student_id: str
+    student_name: Optional[str] = None
+    class_id: Optional[str] = None
+
+
+class ClassAttendanceStats(AttendanceStatsCounts):
+    class_id: str
+    class_name: Optional[str] = None
+    sessions_count: int = 0
+
+
+class SessionAttendanceStats(AttendanceStatsCounts):
+    session_id: int
+    session_date: Optional[date] = None
+    start_time: Optional[time] = None
+
+
+class AttendanceStatsResponse(BaseModel):
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    students: List[StudentAttendanceStats]
+    classes: List[ClassAttendanceStats]
+    sessions: List[SessionAttendanceStats]
+
+
+class DailyAttendanceSummary(BaseModel):
+    class_id: str
+    summary_date: date
+    on_time: int = 0
+    late: int = 0
+    absent: int = 0
+    total: int = 0
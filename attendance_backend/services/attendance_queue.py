@@ -0,0 +1,236 @@
+"""
+Write-behind cho điểm danh (bật bằng ATTENDANCE_WRITE_BEHIND=1).
+
+- checkin_by_face đẩy bản ghi vào hàng đợi giới hạn và trả response ngay (bản ghi tạm, chưa có id).
+- Thread nền gom lô: mỗi ATTENDANCE_FLUSH_MS ms hoặc đủ ATTENDANCE_FLUSH_BATCH bản ghi thì ghi 1 transaction.
+- Lô lỗi => ghi lại từng bản ghi; bản ghi vẫn lỗi (hoặc còn trong hàng đợi lúc tắt server mà DB lỗi)
+  được ghi ra file spool JSONL và nạp lại ở lần khởi động sau.
+- Hàng đợi đầy => submit trả False, router ghi đồng bộ như cũ (không mất dữ liệu).
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_WRITE_BEHIND = os.getenv("ATTENDANCE_WRITE_BEHIND", "0").lower() in {"1", "true", "yes"}
+ATTENDANCE_QUEUE_MAX = int(os.getenv("ATTENDANCE_QUEUE_MAX", "10000"))
+ATTENDANCE_FLUSH_MS = int(os.getenv("ATTENDANCE_FLUSH_MS", "200"))
+ATTENDANCE_FLUSH_BATCH = int(os.getenv("ATTENDANCE_FLUSH_BATCH", "100"))
+ATTENDANCE_SPOOL_FILE = os.getenv("ATTENDANCE_SPOOL_FILE", "attendance_spool.jsonl")
+
+# Ghi 1 lô bản ghi trong 1 transaction (router đăng ký)
+FlushFn = Callable[[List[Dict[str, Any]]], None]
+
+
+class AttendanceWriteQueue:
+    def __init__(
+        self,
+        maxsize: int = ATTENDANCE_QUEUE_MAX,
+        flush_ms: int = ATTENDANCE_FLUSH_MS,
+        batch_size: int = ATTENDANCE_FLUSH_BATCH,
+        spool_path: str = ATTENDANCE_SPOOL_FILE,
+    ):
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=maxsize)
+        self._flush_ms = flush_ms
+        self._batch_size = batch_size
+        self._spool_path = spool_path
+        self._flush_fn: Optional[FlushFn] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "failed": 0,
+            "spooled": 0,
+            "rejected": 0,
+            "last_flush_ms": None,
+        }
+
+    def configure(self, flush_fn: FlushFn) -> None:
+        self._flush_fn = flush_fn
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.running,
+                "depth": self.depth(),
+                "max_depth": self._queue.maxsize,
+                **self._stats,
+            }
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def start(self) -> None:
+        if self.running or self._flush_fn is None:
+            return
+        self._replay_spool()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+        logger.info("✅ Attendance write-behind started")
+
+    def submit(self, item: Dict[str, Any]) -> bool:
+        """Đưa 1 bản ghi vào hàng đợi. False nếu không chạy hoặc hàng đợi đầy."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count("rejected")
+            return False
+        self._count("enqueued")
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Dừng thread, ghi nốt phần còn lại; DB lỗi thì ghi ra spool."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+        remaining = self._drain(self._queue.qsize())
+        while remaining:
+            batch, remaining = remaining[: self._batch_size], remaining[self._batch_size:]
+            self._flush(batch)
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        while len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        interval = self._flush_ms / 1000.0
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=interval)
+            except queue.Empty:
+                continue
+
+            # Gom lô tới khi đủ batch_size hoặc hết khung thời gian
+            batch = [first]
+            deadline = time.monotonic() + interval
+            while len(batch) < self._batch_size:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=wait))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            self._flush_fn(batch)
+            self._count("flushed", len(batch))
+        except Exception as e:
+            logger.warning(f"⚠️  Attendance batch flush failed ({len(batch)} item(s)): {e}")
+            # Ghi lại từng bản ghi để 1 dòng lỗi không kéo theo cả lô
+            failed: List[Dict[str, Any]] = []
+            for item in batch:
+                try:
+                    self._flush_fn([item])
+                    self._count("flushed")
+                except Exception:
+                    failed.append(item)
+            if failed:
+                self._count("failed", len(failed))
+                self._spool(failed)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    def _spool(self, items: List[Dict[str, Any]]) -> None:
+        try:
+            with open(self._spool_path, "a", encoding="utf-8") as f:
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            self._count("spooled", len(items))
+            logger.warning(f"⚠️  Spooled {len(items)} attendance record(s) to {self._spool_path}")
+        except OSError as e:
+            logger.error(f"❌ Cannot spool attendance records: {e}")
+
+    def _replay_spool(self) -> None:
+        """Nạp lại các bản ghi còn trong spool từ lần chạy trước.
+
+        Giữ file lock: nhiều worker khởi động cùng lúc thì chỉ 1 worker replay.
+        """
+        try:
+            lock_file = open(self._spool_path + ".lock", "a")
+        except OSError as e:
+            logger.error(f"❌ Cannot open attendance spool lock: {e}")
+            return
+        with lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return
+            self._replay_spool_locked()
+
+    def _replay_spool_locked(self) -> None:
+        replay_path = self._spool_path + ".replay"
+        if os.path.exists(self._spool_path):
+            if os.path.exists(replay_path):
+                # .replay còn lại do lần replay trước bị crash: gộp vào, không ghi đè
+                pending_path = f"{replay_path}.{os.getpid()}"
+                os.replace(self._spool_path, pending_path)
+                with open(pending_path, encoding="utf-8") as src, open(replay_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(pending_path)
+            else:
+                os.replace(self._spool_path, replay_path)
+        if not os.path.exists(replay_path):
+            return
+
+        items: List[Dict[str, Any]] = []
+        bad_lines: List[str] = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    # Dòng bị cắt dở khi crash: để riêng cho người kiểm tra, không chặn khởi động
+                    bad_lines.append(line if line.endswith("\n") else line + "\n")
+        if bad_lines:
+            with open(self._spool_path + ".bad", "a", encoding="utf-8") as f:
+                f.writelines(bad_lines)
+            logger.warning(f"⚠️  Moved {len(bad_lines)} unreadable spool line(s) to {self._spool_path}.bad")
+
+        logger.info(f"🔄 Replaying {len(items)} spooled attendance record(s)")
+        for i in range(0, len(items), self._batch_size):
+            self._flush(items[i : i + self._batch_size])
+        os.remove(replay_path)
+
+
+# Singleton instance
+attendance_queue = AttendanceWriteQueue()
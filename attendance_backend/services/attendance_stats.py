@@ -0,0 +1,198 @@
+"""
+Thống kê điểm danh bằng GROUP BY trong SQL (không tải dữ liệu thô về client).
+
+Danh sách SV cần có mặt của mỗi buổi = SV thuộc các lớp của session
+(session_classes, fallback sessions.class_id). Không có bản ghi attendance => vắng.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from services.session_context import LATE_AFTER_MINUTES
+
+
+def _session_filter(date_from: Optional[date], date_to: Optional[date], params: Dict[str, Any]) -> str:
+    conds: List[str] = []
+    if date_from is not None:
+        conds.append("s.session_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        conds.append("s.session_date <= :date_to")
+        params["date_to"] = date_to
+    return (" AND " + " AND ".join(conds)) if conds else ""
+
+
+def _roster_sql(
+    cols: Set[str],
+    *,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    class_ids: List[str],
+) -> Tuple[str, Dict[str, Any]]:
+    """Subquery: 1 dòng / (session, SV cần có mặt) kèm status và độ lệch check-in (phút)."""
+    params: Dict[str, Any] = {"late_after": LATE_AFTER_MINUTES}
+    session_where = _session_filter(date_from, date_to, params)
+
+    class_where = ""
+    if class_ids:
+        placeholders = []
+        for idx, cid in enumerate(class_ids):
+            params[f"cid{idx}"] = cid
+            placeholders.append(f":cid{idx}")
+        class_where = f"WHERE r.class_id IN ({', '.join(placeholders)})"
+
+    # Schema checkin_time + session_id
+    if "session_id" in cols and "checkin_time" in cols:
+        checkin_ts = "a.checkin_time"
+        join_attendance = "LEFT JOIN attendance a ON a.student_id = st.student_id AND a.session_id = r.session_id"
+        has_row = "a.attendance_id IS NOT NULL"
+    # Schema attendance_date + attendance_time (setup_database.py)
+    elif "attendance_date" in cols and "attendance_time" in cols and "class_id" in cols:
+        checkin_ts = "TIMESTAMP(a.attendance_date, a.attendance_time)"
+        join_attendance = """
+            LEFT JOIN attendance a
+                ON a.student_id = st.student_id
+                AND a.class_id = r.class_id
+                AND a.attendance_date = r.session_date
+        """
+        has_row = "a.id IS NOT NULL"
+    else:
+        raise ValueError("Attendance schema không hỗ trợ thống kê")
+
+    sql = f"""
+        SELECT
+            r.session_id,
+            r.session_date,
+            r.start_time,
+            r.class_id,
+            st.student_id,
+            st.name AS student_name,
+            CASE
+                WHEN NOT ({has_row}) THEN 'ABSENT'
+                WHEN {checkin_ts} <= (TIMESTAMP(r.session_date, r.start_time) + INTERVAL :late_after MINUTE) THEN 'ON_TIME'
+                ELSE 'LATE'
+            END AS status,
+            CASE
+                WHEN {has_row}
+                THEN TIMESTAMPDIFF(SECOND, TIMESTAMP(r.session_date, r.start_time), {checkin_ts}) / 60.0
+            END AS offset_minutes
+        FROM (
+            SELECT s.session_id, s.session_date, s.start_time, sc.class_id
+            FROM sessions s
+            JOIN session_classes sc ON sc.session_id = s.session_id
+            WHERE 1 = 1 {session_where}
+            UNION
+            SELECT s.session_id, s.session_date, s.start_time, s.class_id
+            FROM sessions s
+            WHERE s.class_id IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM session_classes sc WHERE sc.session_id = s.session_id)
+                {session_where}
+        ) r
+        JOIN students st ON st.class_id = r.class_id
+        {join_attendance}
+        {class_where}
+    """
+    return sql, params
+
+
+_COUNT_COLUMNS = """
+    COUNT(*) AS total,
+    SUM(CASE WHEN x.status = 'ON_TIME' THEN 1 ELSE 0 END) AS on_time,
+    SUM(CASE WHEN x.status = 'LATE' THEN 1 ELSE 0 END) AS late,
+    SUM(CASE WHEN x.status = 'ABSENT' THEN 1 ELSE 0 END) AS absent,
+    AVG(x.offset_minutes) AS avg_offset
+"""
+
+
+def _time_value(value: Any) -> Optional[time]:
+    """PyMySQL trả cột TIME dạng timedelta (tính từ 00:00)."""
+    if isinstance(value, timedelta):
+        return (datetime.min + value).time()
+    return value
+
+
+def _counts(total: Any, on_time: Any, late: Any, absent: Any, avg_offset: Any) -> Dict[str, Any]:
+    total = int(total or 0)
+    on_time, late, absent = int(on_time or 0), int(late or 0), int(absent or 0)
+
+    def rate(n: int) -> float:
+        return round(n / total, 4) if total else 0.0
+
+    return {
+        "total": total,
+        "on_time": on_time,
+        "late": late,
+        "absent": absent,
+        "attendance_rate": rate(on_time + late),
+        "late_rate": rate(late),
+        "absent_rate": rate(absent),
+        "avg_checkin_offset_minutes": round(float(avg_offset), 2) if avg_offset is not None else None,
+    }
+
+
+def compute_attendance_stats(
+    db: Session,
+    cols: Set[str],
+    *,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    class_ids: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Thống kê theo SV, theo lớp và theo buổi trong khoảng ngày."""
+    roster, params = _roster_sql(cols, date_from=date_from, date_to=date_to, class_ids=class_ids or [])
+
+    student_rows = db.execute(
+        text(
+            f"""
+            SELECT x.student_id, x.student_name, x.class_id, {_COUNT_COLUMNS}
+            FROM ({roster}) x
+            GROUP BY x.student_id, x.student_name, x.class_id
+            ORDER BY x.class_id, x.student_id
+            """
+        ),
+        params,
+    ).fetchall()
+
+    class_rows = db.execute(
+        text(
+            f"""
+            SELECT x.class_id, c.class_name, COUNT(DISTINCT x.session_id) AS sessions_count, {_COUNT_COLUMNS}
+            FROM ({roster}) x
+            LEFT JOIN classes c ON c.class_id = x.class_id
+            GROUP BY x.class_id, c.class_name
+            ORDER BY x.class_id
+            """
+        ),
+        params,
+    ).fetchall()
+
+    session_rows = db.execute(
+        text(
+            f"""
+            SELECT x.session_id, x.session_date, x.start_time, {_COUNT_COLUMNS}
+            FROM ({roster}) x
+            GROUP BY x.session_id, x.session_date, x.start_time
+            ORDER BY x.session_date, x.start_time, x.session_id
+            """
+        ),
+        params,
+    ).fetchall()
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "students": [
+            {"student_id": r[0], "student_name": r[1], "class_id": r[2], **_counts(*r[3:8])}
+            for r in student_rows
+        ],
+        "classes": [
+            {"class_id": r[0], "class_name": r[1], "sessions_count": int(r[2] or 0), **_counts(*r[3:8])}
+            for r in class_rows
+        ],
+        "sessions": [
+            {"session_id": r[0], "session_date": r[1], "start_time": _time_value(r[2]), **_counts(*r[3:8])}
+            for r in session_rows
+        ],
+    }
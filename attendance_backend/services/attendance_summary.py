@@ -0,0 +1,206 @@
+"""
+Bảng tổng hợp attendance_daily_summary: số lượt điểm danh theo (class_id, ngày, status).
+
+- Đường ghi check-in cập nhật dần (+1 status mới, -1 status cũ khi upsert đổi status).
+- rebuild_attendance_summary() tính lại từ bảng attendance (backfill / sửa lệch).
+Dashboard đọc bảng này thay vì quét toàn bộ attendance.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from models.attendance_summary_model import AttendanceDailySummary
+
+logger = logging.getLogger(__name__)
+
+# Chuẩn hoá status của 2 schema về 1 bộ khoá (giống _status_to_vi)
+_STATUS_SQL = """
+    CASE
+        WHEN UPPER(a.status) = 'LATE' THEN 'LATE'
+        WHEN UPPER(a.status) = 'ABSENT' THEN 'ABSENT'
+        ELSE 'ON_TIME'
+    END
+"""
+
+
+def summary_status(raw: Optional[str]) -> Optional[str]:
+    if raw is None:
+        return None
+    key = str(raw).strip().upper()
+    if key in {"LATE", "ABSENT"}:
+        return key
+    return "ON_TIME"
+
+
+def record_status_change(
+    db: Session,
+    *,
+    class_id: Optional[str],
+    day: date,
+    new_status: str,
+    old_status: Optional[str] = None,
+    old_day: Optional[date] = None,
+) -> None:
+    """Cập nhật summary cho 1 lượt ghi attendance (chưa commit, chung transaction với check-in).
+
+    old_status = None nghĩa là bản ghi mới.
+    """
+    if class_id is None:
+        return
+
+    new_key = summary_status(new_status)
+    old_key = summary_status(old_status)
+    old_day = old_day or day
+    if old_key == new_key and old_day == day:
+        return
+
+    now = datetime.now()
+    if old_key is not None:
+        db.execute(
+            text(
+                """
+                UPDATE attendance_daily_summary
+                SET checkin_count = GREATEST(checkin_count - 1, 0), updated_at = :now
+                WHERE class_id = :class_id AND summary_date = :summary_date AND status = :status
+                """
+            ),
+            {"class_id": class_id, "summary_date": old_day, "status": old_key, "now": now},
+        )
+    db.execute(
+        text(
+            """
+            INSERT INTO attendance_daily_summary (class_id, summary_date, status, checkin_count, updated_at)
+            VALUES (:class_id, :summary_date, :status, 1, :now)
+            ON DUPLICATE KEY UPDATE checkin_count = checkin_count + 1, updated_at = VALUES(updated_at)
+            """
+        ),
+        {"class_id": class_id, "summary_date": day, "status": new_key, "now": now},
+    )
+
+
+def rebuild_attendance_summary(
+    conn: Connection, date_from: Optional[date] = None, date_to: Optional[date] = None
+) -> int:
+    """Tính lại summary từ attendance trong khoảng ngày (mặc định: toàn bộ). Trả về số dòng summary."""
+    cols = {row[0] for row in conn.execute(text("SHOW COLUMNS FROM attendance")).fetchall()}
+
+    params: Dict[str, Any] = {"now": datetime.now()}
+    summary_where: List[str] = []
+    if date_from is not None:
+        params["date_from"] = date_from
+        summary_where.append("summary_date >= :date_from")
+    if date_to is not None:
+        params["date_to"] = date_to
+        params["date_to_next"] = date_to + timedelta(days=1)
+        summary_where.append("summary_date <= :date_to")
+
+    if "attendance_date" in cols and "class_id" in cols:
+        day_expr = "a.attendance_date"
+        class_expr = "a.class_id"
+        source = "attendance a"
+        range_where = [c.replace("summary_date", "a.attendance_date") for c in summary_where]
+    elif "checkin_time" in cols:
+        # Schema checkin_time không có class_id: lấy lớp của SV (giống lúc ghi)
+        day_expr = "DATE(a.checkin_time)"
+        class_expr = "st.class_id"
+        source = "attendance a JOIN students st ON st.student_id = a.student_id"
+        range_where = []
+        if date_from is not None:
+            range_where.append("a.checkin_time >= :date_from")
+        if date_to is not None:
+            range_where.append("a.checkin_time < :date_to_next")
+    else:
+        raise ValueError("Attendance table schema unsupported")
+
+    range_where.append(f"{class_expr} IS NOT NULL")
+
+    conn.execute(
+        text(
+            "DELETE FROM attendance_daily_summary"
+            + ((" WHERE " + " AND ".join(summary_where)) if summary_where else "")
+        ),
+        params,
+    )
+    result = conn.execute(
+        text(
+            f"""
+            INSERT INTO attendance_daily_summary (class_id, summary_date, status, checkin_count, updated_at)
+            SELECT {class_expr}, {day_expr}, {_STATUS_SQL}, COUNT(*), :now
+            FROM {source}
+            WHERE {' AND '.join(range_where)}
+            GROUP BY {class_expr}, {day_expr}, {_STATUS_SQL}
+            """
+        ),
+        params,
+    )
+    return result.rowcount or 0
+
+
+def ensure_attendance_summary_table(engine: Engine) -> None:
+    """Tạo bảng summary nếu chưa có; bảng còn trống thì backfill từ attendance."""
+    AttendanceDailySummary.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM attendance_daily_summary LIMIT 1")).first() is not None:
+            return
+        if conn.execute(text("SELECT 1 FROM attendance LIMIT 1")).first() is None:
+            return
+        rows = rebuild_attendance_summary(conn)
+    logger.info(f"✅ Built attendance_daily_summary ({rows} row(s))")
+
+
+def load_daily_summary(
+    db: Session,
+    *,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    class_ids: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Số lượt đúng giờ/trễ/vắng theo (lớp, ngày) đọc từ summary."""
+    where: List[str] = []
+    params: Dict[str, Any] = {}
+    if date_from is not None:
+        where.append("summary_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        where.append("summary_date <= :date_to")
+        params["date_to"] = date_to
+    if class_ids:
+        placeholders = []
+        for idx, cid in enumerate(class_ids):
+            params[f"cid{idx}"] = cid
+            placeholders.append(f":cid{idx}")
+        where.append(f"class_id IN ({', '.join(placeholders)})")
+
+    rows = db.execute(
+        text(
+            f"""
+            SELECT
+                class_id,
+                summary_date,
+                SUM(CASE WHEN status = 'ON_TIME' THEN checkin_count ELSE 0 END) AS on_time,
+                SUM(CASE WHEN status = 'LATE' THEN checkin_count ELSE 0 END) AS late,
+                SUM(CASE WHEN status = 'ABSENT' THEN checkin_count ELSE 0 END) AS absent
+            FROM attendance_daily_summary
+            {('WHERE ' + ' AND '.join(where)) if where else ''}
+            GROUP BY class_id, summary_date
+            ORDER BY summary_date, class_id
+            """
+        ),
+        params,
+    ).fetchall()
+
+    return [
+        {
+            "class_id": r[0],
+            "summary_date": r[1],
+            "on_time": int(r[2] or 0),
+            "late": int(r[3] or 0),
+            "absent": int(r[4] or 0),
+            "total": int(r[2] or 0) + int(r[3] or 0) + int(r[4] or 0),
+        }
+        for r in rows
+    ]
@@ -0,0 +1,152 @@
+"""
+Đăng ký khuôn mặt hàng loạt: 1 file ZIP hoặc nhiều ảnh, tên file = student_id.
+
+Đọc từng ảnh (không giải nén cả ZIP vào RAM), detect → encode song song bằng process pool,
+ghi DB theo lô và trả về báo cáo cho từng file.
+"""
+import asyncio
+import itertools
+import os
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from models.student import Student
+from services.async_database import DBRunner
+from services.face_encoding_store import bulk_save_encodings
+from services.face_gallery import face_gallery
+from services.face_worker_pool import encode_image, get_process_pool
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+# Giới hạn kích thước 1 ảnh (sau giải nén)
+BULK_ENROLL_MAX_FILE_BYTES = int(float(os.getenv("BULK_ENROLL_MAX_FILE_MB", "10")) * 1024 * 1024)
+
+
+def _is_zip(upload: UploadFile) -> bool:
+    return (upload.filename or "").lower().endswith(".zip") or upload.content_type in ZIP_CONTENT_TYPES
+
+
+def _read_limited(stream, name: str) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """Đọc tối đa BULK_ENROLL_MAX_FILE_BYTES (+1 byte để biết file quá lớn)."""
+    data = stream.read(BULK_ENROLL_MAX_FILE_BYTES + 1)
+    if len(data) > BULK_ENROLL_MAX_FILE_BYTES:
+        return name, None, "file_too_large"
+    return name, data, None
+
+
+def iter_upload_entries(files: List[UploadFile]) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """Duyệt lần lượt từng ảnh (tên file, bytes, lỗi). Entry trong ZIP chỉ được đọc khi tới lượt.
+
+    File không phải ảnh hoặc vượt kích thước giới hạn bị bỏ qua trước khi đọc/giải nén.
+    """
+    for upload in files:
+        if not _is_zip(upload):
+            name = upload.filename or ""
+            if _student_id_from_name(name)[1] not in IMAGE_EXTENSIONS:
+                yield name, None, "unsupported_file"
+                continue
+            yield _read_limited(upload.file, name)
+            continue
+
+        upload.file.seek(0)
+        with zipfile.ZipFile(upload.file) as zf:
+            for info in zf.infolist():
+                base = os.path.basename(info.filename)
+                # Bỏ qua thư mục và file rác của macOS
+                if info.is_dir() or not base or base.startswith(".") or "__MACOSX" in info.filename:
+                    continue
+                if _student_id_from_name(base)[1] not in IMAGE_EXTENSIONS:
+                    yield info.filename, None, "unsupported_file"
+                elif info.file_size > BULK_ENROLL_MAX_FILE_BYTES:
+                    # Kích thước sau giải nén khai trong ZIP (chặn zip bomb trước khi đọc)
+                    yield info.filename, None, "file_too_large"
+                else:
+                    with zf.open(info) as entry:
+                        yield _read_limited(entry, info.filename)
+
+
+def _student_id_from_name(name: str) -> Tuple[str, str]:
+    base, ext = os.path.splitext(os.path.basename(name))
+    return base.strip(), ext.lower()
+
+
+def _known_student_ids(db: Session, ids: Set[str]) -> Set[str]:
+    return {str(r[0]) for r in db.query(Student.student_id).filter(Student.student_id.in_(ids)).all()}
+
+
+async def _process_batch(
+    db: DBRunner, batch: List[Tuple[str, Optional[bytes], Optional[str]]], report: List[Dict[str, Any]]
+) -> None:
+    entries: List[Dict[str, Any]] = []
+    for name, data, error in batch:
+        student_id, ext = _student_id_from_name(name)
+        item = {"file": name, "student_id": student_id or None, "status": error, "data": data}
+        if item["status"] is None and (not student_id or ext not in IMAGE_EXTENSIONS):
+            item["status"] = "unsupported_file"
+        entries.append(item)
+
+    # 1 query kiểm tra SV tồn tại cho cả lô
+    ids = {e["student_id"] for e in entries if e["status"] is None}
+    known: Set[str] = set()
+    if ids:
+        known = await db.run(_known_student_ids, ids)
+    pending = []
+    for e in entries:
+        if e["status"] is None and e["student_id"] not in known:
+            e["status"] = "unknown_student"
+        elif e["status"] is None:
+            pending.append(e)
+
+    # detect → encode song song ở process pool (ảnh có nhiều khuôn mặt sẽ bị từ chối)
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    results = await asyncio.gather(
+        *[loop.run_in_executor(pool, encode_image, e["data"], False) for e in pending]
+    )
+
+    to_save = []
+    for e, (status, vector) in zip(pending, results):
+        if status == "ok":
+            e["status"] = "enrolled"
+            to_save.append({"student_id": e["student_id"], "vector": vector, "face_image": e["data"]})
+        else:
+            e["status"] = status
+
+    # Lưu encoding + ảnh cả lô trong 1 transaction
+    await db.run(bulk_save_encodings, to_save)
+
+    for e in entries:
+        e.pop("data", None)
+        report.append(e)
+
+
+async def enroll_faces_bulk(db: DBRunner, files: List[UploadFile], batch_size: int = 50) -> Dict[str, Any]:
+    report: List[Dict[str, Any]] = []
+    entries = iter_upload_entries(files)
+    try:
+        while True:
+            # Đọc file / giải nén ZIP là I/O + CPU đồng bộ => chạy ở threadpool, không chặn event loop
+            batch = await run_in_threadpool(lambda: list(itertools.islice(entries, batch_size)))
+            if not batch:
+                break
+            await _process_batch(db, batch, report)
+    finally:
+        entries.close()
+        # Các lô đã commit vẫn có hiệu lực kể cả khi lô sau lỗi
+        face_gallery.invalidate()
+
+    summary: Dict[str, int] = {}
+    for item in report:
+        summary[item["status"]] = summary.get(item["status"], 0) + 1
+
+    return {
+        "success": True,
+        "total_files": len(report),
+        "enrolled": summary.get("enrolled", 0),
+        "summary": summary,
+        "results": report,
+    }
@@ -0,0 +1,190 @@
+"""
+Import hàng loạt (CSV / NDJSON) cho students và classes.
+
+- Đọc file upload theo từng dòng, không load cả file vào RAM.
+- Validate bằng Pydantic schema sẵn có.
+- Mỗi chunk: 1 query kiểm tra khoá đã tồn tại + 1 câu INSERT nhiều dòng ... ON DUPLICATE KEY UPDATE;
+  chunk lỗi ràng buộc thì ghi lại từng dòng để chỉ dòng lỗi bị từ chối.
+- Chỉ ghi các cột có trong file (header CSV / key của dòng NDJSON): file thiếu cột không xoá dữ liệu cũ.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from fastapi import UploadFile
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+# Giới hạn số lỗi trả về để response không quá lớn
+MAX_REPORTED_ERRORS = 100
+
+
+def detect_format(upload: UploadFile, fmt: Optional[str]) -> str:
+    """Xác định định dạng: tham số fmt > đuôi file > mặc định csv."""
+    if fmt:
+        fmt = fmt.lower()
+    else:
+        name = (upload.filename or "").lower()
+        fmt = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+    if fmt not in {"csv", "ndjson"}:
+        raise ValueError("format must be csv or ndjson")
+    return fmt
+
+
+def iter_records(upload: UploadFile, fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """Trả về (số dòng, record, lỗi parse) cho từng dòng dữ liệu."""
+    upload.file.seek(0)
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for row in reader:
+                # Ô trống trong CSV => None (cột optional)
+                record = {k.strip(): (v.strip() if v and v.strip() else None) for k, v in row.items() if k}
+                yield reader.line_num, record, None
+        else:
+            for line_no, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, None, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_no, None, "Each line must be a JSON object"
+                    continue
+                yield line_no, record, None
+    finally:
+        # Không đóng file gốc của UploadFile
+        stream.detach()
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def import_records(
+    db: Session,
+    upload: UploadFile,
+    *,
+    fmt: Optional[str],
+    schema: Type[BaseModel],
+    table: str,
+    key: str,
+    columns: Sequence[str],
+    extra_values: Optional[Dict[str, Any]] = None,
+    insert_only: Sequence[str] = (),
+    chunk_size: int = 500,
+) -> Dict[str, Any]:
+    """Import file vào table theo từng chunk.
+
+    columns: các cột được phép import; dòng chỉ ghi những cột có mặt trong file.
+    extra_values: cột thêm cho mọi dòng (vd created_at/updated_at).
+    insert_only: cột chỉ ghi khi insert, không cập nhật khi trùng khoá.
+    """
+    fmt = detect_format(upload, fmt)
+    stats = {"total": 0, "inserted": 0, "updated": 0, "invalid": 0}
+    errors: List[Dict[str, Any]] = []
+
+    def add_error(line: int, message: str) -> None:
+        stats["invalid"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line, "error": message})
+
+    chunk: Dict[str, Tuple[int, Dict[str, Any], Tuple[str, ...]]] = {}
+    for line_no, record, parse_error in iter_records(upload, fmt):
+        stats["total"] += 1
+        if parse_error:
+            add_error(line_no, parse_error)
+            continue
+        try:
+            data = schema(**record).model_dump()
+        except ValidationError as e:
+            add_error(line_no, _format_validation_error(e))
+            continue
+
+        # Trùng khoá trong cùng chunk: dòng sau ghi đè dòng trước, dòng trước báo trùng
+        previous = chunk.get(str(data[key]))
+        if previous is not None:
+            add_error(previous[0], f"Duplicate {key} '{data[key]}', superseded by line {line_no}")
+        present = tuple(c for c in columns if c == key or c in record)
+        chunk[str(data[key])] = (line_no, data, present)
+        if len(chunk) >= chunk_size:
+            _flush_chunk(db, chunk, table, key, columns, extra_values, insert_only, stats, add_error)
+            chunk = {}
+
+    if chunk:
+        _flush_chunk(db, chunk, table, key, columns, extra_values, insert_only, stats, add_error)
+
+    return {"success": True, "format": fmt, **stats, "errors": errors}
+
+
+def _flush_chunk(db, chunk, table, key, columns, extra_values, insert_only, stats, add_error) -> None:
+    keys = list(chunk.keys())
+
+    # 1 query lấy các khoá đã có để đếm inserted/updated
+    key_params = {f"k{i}": k for i, k in enumerate(keys)}
+    existing = {
+        str(r[0])
+        for r in db.execute(
+            text(f"SELECT {key} FROM {table} WHERE {key} IN ({', '.join(':' + p for p in key_params)})"),
+            key_params,
+        ).fetchall()
+    }
+
+    def write(batch_keys: List[str]) -> Optional[str]:
+        """Ghi các khoá trong 1 câu INSERT nhiều dòng; trả về lỗi DB (nếu có)."""
+        # Mỗi nhóm dòng có cùng bộ cột => 1 câu INSERT (CSV luôn chỉ có 1 nhóm)
+        groups: Dict[Tuple[str, ...], List[str]] = {}
+        for k in batch_keys:
+            groups.setdefault(chunk[k][2], []).append(k)
+        try:
+            for present, group_keys in groups.items():
+                db.execute(*_upsert_statement(chunk, group_keys, table, key, present, extra_values, insert_only))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            return str(getattr(e, "orig", e))
+        stats["updated"] += sum(1 for k in batch_keys if k in existing)
+        stats["inserted"] += sum(1 for k in batch_keys if k not in existing)
+        return None
+
+    if write(keys) is None:
+        return
+    # Lỗi ràng buộc (vd trùng email, class_id không tồn tại) => ghi lại từng dòng, chỉ dòng lỗi bị bỏ
+    for k in keys:
+        message = write([k])
+        if message is not None:
+            add_error(chunk[k][0], message)
+
+
+def _upsert_statement(chunk, keys, table, key, columns, extra_values, insert_only):
+    all_columns = list(columns) + list((extra_values or {}).keys())
+    params: Dict[str, Any] = {}
+    values_sql: List[str] = []
+    for i, k in enumerate(keys):
+        data = chunk[k][1]
+        row = {**{c: data.get(c) for c in columns}, **(extra_values or {})}
+        placeholders = []
+        for c in all_columns:
+            params[f"{c}_{i}"] = row[c]
+            placeholders.append(f":{c}_{i}")
+        values_sql.append(f"({', '.join(placeholders)})")
+
+    # Chỉ có khoá => không có gì để cập nhật, giữ nguyên dòng cũ
+    update_sql = ", ".join(f"{c} = VALUES({c})" for c in all_columns if c != key and c not in insert_only) or f"{key} = {key}"
+    sql = (
+        f"INSERT INTO {table} ({', '.join(all_columns)}) VALUES {', '.join(values_sql)} "
+        f"ON DUPLICATE KEY UPDATE {update_sql}"
+    )
+    return text(sql), params
+
+
+def timestamp_values() -> Dict[str, Any]:
+    now = datetime.now()
+    return {"created_at": now, "updated_at": now}
@@ -2,10 +2,10 @@
 Service xử lý kết nối database MySQL
 Tách riêng logic database để dễ quản lý
 """
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import text
+from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from app.database import DB_URL, Base
+from app.database import Base, ReadSessionLocal, SessionLocal, engine, read_engine
 import logging
 
 # Setup logging
@@ -16,28 +16,19 @@ class DatabaseService:
     def __init__(self):
         """Khởi tạo database service"""
         self.engine = None
+        self.read_engine = None
         self.SessionLocal = None
+        self.ReadSessionLocal = None
         self.setup_connection()
 
     def setup_connection(self):
         """Thiết lập kết nối database"""
         try:
-            # Tạo engine với connection pooling
-            self.engine = create_engine(
-                DB_URL,
-                pool_size=10,          # Số connection trong pool
-                max_overflow=20,       # Số connection tối đa
-                pool_recycle=3600,     # Recycle connection sau 1h
-                pool_pre_ping=True,    # Kiểm tra connection trước khi dùng
-                echo=True              # Log SQL queries để debug
-            )
-
-            # Tạo session factory
-            self.SessionLocal = sessionmaker(
-                autocommit=False,
-                autoflush=False,
-                bind=self.engine
-            )
+            # Dùng chung engine/pool của app.database (pool cấu hình qua DB_POOL_*)
+            self.engine = engine
+            self.read_engine = read_engine
+            self.SessionLocal = SessionLocal
+            self.ReadSessionLocal = ReadSessionLocal
 
             logger.info("✅ Database connection established successfully")
 
@@ -77,6 +68,25 @@ class DatabaseService:
         finally:
             db.close()
 
+    def get_read_db(self) -> Session:
+        """Dependency cho query chỉ đọc chấp nhận trễ replica (report, thống kê) - chạy trên replica nếu có.
+
+        Danh sách mà UI đọc lại ngay sau khi ghi (SV, lớp, buổi học) dùng get_db.
+        """
+        db = self.ReadSessionLocal()
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @property
+    def has_read_replica(self) -> bool:
+        return self.read_engine is not self.engine
+
     def health_check(self) -> dict:
         """Kiểm tra tình trạng database"""
         try:
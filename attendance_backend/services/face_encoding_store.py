@@ -0,0 +1,194 @@
+"""
+Đọc/ghi encoding khuôn mặt qua bảng face_encodings.
+
+Cột students.face_encoding vẫn được ghi song song để tương thích code/schema cũ.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from models.face_encoding_model import FaceEncoding
+from models.student import Student
+from services.face_service import FACE_ENCODING_VERSION
+
+logger = logging.getLogger(__name__)
+
+GalleryRow = Tuple[str, str, Optional[str], Optional[str], bytes]
+
+
+def backfill_from_students(conn: Connection) -> int:
+    """Copy encoding đang lưu trong students sang face_encodings (bỏ qua dòng đã có)."""
+    result = conn.execute(
+        text(
+            """
+            INSERT IGNORE INTO face_encodings (student_id, version, dim, vector, created_at)
+            SELECT
+                student_id,
+                COALESCE(face_encoding_version, :default_version),
+                LENGTH(face_encoding) DIV 4,
+                face_encoding,
+                COALESCE(updated_at, NOW())
+            FROM students
+            WHERE face_encoding IS NOT NULL
+            """
+        ),
+        {"default_version": FACE_ENCODING_VERSION},
+    )
+    return result.rowcount or 0
+
+
+def ensure_face_encodings_table(engine: Engine) -> None:
+    """Tạo bảng face_encodings nếu chưa có; bảng còn trống thì backfill từ students."""
+    FaceEncoding.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM face_encodings LIMIT 1")).first() is not None:
+            return
+        copied = backfill_from_students(conn)
+    if copied:
+        logger.info(f"✅ Copied {copied} encoding(s) from students to face_encodings")
+
+
+def save_face_encoding(
+    db: Session, student: Student, encoding: np.ndarray, version: str = FACE_ENCODING_VERSION
+) -> None:
+    """Lưu encoding cho SV (chưa commit)."""
+    vector = np.asarray(encoding, dtype=np.float32)
+    student.set_face_encoding(vector)
+    student.face_encoding_version = version
+    db.merge(
+        FaceEncoding(
+            student_id=student.student_id,
+            version=version,
+            dim=int(vector.shape[0]),
+            vector=vector.tobytes(),
+            created_at=datetime.now(),
+        )
+    )
+
+
+def bulk_save_encodings(
+    db: Session, items: List[Dict[str, Any]], version: str = FACE_ENCODING_VERSION
+) -> int:
+    """Ghi nhiều encoding trong 1 transaction (executemany), trả về số dòng đã ghi.
+
+    Mỗi item gồm: student_id, vector (float32 bytes) và tùy chọn face_image.
+    """
+    if not items:
+        return 0
+
+    now = datetime.now()
+    params = [
+        {
+            "student_id": item["student_id"],
+            "version": version,
+            "dim": len(item["vector"]) // 4,
+            "vector": item["vector"],
+            "created_at": now,
+        }
+        for item in items
+    ]
+    db.execute(
+        text(
+            """
+            INSERT INTO face_encodings (student_id, version, dim, vector, created_at)
+            VALUES (:student_id, :version, :dim, :vector, :created_at)
+            ON DUPLICATE KEY UPDATE
+                dim = VALUES(dim),
+                vector = VALUES(vector),
+                created_at = VALUES(created_at)
+            """
+        ),
+        params,
+    )
+
+    # Giữ cột cũ trong students đồng bộ (kèm ảnh gốc nếu có)
+    with_image: List[Dict[str, Any]] = []
+    without_image: List[Dict[str, Any]] = []
+    for param, item in zip(params, items):
+        if item.get("face_image") is not None:
+            with_image.append({**param, "face_image": item["face_image"]})
+        else:
+            without_image.append(param)
+
+    if with_image:
+        db.execute(
+            text(
+                """
+                UPDATE students
+                SET face_encoding = :vector, face_encoding_version = :version, face_image = :face_image
+                WHERE student_id = :student_id
+                """
+            ),
+            with_image,
+        )
+    if without_image:
+        db.execute(
+            text(
+                """
+                UPDATE students
+                SET face_encoding = :vector, face_encoding_version = :version
+                WHERE student_id = :student_id
+                """
+            ),
+            without_image,
+        )
+    db.commit()
+    return len(params)
+
+
+def delete_face_encodings(db: Session, student: Student) -> None:
+    """Xoá mọi version encoding của SV (chưa commit)."""
+    student.face_encoding = None
+    db.query(FaceEncoding).filter(FaceEncoding.student_id == student.student_id).delete(
+        synchronize_session=False
+    )
+
+
+def load_gallery_rows(db: Session, version: str = FACE_ENCODING_VERSION) -> List[GalleryRow]:
+    """Đọc (student_id, name, email, class_id, vector) cho gallery.
+
+    Ưu tiên bảng hẹp face_encodings; nếu DB chưa có bảng thì đọc cột cũ trong students.
+    """
+    try:
+        return (
+            db.query(Student.student_id, Student.name, Student.email, Student.class_id, FaceEncoding.vector)
+            .join(FaceEncoding, FaceEncoding.student_id == Student.student_id)
+            .filter(FaceEncoding.version == version)
+            .all()
+        )
+    except (OperationalError, ProgrammingError):
+        db.rollback()
+        return (
+            db.query(Student.student_id, Student.name, Student.email, Student.class_id, Student.face_encoding)
+            .filter(Student.face_encoding.isnot(None))
+            .all()
+        )
+
+
+def gallery_fingerprint(db: Session, version: str = FACE_ENCODING_VERSION) -> str:
+    """Dấu hiệu thay đổi của gallery, chỉ đọc index (không đọc BLOB).
+
+    COUNT/MAX(created_at) của face_encodings theo version (idx_face_enc_version_created):
+    enroll/re-encode ghi lại created_at, xoá SV làm giảm COUNT.
+    MAX(updated_at) của students (idx_students_updated_at): đổi tên/lớp.
+    Tạo index bằng migrate_attendance_indexes.py.
+    """
+    try:
+        row = db.execute(
+            text("SELECT COUNT(*), MAX(created_at) FROM face_encodings WHERE version = :version"),
+            {"version": version},
+        ).fetchone()
+    except (OperationalError, ProgrammingError):
+        # DB chưa có bảng face_encodings: chỉ dựa vào students
+        db.rollback()
+        row = None
+    students = db.execute(text("SELECT COUNT(*), MAX(updated_at) FROM students")).fetchone()
+    count, last_update = row if row else (0, None)
+    student_count, last_student_update = students if students else (0, None)
+    return f"{version}:{int(count or 0)}:{last_update}:{int(student_count or 0)}:{last_student_update}"
@@ -0,0 +1,332 @@
+"""
+Gallery khuôn mặt trong bộ nhớ, chia partition theo lớp (Student.class_id).
+
+Thay vì so sánh khuôn mặt với toàn bộ sinh viên rồi mới lọc theo lớp,
+điểm danh theo session chỉ chấm điểm trên các partition của lớp liên quan.
+"""
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from services.database_service import db_service
+from services.face_encoding_store import gallery_fingerprint, load_gallery_rows
+from services.face_service import ENCODING_DIM, FACE_ENCODING_VERSION, face_service
+from services.gallery_shm import SharedGalleryStore
+from services.gallery_snapshot import GallerySnapshotFile
+
+if TYPE_CHECKING:
+    from services.async_database import DBRunner
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GalleryEntry:
+    """Thông tin tối thiểu của sinh viên trong gallery (không kèm ảnh BLOB)."""
+    student_id: str
+    name: str
+    email: Optional[str]
+    class_id: Optional[str]
+
+
+class _GallerySnapshot:
+    """Dữ liệu gallery bất biến, được thay nguyên khối khi reload."""
+
+    def __init__(self, entries: List[GalleryEntry], matrix: np.ndarray):
+        self.entries = entries
+        self.matrix = matrix
+        self.version = 0
+        # Segment shared memory chứa matrix (nếu có), giữ lại để buffer không bị đóng
+        self.owner = None
+        # Tính sẵn norm/mean từng hàng cho compare_faces_batch
+        self.norms = np.linalg.norm(matrix, axis=1) if len(matrix) else np.zeros(0, np.float32)
+        self.means = matrix.mean(axis=1) if len(matrix) else np.zeros(0, np.float32)
+
+        # Các hàng đã sort theo class_id => mỗi lớp là 1 đoạn liên tục [start, end)
+        self.partitions: Dict[Optional[str], Tuple[int, int]] = {}
+        for idx, entry in enumerate(entries):
+            start, _ = self.partitions.get(entry.class_id, (idx, idx))
+            self.partitions[entry.class_id] = (start, idx + 1)
+
+
+def _open_shared_store() -> Optional[SharedGalleryStore]:
+    """Bật shared memory khi chạy nhiều worker (FACE_GALLERY_SHM=<tên prefix>)."""
+    prefix = os.getenv("FACE_GALLERY_SHM", "").strip()
+    if not prefix:
+        return None
+    try:
+        return SharedGalleryStore(prefix)
+    except Exception as e:
+        logger.warning(f"Shared memory gallery disabled: {e}")
+        return None
+
+
+def _open_snapshot_file() -> Optional[GallerySnapshotFile]:
+    """Bật snapshot trên đĩa (FACE_GALLERY_SNAPSHOT_DIR=<thư mục>)."""
+    directory = os.getenv("FACE_GALLERY_SNAPSHOT_DIR", "").strip()
+    if not directory:
+        return None
+    try:
+        return GallerySnapshotFile(directory, FACE_ENCODING_VERSION)
+    except OSError as e:
+        logger.warning(f"Gallery snapshot disabled: {e}")
+        return None
+
+
+class FaceGallery:
+    def __init__(self):
+        # Lock ngắn: chỉ giữ khi swap/attach snapshot, không bao giờ giữ lúc chờ DB
+        self._lock = threading.Lock()
+        # Mỗi lúc chỉ 1 lần nạp; caller đến sau chờ lần nạp đó xong rồi kiểm tra lại
+        self._load_lock = threading.Lock()
+        self._async_load_lock = asyncio.Lock()
+        # Tăng mỗi lần invalidate; gallery mới khi đã nạp xong đúng generation hiện tại
+        self._generation = 1
+        self._loaded_generation = 0
+        self._refreshing = False
+        self._snapshot = _GallerySnapshot([], np.zeros((0, ENCODING_DIM), dtype=np.float32))
+        self.version = 0
+        self._store = _open_shared_store()
+        self._store_version = 0
+        self._snapshot_file = _open_snapshot_file()
+
+    def invalidate(self) -> None:
+        """Đánh dấu gallery cần nạp lại (gọi sau khi encoding/lớp của SV thay đổi, sau commit).
+
+        Khi dùng shared memory: nạp lại và publish ngay ở thread nền để các worker khác thấy luôn.
+        """
+        with self._lock:
+            self._generation += 1
+            start_refresh = self._store is not None and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+        if start_refresh:
+            threading.Thread(target=self._refresh_shared, name="face-gallery-refresh", daemon=True).start()
+
+    def _refresh_shared(self) -> None:
+        try:
+            # Lặp tới khi không còn invalidate mới (vd: re-encode invalidate sau mỗi lô)
+            while True:
+                db = db_service.SessionLocal()
+                try:
+                    self.ensure_loaded(db)
+                finally:
+                    db.close()
+                with self._lock:
+                    if self._loaded_generation == self._generation:
+                        self._refreshing = False
+                        return
+        except Exception as e:
+            with self._lock:
+                self._refreshing = False
+            logger.warning(f"⚠️  Face gallery refresh failed, next request will retry: {e}")
+
+    def _is_fresh(self) -> bool:
+        """Đã nạp generation hiện tại chưa; worker khác publish version mới thì attach lại."""
+        if self._loaded_generation != self._generation:
+            return False
+        if self._store is not None and self._store.current_version() != self._store_version:
+            with self._lock:
+                self._attach_shared()
+        return True
+
+    def _begin_load(self) -> Optional[int]:
+        """Generation cần nạp (gọi khi giữ load lock); None nếu không cần đọc DB."""
+        generation = self._generation
+        if self._loaded_generation == generation:
+            return None
+        # Worker mới khởi động: dùng luôn snapshot đã có trong shared memory
+        if self.version == 0:
+            with self._lock:
+                if self._attach_shared():
+                    self._loaded_generation = generation
+                    return None
+        return generation
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Nạp gallery từ DB nếu chưa có hoặc đã bị invalidate (chạy trong thread, không gọi trên event loop)."""
+        if self._is_fresh():
+            return
+        with self._load_lock:
+            generation = self._begin_load()
+            if generation is not None:
+                self._install(self._read_snapshot(db), generation)
+
+    async def ensure_loaded_async(self, db: "DBRunner") -> None:
+        """Như ensure_loaded cho endpoint async: chờ DB qua db.run, không giữ lock của thread nào."""
+        if self._is_fresh():
+            return
+        async with self._async_load_lock:
+            generation = self._begin_load()
+            if generation is not None:
+                self._install(await db.run(self._read_snapshot), generation)
+
+    def _read_snapshot(self, db: Session) -> _GallerySnapshot:
+        """Đọc gallery từ snapshot trên đĩa hoặc DB (không giữ lock)."""
+        # Fingerprint đọc trước khi nạp: thay đổi xảy ra trong lúc nạp sẽ làm snapshot lệch => lần sau nạp lại.
+        # Chỉ là vài COUNT/MAX trên index nên không làm chậm cold start
+        fingerprint = gallery_fingerprint(db) if self._snapshot_file else None
+        snap = None
+        if self.version == 0 and self._snapshot_file is not None:
+            # Cold start: thử snapshot trên đĩa, lệch fingerprint thì nạp lại từ DB
+            snap = self._load_from_snapshot_file(fingerprint)
+        if snap is None:
+            snap = self._load_from_db(db)
+            if self._snapshot_file is not None:
+                self._snapshot_file.save(fingerprint, self._rows(snap), snap.matrix)
+        return snap
+
+    def _install(self, snap: _GallerySnapshot, generation: int) -> None:
+        """Dùng snapshot vừa đọc; invalidate xảy ra trong lúc đọc thì lần sau nạp lại."""
+        with self._lock:
+            if self._store is not None:
+                self._publish_shared(snap)
+            else:
+                self._swap(snap)
+            self._loaded_generation = max(self._loaded_generation, generation)
+
+    def _swap(self, snap: _GallerySnapshot) -> None:
+        snap.version = self.version + 1
+        self._snapshot = snap
+        self.version = snap.version
+
+    @staticmethod
+    def _rows(snap: _GallerySnapshot) -> List[list]:
+        return [[e.student_id, e.name, e.email, e.class_id] for e in snap.entries]
+
+    @staticmethod
+    def _entries(rows: List[list]) -> List[GalleryEntry]:
+        return [GalleryEntry(str(r[0]), r[1], r[2], r[3]) for r in rows]
+
+    def _load_from_snapshot_file(self, fingerprint: str) -> Optional[_GallerySnapshot]:
+        loaded = self._snapshot_file.load(fingerprint)
+        if loaded is None:
+            return None
+        rows, matrix = loaded
+        if matrix.shape[1] != ENCODING_DIM:
+            return None
+        return _GallerySnapshot(self._entries(rows), matrix)
+
+    def _publish_shared(self, snap: _GallerySnapshot) -> None:
+        published = self._store.publish(self._rows(snap), snap.matrix)
+        # Dùng bản trong shared memory để worker này không giữ thêm 1 bản copy
+        if not self._attach_shared(published):
+            self._swap(snap)
+
+    def _attach_shared(self, version: Optional[int] = None) -> bool:
+        """Attach snapshot trong shared memory (gọi khi đang giữ lock)."""
+        if self._store is None:
+            return False
+        attached = self._store.attach(version)
+        if attached is None:
+            return False
+        store_version, rows, matrix, shm = attached
+        snap = _GallerySnapshot(self._entries(rows), matrix)
+        # Giữ tham chiếu segment để buffer không bị đóng khi còn dùng
+        snap.owner = shm
+        self._swap(snap)
+        self._store_version = store_version
+        return True
+
+    def _load_from_db(self, db: Session) -> _GallerySnapshot:
+        """Chỉ đọc các cột cần thiết (bảng face_encodings), bỏ qua face_image."""
+        rows = load_gallery_rows(db, FACE_ENCODING_VERSION)
+
+        items: List[Tuple[GalleryEntry, np.ndarray]] = []
+        for student_id, name, email, class_id, raw in rows:
+            encoding = np.frombuffer(raw, dtype=np.float32) if raw else None
+            # Encoding khác kích thước sẽ không bao giờ khớp (compare_faces trả False)
+            if encoding is None or len(encoding) != ENCODING_DIM:
+                continue
+            cid = str(class_id) if class_id is not None else None
+            items.append((GalleryEntry(str(student_id), name, email, cid), encoding))
+
+        # Sort theo lớp (None đứng đầu) để mỗi partition là 1 slice liên tục
+        items.sort(key=lambda item: (item[0].class_id is not None, item[0].class_id or "", item[0].student_id))
+
+        entries = [entry for entry, _ in items]
+        if items:
+            matrix = np.vstack([enc for _, enc in items]).astype(np.float32, copy=False)
+        else:
+            matrix = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        return _GallerySnapshot(entries, matrix)
+
+    @property
+    def size(self) -> int:
+        return len(self._snapshot.entries)
+
+    def partition(self, class_ids: Optional[Iterable[str]] = None) -> "GalleryPartition":
+        """Lấy view gồm các lớp được chọn (class_ids=None: toàn bộ gallery).
+
+        View giữ snapshot tại thời điểm tạo, có thể cache lại và so sánh version để làm mới.
+        """
+        snap = self._snapshot
+        if class_ids is None:
+            slices = [(0, len(snap.entries))] if snap.entries else []
+        else:
+            slices = []
+            for cid in sorted({str(c) for c in class_ids}):
+                part = snap.partitions.get(cid)
+                if part is not None:
+                    slices.append(part)
+        return GalleryPartition(snap, slices, snap.version)
+
+    def match(
+        self,
+        encoding: np.ndarray,
+        class_ids: Optional[Iterable[str]] = None,
+        threshold: float = 0.7,
+    ) -> Tuple[Optional[GalleryEntry], float]:
+        """Tìm sinh viên khớp nhất.
+
+        class_ids=None: so với toàn bộ gallery; ngược lại chỉ so trong các lớp được chọn.
+        """
+        return self.partition(class_ids).match(encoding, threshold)
+
+
+class GalleryPartition:
+    """Tập con của gallery theo lớp (hợp các slice liên tục)."""
+
+    def __init__(self, snap: _GallerySnapshot, slices: List[Tuple[int, int]], version: int):
+        self._snap = snap
+        self.slices = slices
+        self.version = version
+
+    @property
+    def size(self) -> int:
+        return sum(end - start for start, end in self.slices)
+
+    def match(self, encoding: np.ndarray, threshold: float = 0.7) -> Tuple[Optional[GalleryEntry], float]:
+        if encoding is None or face_service is None:
+            return None, 0.0
+
+        snap = self._snap
+        best_entry: Optional[GalleryEntry] = None
+        best_similarity = 0.0
+
+        for start, end in self.slices:
+            scores = face_service.compare_faces_batch(
+                encoding,
+                snap.matrix[start:end],
+                norms=snap.norms[start:end],
+                means=snap.means[start:end],
+            )
+            if len(scores) == 0:
+                continue
+            idx = int(np.argmax(scores))
+            similarity = float(scores[idx])
+            if similarity >= threshold and similarity > best_similarity:
+                best_similarity = similarity
+                best_entry = snap.entries[start + idx]
+
+        return best_entry, best_similarity
+
+
+# Singleton instance
+face_gallery = FaceGallery()
@@ -6,6 +6,13 @@ import io
 from PIL import Image
 import os
 
+from services.metrics import face_detect_fallback_total
+
+# Kích thước vector đặc trưng: 64x64 pixel + 32 LBP + 16 HOG
+ENCODING_DIM = 64 * 64 + 32 + 16
+# Tăng version khi đổi thuật toán trích xuất đặc trưng (lưu vào face_encoding_version)
+FACE_ENCODING_VERSION = "1.0"
+
 class SimpleFaceService:
     def __init__(self):
         # Load Haar cascade for face detection - but don't fail if not available
@@ -92,6 +99,7 @@ class SimpleFaceService:
             
             # Only try fallback if no good faces found
             if len(faces) == 0:
+                face_detect_fallback_total.inc(path="bilateral")
                 # More conservative fallback with glasses preprocessing
                 gray_blur = cv2.bilateralFilter(gray, 9, 75, 75)
                 
@@ -120,6 +128,7 @@ class SimpleFaceService:
             
             # If still no faces found, use fallback method
             if len(faces) == 0:
+                face_detect_fallback_total.inc(path="contour")
                 faces = self._fallback_face_detection(gray)
             
             # Remove overlapping faces (Non-Maximum Suppression)
@@ -368,6 +377,50 @@ class SimpleFaceService:
             
         except Exception:
             return False, 0.0
+
+    def compare_faces_batch(
+        self,
+        encoding: np.ndarray,
+        matrix: np.ndarray,
+        norms: Optional[np.ndarray] = None,
+        means: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """So sánh 1 encoding với nhiều encoding (mỗi hàng của matrix) cùng lúc.
+
+        Cùng công thức với compare_faces, nhưng tính bằng phép nhân ma trận.
+        norms/means của từng hàng có thể tính sẵn để tái sử dụng giữa các lần gọi.
+        """
+        if encoding is None or matrix is None or len(matrix) == 0:
+            return np.zeros(0, dtype=np.float32)
+        if matrix.shape[1] != len(encoding):
+            return np.zeros(len(matrix), dtype=np.float32)
+
+        q = encoding.astype(np.float32, copy=False)
+        dim = len(q)
+        if norms is None:
+            norms = np.linalg.norm(matrix, axis=1)
+        if means is None:
+            means = matrix.mean(axis=1)
+
+        q_norm = float(np.linalg.norm(q))
+        q_mean = float(q.mean())
+        dots = matrix @ q
+
+        # 1. Cosine similarity
+        cosine_sim = dots / (norms * q_norm + 1e-7)
+
+        # 2. Correlation (Pearson) suy ra từ dot product, không cần trừ mean từng hàng
+        centered_norms = np.sqrt(np.maximum(norms ** 2 - dim * means ** 2, 0.0))
+        q_centered_norm = np.sqrt(max(q_norm ** 2 - dim * q_mean ** 2, 0.0))
+        denom = centered_norms * q_centered_norm
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = np.where(denom > 0, (dots - dim * means * q_mean) / denom, 0.0)
+
+        # 3. Euclidean distance (inverted)
+        euclidean_dist = np.sqrt(np.maximum(norms ** 2 + q_norm ** 2 - 2 * dots, 0.0))
+        euclidean_sim = 1 / (1 + euclidean_dist)
+
+        return (0.5 * np.abs(cosine_sim) + 0.3 * np.abs(correlation) + 0.2 * euclidean_sim).astype(np.float32)
     
     def draw_face_boxes(self, img: np.ndarray, faces: List[Dict], student_info: List[Dict] = None) -> np.ndarray:
         """Vẽ khung nhận diện khuôn mặt trên ảnh"""
@@ -0,0 +1,59 @@
+"""
+Process pool cho các tác vụ detect → encode chạy hàng loạt (re-encode, enroll nhiều ảnh).
+
+Trích xuất đặc trưng tốn CPU và giữ GIL, nên chạy ở process riêng
+để API vẫn phục vụ request bình thường.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+# Số process xử lý ảnh (mặc định: số CPU - 1)
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Tạo pool lần đầu dùng (không tạo process khi server chỉ nhận diện realtime)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=FACE_WORKERS)
+        return _pool
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def encode_image(image_bytes: bytes, allow_multiple: bool = True) -> Tuple[str, Optional[bytes]]:
+    """Chạy trong process con: detect → encode 1 ảnh.
+
+    Trả về (status, encoding_bytes) với status: ok / invalid_image / no_face / multiple_faces.
+    """
+    from services.face_service import face_service
+
+    if face_service is None:
+        return "no_face", None
+
+    img = face_service.preprocess_image(image_bytes)
+    if img is None:
+        return "invalid_image", None
+
+    faces = face_service.detect_faces(img)
+    if not faces:
+        return "no_face", None
+    if len(faces) > 1 and not allow_multiple:
+        return "multiple_faces", None
+
+    encoding = face_service.extract_face_encoding(img, faces[0])
+    if encoding is None:
+        return "no_face", None
+    return "ok", encoding.astype("float32").tobytes()
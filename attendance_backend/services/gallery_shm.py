@@ -0,0 +1,141 @@
+"""
+Chia sẻ ma trận gallery giữa nhiều worker process (uvicorn --workers / gunicorn)
+bằng multiprocessing.shared_memory.
+
+- Segment điều khiển "<prefix>_ctl" chứa version hiện tại (int64).
+- Mỗi version là 1 segment "<prefix>_v<version>": header + ma trận float32 + metadata JSON.
+- Worker nạp từ DB sẽ publish version mới; các worker khác attach read-only khi thấy version đổi.
+  publish giữ flock trên file "<tmp>/<prefix>.lock" để version chỉ tăng và segment cũ luôn được xoá.
+"""
+import json
+import logging
+import os
+import struct
+import tempfile
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"FGAL"
+# magic, số hàng, số chiều, độ dài metadata
+_HEADER = struct.Struct("<4sqqq")
+_CTL_SIZE = 8
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    """Không để resource_tracker xoá segment khi 1 worker thoát (segment dùng chung)."""
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class SharedGalleryStore:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{prefix}.lock")
+        self._ctl = self._open_ctl()
+
+    def _open_ctl(self) -> shared_memory.SharedMemory:
+        name = f"{self.prefix}_ctl"
+        try:
+            ctl = shared_memory.SharedMemory(name=name, create=True, size=_CTL_SIZE)
+            ctl.buf[:_CTL_SIZE] = struct.pack("<q", 0)
+        except FileExistsError:
+            ctl = shared_memory.SharedMemory(name=name)
+        _untrack(ctl)
+        return ctl
+
+    def current_version(self) -> int:
+        return struct.unpack("<q", bytes(self._ctl.buf[:_CTL_SIZE]))[0]
+
+    def _set_version(self, version: int) -> None:
+        self._ctl.buf[:_CTL_SIZE] = struct.pack("<q", version)
+
+    def _segment_name(self, version: int) -> str:
+        return f"{self.prefix}_v{version}"
+
+    def publish(self, rows: List[Tuple[str, str, Optional[str], Optional[str]]], matrix: np.ndarray) -> int:
+        """Ghi snapshot mới vào shared memory, trả về version đã publish."""
+        meta = json.dumps(rows, ensure_ascii=False).encode("utf-8")
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        n, dim = matrix.shape
+        size = _HEADER.size + matrix.nbytes + len(meta)
+
+        with open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            previous = self.current_version()
+            version = previous + 1
+            while True:
+                try:
+                    shm = shared_memory.SharedMemory(
+                        name=self._segment_name(version), create=True, size=max(size, 1)
+                    )
+                    break
+                except FileExistsError:
+                    # Segment sót lại từ lần chạy trước (process bị kill giữa chừng) => version kế tiếp
+                    version += 1
+            _untrack(shm)
+
+            _HEADER.pack_into(shm.buf, 0, _MAGIC, n, dim, len(meta))
+            offset = _HEADER.size
+            shm.buf[offset:offset + matrix.nbytes] = matrix.tobytes()
+            offset += matrix.nbytes
+            shm.buf[offset:offset + len(meta)] = meta
+            shm.close()
+
+            # Đổi version rồi xoá tên segment cũ; worker đang attach vẫn đọc được
+            self._set_version(version)
+            self._unlink(previous)
+        return version
+
+    def _unlink(self, version: int) -> None:
+        if version <= 0:
+            return
+        try:
+            old = shared_memory.SharedMemory(name=self._segment_name(version))
+            old.close()
+            old.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Cannot unlink gallery segment v{version}: {e}")
+
+    def attach(self, version: Optional[int] = None):
+        """Attach read-only snapshot theo version (mặc định version mới nhất).
+
+        Trả về (version, rows, matrix, shm) hoặc None nếu chưa có snapshot.
+        """
+        for _ in range(3):
+            target = version if version is not None else self.current_version()
+            if target <= 0:
+                return None
+            try:
+                shm = shared_memory.SharedMemory(name=self._segment_name(target))
+            except FileNotFoundError:
+                # Segment vừa bị thay bởi version mới hơn => đọc lại version
+                if version is not None:
+                    return None
+                continue
+            _untrack(shm)
+
+            magic, n, dim, meta_len = _HEADER.unpack_from(shm.buf, 0)
+            if magic != _MAGIC:
+                shm.close()
+                return None
+            offset = _HEADER.size
+            matrix = np.ndarray((n, dim), dtype=np.float32, buffer=shm.buf, offset=offset)
+            matrix.flags.writeable = False
+            offset += n * dim * 4
+            rows = json.loads(bytes(shm.buf[offset:offset + meta_len]).decode("utf-8"))
+            return target, rows, matrix, shm
+        return None
@@ -0,0 +1,85 @@
+"""
+Snapshot gallery trên đĩa để worker khởi động lại không phải quét bảng students.
+
+- gallery_<token>.npy: ma trận encoding (nạp bằng np.load(mmap_mode='r'))
+- gallery.json: header gồm student ids/metadata, encoding version, fingerprint DB
+  (gallery_fingerprint: COUNT/MAX trên index, không quét BLOB nên kiểm tra lúc khởi động rẻ)
+  và tên file .npy tương ứng. File json được ghi sau cùng nên là "điểm commit".
+"""
+import json
+import logging
+import os
+import uuid
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_HEADER_FILE = "gallery.json"
+# 2: fingerprint chỉ dựa vào index (header cũ không so được => nạp lại từ DB 1 lần)
+_FORMAT = 2
+
+
+class GallerySnapshotFile:
+    def __init__(self, directory: str, encoding_version: str):
+        self.directory = directory
+        self.encoding_version = encoding_version
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self, fingerprint: str) -> Optional[Tuple[List[list], np.ndarray]]:
+        """Đọc snapshot nếu khớp fingerprint + encoding version, ngược lại trả None."""
+        header_path = os.path.join(self.directory, _HEADER_FILE)
+        try:
+            with open(header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (
+            header.get("format") != _FORMAT
+            or header.get("fingerprint") != fingerprint
+            or header.get("encoding_version") != self.encoding_version
+        ):
+            return None
+
+        try:
+            matrix = np.load(os.path.join(self.directory, header["matrix_file"]), mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+
+        rows = header.get("rows", [])
+        if matrix.ndim != 2 or matrix.shape[0] != len(rows) or matrix.dtype != np.float32:
+            return None
+        return rows, matrix
+
+    def save(self, fingerprint: str, rows: List[list], matrix: np.ndarray) -> None:
+        """Ghi snapshot mới (ghi file tạm rồi os.replace để không bao giờ đọc file dở)."""
+        token = uuid.uuid4().hex[:12]
+        matrix_file = f"gallery_{token}.npy"
+        try:
+            np.save(os.path.join(self.directory, matrix_file), np.ascontiguousarray(matrix, dtype=np.float32))
+
+            header = {
+                "format": _FORMAT,
+                "fingerprint": fingerprint,
+                "encoding_version": self.encoding_version,
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "matrix_file": matrix_file,
+                "rows": rows,
+            }
+            tmp_path = os.path.join(self.directory, f"{_HEADER_FILE}.{token}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(header, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(self.directory, _HEADER_FILE))
+        except OSError as e:
+            logger.warning(f"Cannot write gallery snapshot: {e}")
+            return
+
+        # Xoá các file .npy cũ (process đang mmap vẫn đọc được trên Linux)
+        for name in os.listdir(self.directory):
+            if name.startswith("gallery_") and name.endswith(".npy") and name != matrix_file:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
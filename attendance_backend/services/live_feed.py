@@ -0,0 +1,195 @@
+"""
+Pub/sub sự kiện check-in cho màn hình report (SSE).
+
+- Mặc định: hub trong process, publish từ thread nào cũng được (request sync, write-behind thread).
+- Nhiều worker: đặt LIVE_FEED_SQLITE=<file>. Publish chỉ đưa sự kiện vào hàng đợi trong RAM (không chặn
+  request); thread poller của mỗi worker ghi các sự kiện đó vào bảng events của file SQLite dùng chung,
+  đọc sự kiện mới (id > last_id) rồi phát cho subscriber của mình. Poller giữ 1 kết nối duy nhất.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+LIVE_FEED_SQLITE = os.getenv("LIVE_FEED_SQLITE", "")
+LIVE_FEED_POLL_MS = int(os.getenv("LIVE_FEED_POLL_MS", "200"))
+# Giữ sự kiện trong SQLite bao lâu (giây) trước khi dọn
+LIVE_FEED_RETENTION = int(os.getenv("LIVE_FEED_RETENTION", "300"))
+# Subscriber chậm: quá số này thì bỏ sự kiện cũ nhất
+SUBSCRIBER_QUEUE_SIZE = 256
+# Sự kiện chờ poller ghi vào SQLite; đầy thì chỉ phát trong worker này
+OUTBOX_SIZE = 10000
+
+
+class Subscription:
+    def __init__(self, session_id: Optional[int], loop: asyncio.AbstractEventLoop):
+        self.session_id = session_id
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        """Gọi được từ thread khác event loop."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # loop đã đóng (client ngắt kết nối lúc tắt server)
+            pass
+
+
+class LiveFeedHub:
+    def __init__(self, sqlite_path: str = LIVE_FEED_SQLITE):
+        self._lock = threading.Lock()
+        self._subs: Set[Subscription] = set()
+        self._sqlite_path = sqlite_path
+        self._poller: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Báo poller có sự kiện mới cần ghi (không phải chờ hết LIVE_FEED_POLL_MS)
+        self._wakeup = threading.Event()
+        self._outbox: "queue.Queue[Tuple[Optional[int], Dict[str, Any], float]]" = queue.Queue(maxsize=OUTBOX_SIZE)
+        self._seq = 0
+
+    @property
+    def shared(self) -> bool:
+        return bool(self._sqlite_path)
+
+    def subscribe(self, session_id: Optional[int]) -> Subscription:
+        sub = Subscription(session_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subs.discard(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def publish(self, session_id: Optional[int], payload: Dict[str, Any]) -> None:
+        """Không chặn: chế độ dùng chung chỉ đẩy vào hàng đợi của poller."""
+        if self.shared and self._poller is not None and self._poller.is_alive():
+            try:
+                self._outbox.put_nowait((session_id, payload, time.time()))
+                self._wakeup.set()
+                return
+            except queue.Full:
+                logger.warning("⚠️  Live feed outbox full, delivering locally only")
+        self._dispatch_local(session_id, payload)
+
+    def _dispatch_local(self, session_id: Optional[int], payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        self._dispatch(seq, session_id, payload)
+
+    def _dispatch(self, event_id: int, session_id: Optional[int], payload: Dict[str, Any]) -> None:
+        event = {"id": event_id, "session_id": session_id, **payload}
+        with self._lock:
+            targets = [s for s in self._subs if s.session_id is None or s.session_id == session_id]
+        for sub in targets:
+            sub.deliver(event)
+
+    # --- SQLite fan-out giữa nhiều worker ---
+
+    def _connect(self) -> sqlite3.Connection:
+        """Kết nối của poller (mở 1 lần, tạo bảng 1 lần)."""
+        conn = sqlite3.connect(self._sqlite_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        return conn
+
+    def _write_outbox(self, conn: sqlite3.Connection) -> None:
+        """Ghi các sự kiện đang chờ trong 1 transaction."""
+        pending: List[Tuple[Optional[int], Dict[str, Any], float]] = []
+        while True:
+            try:
+                pending.append(self._outbox.get_nowait())
+            except queue.Empty:
+                break
+        if not pending:
+            return
+        try:
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO events (session_id, payload, created_at) VALUES (?, ?, ?)",
+                    [
+                        (session_id, json.dumps(payload, ensure_ascii=False, default=str), created_at)
+                        for session_id, payload, created_at in pending
+                    ],
+                )
+        except sqlite3.Error as e:
+            # File dùng chung lỗi: vẫn phát cho subscriber của worker này
+            logger.warning(f"⚠️  Live feed SQLite publish failed: {e}")
+            for session_id, payload, _ in pending:
+                self._dispatch_local(session_id, payload)
+
+    def start(self) -> None:
+        if not self.shared or (self._poller is not None and self._poller.is_alive()):
+            return
+        self._stop.clear()
+        self._poller = threading.Thread(target=self._poll, name="live-feed-poller", daemon=True)
+        self._poller.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._poller is not None:
+            self._poller.join(timeout=2)
+            self._poller = None
+
+    def _poll(self) -> None:
+        conn = self._connect()
+        try:
+            # Chỉ phát sự kiện phát sinh sau khi worker khởi động
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+            last_prune = time.monotonic()
+            while not self._stop.is_set():
+                self._wakeup.wait(LIVE_FEED_POLL_MS / 1000.0)
+                self._wakeup.clear()
+                try:
+                    self._write_outbox(conn)
+                    rows: List[Tuple[int, Optional[int], str]] = conn.execute(
+                        "SELECT id, session_id, payload FROM events WHERE id > ? ORDER BY id", (last_id,)
+                    ).fetchall()
+                    for event_id, session_id, payload in rows:
+                        self._dispatch(event_id, session_id, json.loads(payload))
+                        last_id = event_id
+
+                    if time.monotonic() - last_prune > LIVE_FEED_RETENTION:
+                        conn.execute("DELETE FROM events WHERE created_at < ?", (time.time() - LIVE_FEED_RETENTION,))
+                        last_prune = time.monotonic()
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️  Live feed poll failed: {e}")
+        finally:
+            # Sự kiện còn lại lúc tắt server: phát trong worker này
+            while not self._outbox.empty():
+                session_id, payload, _ = self._outbox.get_nowait()
+                self._dispatch_local(session_id, payload)
+            conn.close()
+
+
+# Singleton instance
+live_feed = LiveFeedHub()
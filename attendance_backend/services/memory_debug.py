@@ -0,0 +1,239 @@
+"""
+Theo dõi bộ nhớ: snapshot tracemalloc (admin bật/tắt) và mức tăng bộ nhớ theo request.
+
+- tracemalloc chỉ chạy khi admin bật (tốn CPU/RAM); snapshot giữ tối đa MEMORY_SNAPSHOT_KEEP bản,
+  diff theo vị trí cấp phát (lineno / filename / traceback).
+- Middleware đo RSS trước/sau các route nặng (MEMORY_TRACK_PREFIXES) và mức tăng đỉnh RSS của process.
+  Khi tracemalloc đang chạy còn có đỉnh bộ nhớ Python trong lúc xử lý request.
+  Các số đo là của cả process: request chạy song song sẽ cộng dồn vào nhau.
+"""
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.metrics import metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TRACK_PREFIXES = tuple(
+    p.strip()
+    for p in os.getenv(
+        "MEMORY_TRACK_PREFIXES", "/api/face,/api/attendance/checkin-by-face,/api/attendance/report"
+    ).split(",")
+    if p.strip()
+)
+MEMORY_WARN_MB = float(os.getenv("MEMORY_WARN_MB", "100"))
+MEMORY_SNAPSHOT_KEEP = int(os.getenv("MEMORY_SNAPSHOT_KEEP", "5"))
+# Số request gần nhất giữ lại cho /api/admin/memory
+MEMORY_RECENT_REQUESTS = 50
+
+_MB = 1024 * 1024
+_BYTE_BUCKETS = (64 * 1024, 256 * 1024, _MB, 4 * _MB, 16 * _MB, 64 * _MB, 256 * _MB, 1024 * _MB)
+
+request_rss_delta_bytes = metrics.histogram(
+    "request_rss_delta_bytes", "RSS tăng thêm sau mỗi request (route nặng)", buckets=_BYTE_BUCKETS
+)
+request_maxrss_growth_bytes_total = metrics.counter(
+    "request_maxrss_growth_bytes_total", "Đỉnh RSS của process tăng thêm trong lúc xử lý request"
+)
+metrics.gauge("process_rss_bytes", "RSS hiện tại của worker", lambda: current_rss() or 0)
+
+# Bỏ các frame của chính tracemalloc / import khi diff
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def current_rss() -> Optional[int]:
+    """RSS hiện tại (bytes); None nếu không đọc được (không phải Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss() -> Optional[int]:
+    """Đỉnh RSS từ khi process chạy (bytes)."""
+    if resource is None:
+        return None
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả KB, macOS trả bytes
+    return value if sys.platform == "darwin" else value * 1024
+
+
+class MemoryTracer:
+    def __init__(self, keep: int = MEMORY_SNAPSHOT_KEEP):
+        self._lock = threading.Lock()
+        self._keep = keep
+        self._snapshots: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 1
+        self._recent: "deque[Dict[str, Any]]" = deque(maxlen=MEMORY_RECENT_REQUESTS)
+
+    # --- tracemalloc ---
+
+    def start(self, nframes: int = 1) -> None:
+        if tracemalloc.is_tracing():
+            return
+        tracemalloc.start(nframes)
+        logger.info(f"🔍 tracemalloc started ({nframes} frame(s))")
+
+    def stop(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("🔍 tracemalloc stopped")
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            taken_at = datetime.now()
+            self._snapshots[snapshot_id] = (taken_at, snapshot)
+            while len(self._snapshots) > self._keep:
+                self._snapshots.popitem(last=False)
+        return {"id": snapshot_id, "taken_at": taken_at.isoformat(), "traced_bytes": tracemalloc.get_traced_memory()[0]}
+
+    def _get(self, snapshot_id: int):
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            raise KeyError(snapshot_id)
+        return entry[1]
+
+    def diff(self, base_id: int, target_id: Optional[int] = None, group_by: str = "lineno", limit: int = 30) -> Dict[str, Any]:
+        """So sánh 2 snapshot (target_id=None: chụp snapshot mới làm target)."""
+        base = self._get(base_id)
+        if target_id is None:
+            target_id = self.take_snapshot()["id"]
+        target = self._get(target_id)
+
+        stats = target.compare_to(base, group_by)
+        return {
+            "base": base_id,
+            "target": target_id,
+            "group_by": group_by,
+            "total_size_diff": sum(s.size_diff for s in stats),
+            "top": [
+                {
+                    "location": [str(frame) for frame in s.traceback],
+                    "size": s.size,
+                    "size_diff": s.size_diff,
+                    "count": s.count,
+                    "count_diff": s.count_diff,
+                }
+                for s in stats[:limit]
+            ],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        traced, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [{"id": sid, "taken_at": t.isoformat()} for sid, (t, _) in self._snapshots.items()]
+            recent = sorted(self._recent, key=lambda r: r["rss_delta"] or 0, reverse=True)
+        return {
+            "rss_bytes": current_rss(),
+            "max_rss_bytes": max_rss(),
+            "tracemalloc": {"tracing": tracing, "traced_bytes": traced, "peak_bytes": peak, "snapshots": snapshots},
+            "recent_requests": recent,
+        }
+
+    # --- middleware ---
+
+    def _tracked(self, path: str) -> bool:
+        return any(path.startswith(prefix) for prefix in MEMORY_TRACK_PREFIXES)
+
+    async def __call__(self, request, call_next: Callable[[Any], Awaitable[Any]]):
+        """Middleware HTTP: đo mức tăng bộ nhớ của các route nặng.
+
+        call_next trả về ngay khi có header, body (vd export CSV stream) còn chưa được tạo
+        => chỉ đo sau khi body đã gửi xong.
+        """
+        if not self._tracked(request.url.path):
+            return await call_next(request)
+
+        rss_before = current_rss()
+        maxrss_before = max_rss()
+        traced_before = None
+        if tracemalloc.is_tracing():
+            traced_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        response = await call_next(request)
+
+        def record() -> None:
+            self._record(request, response.status_code, rss_before, maxrss_before, traced_before)
+
+        body_iterator = getattr(response, "body_iterator", None)
+        if body_iterator is None:
+            record()
+            return response
+
+        async def measured_body():
+            try:
+                async for chunk in body_iterator:
+                    yield chunk
+            finally:
+                record()
+
+        response.body_iterator = measured_body()
+        return response
+
+    def _record(
+        self,
+        request,
+        status_code: int,
+        rss_before: Optional[int],
+        maxrss_before: Optional[int],
+        traced_before: Optional[int],
+    ) -> None:
+        route = request.scope.get("route")
+        # Nhãn theo mẫu route (/api/face/{student_id}) để metric không phình theo id
+        route_path = getattr(route, "path", "unmatched")
+        rss_delta = current_rss() - rss_before if rss_before is not None else None
+        maxrss_growth = max_rss() - maxrss_before if maxrss_before is not None else None
+        record = {
+            "at": datetime.now().isoformat(),
+            "method": request.method,
+            "route": route_path,
+            "status_code": status_code,
+            "rss_delta": rss_delta,
+            "maxrss_growth": maxrss_growth,
+            "traced_peak_delta": (
+                tracemalloc.get_traced_memory()[1] - traced_before
+                if traced_before is not None and tracemalloc.is_tracing()
+                else None
+            ),
+        }
+        with self._lock:
+            self._recent.append(record)
+
+        if rss_delta is not None:
+            request_rss_delta_bytes.observe(max(rss_delta, 0), route=route_path)
+        if maxrss_growth:
+            request_maxrss_growth_bytes_total.inc(maxrss_growth, route=route_path)
+        grown = max(rss_delta or 0, maxrss_growth or 0, record["traced_peak_delta"] or 0)
+        if grown > MEMORY_WARN_MB * _MB:
+            logger.warning(f"⚠️  {request.method} {route_path} grew memory by {grown / _MB:.1f} MB")
+
+
+# Singleton instance
+memory_tracer = MemoryTracer()
@@ -0,0 +1,192 @@
+"""
+Registry metrics trong process (counter / gauge / histogram), xuất dạng text Prometheus tại /metrics.
+
+Không phụ thuộc prometheus_client. Mỗi worker có registry riêng (Prometheus scrape từng worker
+hoặc gộp theo instance). Tác vụ chạy trong process pool (re-encode, enroll hàng loạt) không được đếm.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Bucket mặc định cho độ trễ (giây)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def _callback_samples(self, fn: Callable[[], float]) -> List[str]:
+        try:
+            return [f"{self.name} {_format_value(fn())}"]
+        except Exception:
+            return []
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    """Counter tăng bằng inc() hoặc đọc từ callback lúc scrape (bộ đếm sẵn có của service khác)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self._fn = fn
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        if self._fn is not None:
+            return self._callback_samples(self._fn)
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Gauge đặt giá trị trực tiếp hoặc đọc từ callback lúc scrape."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self._fn = fn
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def samples(self) -> List[str]:
+        if self._fn is not None:
+            return self._callback_samples(self._fn)
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self._buckets = tuple(sorted(buckets))
+        # label -> [đếm theo bucket..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0.0] * (len(self._buckets) + 2)
+            for i, bound in enumerate(self._buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, data in items:
+            for bound, count in zip(self._buckets, data):
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {_format_value(count)}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {_format_value(data[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(data[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Đăng ký lại cùng tên (import lại module) => dùng metric cũ
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, fn: Optional[Callable[[], float]] = None) -> Counter:
+        return self._register(Counter(name, help_text, fn))
+
+    def gauge(self, name: str, help_text: str, fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, help_text, fn))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+# Metrics dùng chung cho pipeline nhận diện / điểm danh
+face_stage_seconds = metrics.histogram(
+    "face_stage_seconds", "Thời gian từng bước pipeline nhận diện (decode, detect, encode, match, upsert)"
+)
+face_detect_fallback_total = metrics.counter(
+    "face_detect_fallback_total", "Số lần detect_faces phải chạy nhánh dự phòng (bilateral, contour)"
+)
+face_faces_per_frame = metrics.histogram(
+    "face_faces_per_frame", "Số khuôn mặt phát hiện trên mỗi ảnh check-in", buckets=(0, 1, 2, 3, 5, 8, 13, 20)
+)
+face_checkin_total = metrics.counter("face_checkin_total", "Kết quả nhận diện từng khuôn mặt khi check-in")
+db_pool_checkout_seconds = metrics.histogram(
+    "db_pool_checkout_seconds", "Thời gian chờ lấy kết nối từ pool SQLAlchemy"
+)
@@ -0,0 +1,137 @@
+"""
+Job chạy nền tạo lại encoding từ face_image khi đổi FACE_ENCODING_VERSION.
+
+- Chỉ lấy SV chưa có encoding ở version hiện tại => dừng giữa chừng chạy lại sẽ tiếp tục phần còn thiếu.
+- Đọc theo keyset (student_id > last_id) từng chunk, encode bằng process pool, ghi DB theo lô.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+from services.database_service import db_service
+from services.face_encoding_store import bulk_save_encodings
+from services.face_gallery import face_gallery
+from services.face_service import FACE_ENCODING_VERSION
+from services.face_worker_pool import encode_image, get_process_pool
+
+logger = logging.getLogger(__name__)
+
+_PENDING_WHERE = """
+    s.face_image IS NOT NULL
+    AND NOT EXISTS (
+        SELECT 1 FROM face_encodings fe
+        WHERE fe.student_id = s.student_id AND fe.version = :version
+    )
+"""
+
+
+class ReencodeJob:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._state: Dict[str, Any] = {"status": "idle"}
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._state)
+
+    def _update(self, **fields: Any) -> None:
+        with self._lock:
+            self._state.update(fields)
+
+    def start(self, chunk_size: int = 200, start_after: Optional[str] = None) -> bool:
+        """Chạy job ở thread nền. Trả False nếu đang có job chạy."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._cancel.clear()
+            self._state = {
+                "status": "running",
+                "target_version": FACE_ENCODING_VERSION,
+                "total": None,
+                "processed": 0,
+                "updated": 0,
+                "failed": 0,
+                "last_student_id": start_after,
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "error": None,
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(chunk_size, start_after), name="reencode-job", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def _run(self, chunk_size: int, start_after: Optional[str]) -> None:
+        db = db_service.SessionLocal()
+        try:
+            total = db.execute(
+                text(f"SELECT COUNT(*) FROM students s WHERE {_PENDING_WHERE}"),
+                {"version": FACE_ENCODING_VERSION},
+            ).scalar()
+            self._update(total=int(total or 0))
+
+            pool = get_process_pool()
+            last_id = start_after or ""
+            while not self._cancel.is_set():
+                # Keyset paging: không dùng OFFSET để mỗi chunk là 1 index range scan
+                rows = db.execute(
+                    text(
+                        f"""
+                        SELECT s.student_id, s.face_image
+                        FROM students s
+                        WHERE s.student_id > :last_id AND {_PENDING_WHERE}
+                        ORDER BY s.student_id
+                        LIMIT :limit
+                        """
+                    ),
+                    {"last_id": last_id, "version": FACE_ENCODING_VERSION, "limit": chunk_size},
+                ).fetchall()
+                db.commit()  # kết thúc transaction đọc, không giữ snapshot lâu
+                if not rows:
+                    break
+
+                student_ids = [str(r[0]) for r in rows]
+                results = list(pool.map(encode_image, [bytes(r[1]) for r in rows]))
+                del rows
+
+                updated = bulk_save_encodings(
+                    db,
+                    [
+                        {"student_id": sid, "vector": vector}
+                        for sid, (status, vector) in zip(student_ids, results)
+                        if status == "ok" and vector
+                    ],
+                )
+                last_id = student_ids[-1]
+
+                state = self.status()
+                self._update(
+                    processed=state["processed"] + len(student_ids),
+                    updated=state["updated"] + updated,
+                    failed=state["failed"] + len(student_ids) - updated,
+                    last_student_id=last_id,
+                )
+                # SV vừa encode xong có thể nhận diện ngay ở request kế tiếp
+                face_gallery.invalidate()
+
+            status = "cancelled" if self._cancel.is_set() else "completed"
+            self._update(status=status, finished_at=datetime.now().isoformat())
+        except Exception as e:
+            logger.error(f"❌ Re-encode job failed: {e}")
+            db.rollback()
+            self._update(status="failed", error=str(e), finished_at=datetime.now().isoformat())
+        finally:
+            db.close()
+
+
+# Singleton instance
+reencode_job = ReencodeJob()
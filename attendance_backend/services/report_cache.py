@@ -0,0 +1,120 @@
+"""
+Cache kết quả /api/attendance/report trong process.
+
+Mỗi entry gắn phạm vi (session, tập lớp, ngày). Entry chỉ bị bỏ khi có ghi điểm danh /
+thay đổi danh sách SV / session chạm đúng phạm vi đó, nên lần xem lại trả về từ RAM mà vẫn khớp DB.
+Query đang chạy mà có invalidate xen giữa thì kết quả không được cache (so generation).
+
+Lưu ý: cache riêng từng process - chạy nhiều worker thì ghi ở worker khác không invalidate được,
+REPORT_CACHE_TTL là giới hạn độ trễ tối đa trong trường hợp đó (0 = tắt cache).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, FrozenSet, Hashable, Iterable, Optional, Tuple
+
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "60"))
+REPORT_CACHE_MAX = int(os.getenv("REPORT_CACHE_MAX", "256"))
+# Độ trễ đồng bộ tối đa của read replica (giây)
+REPORT_CACHE_REPLICA_LAG = float(os.getenv("REPORT_CACHE_REPLICA_LAG", "2"))
+
+
+@dataclass(frozen=True)
+class ReportScope:
+    session_id: Optional[int] = None
+    class_ids: Optional[FrozenSet[str]] = None  # None = mọi lớp
+    day: Optional[date] = None  # None = mọi ngày
+
+    def _has_class(self, class_id: Optional[str]) -> bool:
+        return self.class_ids is None or class_id is None or class_id in self.class_ids
+
+    def affected_by_write(self, session_id: Optional[int], class_id: Optional[str], day: date) -> bool:
+        if self.session_id is not None:
+            if session_id is not None and session_id == self.session_id:
+                return True
+            # Schema attendance_date: report session join theo (lớp, ngày của session)
+            return self._has_class(class_id) and self.day == day
+        return (self.day is None or self.day == day) and self._has_class(class_id)
+
+    def affected_by_roster(self, class_id: Optional[str]) -> bool:
+        return self._has_class(class_id)
+
+
+class ReportCache:
+    def __init__(self, ttl: float = REPORT_CACHE_TTL, max_entries: int = REPORT_CACHE_MAX):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, ReportScope, Any]]" = OrderedDict()
+        self._generation = 0
+        self._last_invalidation = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+
+    def generation(self) -> int:
+        """Lấy trước khi chạy query, truyền lại cho put()."""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(
+        self, key: Hashable, scope: ReportScope, value: Any, generation: int, settle_seconds: float = 0.0
+    ) -> None:
+        """settle_seconds: không cache nếu lần invalidate gần nhất chưa quá khoảng này (đọc từ replica)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            # Có ghi xen giữa lúc query => kết quả có thể đã cũ, không cache
+            if generation != self._generation:
+                return
+            if settle_seconds and time.monotonic() - self._last_invalidation < settle_seconds:
+                return
+            self._entries[key] = (time.monotonic() + self._ttl, scope, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _drop(self, predicate) -> None:
+        with self._lock:
+            self._generation += 1
+            self._last_invalidation = time.monotonic()
+            for key in [k for k, (_, scope, _) in self._entries.items() if predicate(scope)]:
+                del self._entries[key]
+
+    def invalidate_write(self, *, session_id: Optional[int], class_id: Optional[str], day: date) -> None:
+        """Sau khi ghi điểm danh cho (session, lớp, ngày)."""
+        self._drop(lambda scope: scope.affected_by_write(session_id, class_id, day))
+
+    def invalidate_classes(self, class_ids: Iterable[Optional[str]]) -> None:
+        """Danh sách SV / thông tin lớp thay đổi."""
+        targets = set(class_ids)
+        self._drop(lambda scope: any(scope.affected_by_roster(cid) for cid in targets))
+
+    def invalidate_session(self, session_id: int) -> None:
+        self._drop(lambda scope: scope.session_id == session_id)
+
+    def clear(self) -> None:
+        self._drop(lambda scope: True)
+
+
+# Singleton instance
+report_cache = ReportCache()
@@ -0,0 +1,214 @@
+"""
+Profiling theo yêu cầu cho 1 request (chỉ admin).
+
+Gửi header `X-Profile: <ADMIN_TOKEN>` với bất kỳ route nào (token chỉ nhận qua header để không lọt vào access log/history):
+- mặc định chạy cProfile trên thread event loop (handler async như checkin-by-face xử lý ảnh ngay trên thread này);
+- thêm `X-Profile-Mode: sample` (hoặc `__profile_mode=sample`) để lấy mẫu stack mọi thread mỗi PROFILE_SAMPLE_MS ms,
+  bao gồm cả code chạy trong threadpool (endpoint sync, truy vấn DB).
+Kết quả (collapsed stack, và bảng pstats với cProfile) lưu vào ring buffer PROFILE_KEEP bản,
+response có header X-Profile-Id để xem tại /api/admin/profiles/{id}.
+
+Mỗi lúc chỉ 1 request được profile, cách nhau ít nhất PROFILE_MIN_INTERVAL giây.
+Request khác chạy cùng lúc trên event loop / threadpool cũng có thể xuất hiện trong kết quả.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.admin_auth import is_admin_token
+
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_MIN_INTERVAL = float(os.getenv("PROFILE_MIN_INTERVAL", "5"))
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "5"))
+# Số dòng pstats giữ lại (sắp theo cumulative)
+PROFILE_STATS_LINES = 60
+
+# Thread đang chờ (idle) - bỏ qua khi lấy mẫu
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+@dataclass
+class ProfileRecord:
+    id: int
+    method: str
+    path: str
+    mode: str
+    started_at: datetime
+    duration_ms: float
+    status_code: Optional[int]
+    collapsed: str
+    stats: str = ""
+    samples: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "mode": self.mode,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "status_code": self.status_code,
+            "samples": self.samples,
+        }
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+class _StackSampler:
+    """Lấy mẫu stack mọi thread (trừ chính nó) bằng sys._current_frames()."""
+
+    def __init__(self, interval_ms: float):
+        self._interval = interval_ms / 1000.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self._interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def _cprofile_collapsed(profiler: cProfile.Profile) -> str:
+    """cProfile không giữ stack đầy đủ: xuất từng cặp caller;callee kèm thời gian cumulative (µs)."""
+    edges = []
+    for callee, (_, _, _, _, callers) in pstats.Stats(profiler).stats.items():
+        callee_label = f"{callee[2]} ({os.path.basename(callee[0])})"
+        for caller, (_, _, _, cumulative) in callers.items():
+            micros = int(cumulative * 1_000_000)
+            if micros:
+                edges.append((micros, f"{caller[2]} ({os.path.basename(caller[0])});{callee_label}"))
+    edges.sort(reverse=True)
+    return "\n".join(f"{stack} {micros}" for micros, stack in edges)
+
+
+class RequestProfiler:
+    def __init__(self, keep: int = PROFILE_KEEP, min_interval: float = PROFILE_MIN_INTERVAL):
+        self._records: "deque[ProfileRecord]" = deque(maxlen=keep)
+        self._min_interval = min_interval
+        self._lock = threading.Lock()
+        self._busy = False
+        self._last_started = 0.0
+        self._next_id = 1
+
+    def requested_mode(self, request) -> Optional[str]:
+        """cprofile / sample nếu request có token admin hợp lệ, ngược lại None."""
+        if not is_admin_token(request.headers.get("x-profile")):
+            return None
+        mode = request.headers.get("x-profile-mode") or request.query_params.get("__profile_mode") or "cprofile"
+        return "sample" if mode == "sample" else "cprofile"
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._busy or now - self._last_started < self._min_interval:
+                return False
+            self._busy = True
+            self._last_started = now
+            return True
+
+    def _release(self, record: ProfileRecord) -> None:
+        with self._lock:
+            record.id = self._next_id
+            self._next_id += 1
+            self._records.append(record)
+            self._busy = False
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [r.summary() for r in reversed(self._records)]
+
+    def get(self, profile_id: int) -> Optional[ProfileRecord]:
+        with self._lock:
+            return next((r for r in self._records if r.id == profile_id), None)
+
+    async def __call__(self, request, call_next: Callable[[Any], Awaitable[Any]]):
+        """Middleware HTTP: chạy request dưới profiler khi được yêu cầu."""
+        mode = self.requested_mode(request)
+        if mode is None:
+            return await call_next(request)
+        if not self._acquire():
+            response = await call_next(request)
+            response.headers["X-Profile"] = "rate-limited"
+            return response
+
+        started_at = datetime.now()
+        started = time.perf_counter()
+        profiler: Optional[cProfile.Profile] = None
+        sampler: Optional[_StackSampler] = None
+        if mode == "sample":
+            sampler = _StackSampler(PROFILE_SAMPLE_MS)
+            sampler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        response = None
+        try:
+            response = await call_next(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+
+            record = ProfileRecord(
+                id=0,
+                method=request.method,
+                path=request.url.path,
+                mode=mode,
+                started_at=started_at,
+                duration_ms=round((time.perf_counter() - started) * 1000, 2),
+                status_code=getattr(response, "status_code", None),
+                collapsed="",
+            )
+            if profiler is not None:
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_STATS_LINES)
+                record.stats = out.getvalue()
+                record.collapsed = _cprofile_collapsed(profiler)
+            else:
+                record.collapsed = sampler.collapsed()
+                record.samples = sampler.samples
+            self._release(record)
+
+        response.headers["X-Profile-Id"] = str(record.id)
+        return response
+
+
+# Singleton instance
+request_profiler = RequestProfiler()
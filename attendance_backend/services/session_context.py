@@ -0,0 +1,91 @@
+"""
+Cache ngữ cảnh điểm danh theo session (session_id -> SessionContext).
+
+Mỗi frame camera của cùng 1 session dùng lại: khung giờ, danh sách lớp,
+partition gallery của các lớp đó và tập SV đã điểm danh.
+Chỉ frame đầu tiên (hoặc sau khi hết TTL / bị invalidate) mới phải đọc DB.
+"""
+import os
+import threading
+import time as time_module
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Optional, Set
+
+from services.face_gallery import GalleryPartition, face_gallery
+
+# Thời gian sống của context (giây), có thể chỉnh qua .env
+SESSION_CONTEXT_TTL = float(os.getenv("SESSION_CONTEXT_TTL", "300"))
+
+# Cho phép trễ 15 phút so với start_time
+LATE_AFTER_MINUTES = 15
+
+
+@dataclass
+class SessionContext:
+    session_id: int
+    session_date: Optional[date]
+    start_time: Optional[time]
+    end_time: Optional[time]
+    # Lớp tham dự (rỗng = không giới hạn theo lớp)
+    class_ids: Set[str] = field(default_factory=set)
+    # SV đã điểm danh trong session -> status (khoá summary_status), để bỏ qua frame lặp lại
+    checked_in: Dict[str, Optional[str]] = field(default_factory=dict)
+    expires_at: float = 0.0
+    _partition: Optional[GalleryPartition] = None
+
+    @property
+    def late_after(self) -> Optional[datetime]:
+        if not self.session_date or not self.start_time:
+            return None
+        return datetime.combine(self.session_date, self.start_time) + timedelta(minutes=LATE_AFTER_MINUTES)
+
+    def status_for(self, checkin_at: datetime) -> str:
+        """ON_TIME nếu checkin <= start + 15 phút, ngược lại LATE."""
+        late_after = self.late_after
+        if late_after is None:
+            return "present"
+        return "ON_TIME" if checkin_at <= late_after else "LATE"
+
+    def partition(self) -> GalleryPartition:
+        """Partition gallery của các lớp trong session (làm mới khi gallery đổi version)."""
+        if self._partition is None or self._partition.version != face_gallery.version:
+            self._partition = face_gallery.partition(self.class_ids or None)
+        return self._partition
+
+
+class SessionContextCache:
+    def __init__(self, ttl: float = SESSION_CONTEXT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: Dict[int, SessionContext] = {}
+
+    def get_or_load(
+        self, session_id: int, loader: Callable[[int], Optional[SessionContext]]
+    ) -> Optional[SessionContext]:
+        """Lấy context từ cache, hết hạn thì gọi loader để đọc lại từ DB."""
+        now = time_module.monotonic()
+        with self._lock:
+            ctx = self._items.get(session_id)
+            if ctx is not None and ctx.expires_at > now:
+                return ctx
+
+        ctx = loader(session_id)
+        if ctx is None:
+            return None
+        ctx.expires_at = now + self.ttl
+        with self._lock:
+            self._items[session_id] = ctx
+        return ctx
+
+    def invalidate(self, session_id: Optional[int] = None) -> None:
+        """Xoá context của 1 session (hoặc toàn bộ nếu session_id=None)."""
+        with self._lock:
+            if session_id is None:
+                self._items.clear()
+            else:
+                self._items.pop(session_id, None)
+
+
+# Singleton instance
+session_contexts = SessionContextCache()
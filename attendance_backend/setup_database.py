@@ -55,7 +55,9 @@ def create_database_and_tables() -> None:
                     cur,
                     [
                         "SET FOREIGN_KEY_CHECKS = 0",
+                        "DROP TABLE IF EXISTS attendance_daily_summary",
                         "DROP TABLE IF EXISTS attendance",
+                        "DROP TABLE IF EXISTS face_encodings",
                         "DROP TABLE IF EXISTS session_classes",
                         "DROP TABLE IF EXISTS sessions",
                         "DROP TABLE IF EXISTS students",
@@ -101,6 +103,23 @@ def create_database_and_tables() -> None:
                 """
             )
 
+            # 2b) face_encodings (bảng hẹp chứa vector, nhiều version / SV)
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS face_encodings (
+                    student_id VARCHAR(20) NOT NULL,
+                    version VARCHAR(10) NOT NULL,
+                    dim INT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (student_id, version),
+                    INDEX idx_fe_version (version),
+                    CONSTRAINT fk_fe_student FOREIGN KEY (student_id)
+                        REFERENCES students(student_id) ON DELETE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                """
+            )
+
             # 3) sessions (đúng theo models/session_model.py)
             # Lưu class_id để tương thích legacy (class đầu tiên). Multi-class dùng session_classes.
             cur.execute(
@@ -158,6 +177,21 @@ def create_database_and_tables() -> None:
                 """
             )
 
+            # 6) attendance_daily_summary (tổng hợp theo lớp/ngày/status cho dashboard)
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS attendance_daily_summary (
+                    class_id VARCHAR(20) NOT NULL,
+                    summary_date DATE NOT NULL,
+                    status VARCHAR(10) NOT NULL,
+                    checkin_count INT NOT NULL DEFAULT 0,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (class_id, summary_date, status),
+                    INDEX idx_ads_date (summary_date)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                """
+            )
+
         print("✅ Đã tạo database + tables thành công")
     finally:
         conn.close()
@@ -0,0 +1,42 @@
+"""
+Fixture chung cho test: DB SQLite tạm + shim MySQL của benchmarks/sqlite_standin.
+
+Đặt TEST_MYSQL_URL (DB rỗng, dùng riêng cho test) để chạy thêm các test cần MySQL thật (khoá InnoDB).
+"""
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SQL_LOG_MODE", "off")
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from benchmarks.sqlite_standin import install_mysql_shim  # noqa: E402
+
+# text() trả DATETIME dạng chuỗi trên SQLite; đổi về datetime như pymysql
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"detect_types": sqlite3.PARSE_DECLTYPES, "check_same_thread": False},
+    )
+    install_mysql_shim(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def mysql_engine():
+    url = os.getenv("TEST_MYSQL_URL")
+    if not url:
+        pytest.skip("TEST_MYSQL_URL not set")
+    engine = create_engine(url, pool_size=4)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,189 @@
+"""Ghi attendance đồng thời: lượt check-in đầu của cùng SV không được tạo 2 dòng hay deadlock."""
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from routers import attendance_router
+from services.face_gallery import GalleryEntry
+
+STUDENT = GalleryEntry(student_id="SV0000001", name="Student", email=None, class_id="LT0001")
+
+SQLITE_DDL = [
+    """
+    CREATE TABLE attendance (
+        attendance_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id VARCHAR(20) NOT NULL,
+        session_id INTEGER,
+        checkin_time DATETIME NOT NULL,
+        status VARCHAR(10) NOT NULL,
+        checkin_day DATE GENERATED ALWAYS AS (CASE WHEN session_id IS NULL THEN date(checkin_time) END) VIRTUAL
+    )
+    """,
+    "CREATE UNIQUE INDEX uq_att_student_session ON attendance (student_id, session_id)",
+    "CREATE UNIQUE INDEX uq_att_student_day ON attendance (student_id, checkin_day)",
+    """
+    CREATE TABLE attendance_daily_summary (
+        class_id VARCHAR(20), summary_date DATE, status VARCHAR(10),
+        checkin_count INTEGER NOT NULL DEFAULT 0, updated_at DATETIME,
+        PRIMARY KEY (class_id, summary_date, status)
+    )
+    """,
+]
+
+MYSQL_DDL = [
+    "DROP TABLE IF EXISTS attendance",
+    "DROP TABLE IF EXISTS attendance_daily_summary",
+    """
+    CREATE TABLE attendance (
+        attendance_id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id VARCHAR(20) NOT NULL,
+        session_id INT NULL,
+        checkin_time DATETIME NOT NULL,
+        status VARCHAR(10) NOT NULL,
+        checkin_day DATE GENERATED ALWAYS AS (IF(session_id IS NULL, DATE(checkin_time), NULL)) STORED,
+        UNIQUE KEY uq_att_student_session (student_id, session_id),
+        UNIQUE KEY uq_att_student_day (student_id, checkin_day)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE attendance_daily_summary (
+        class_id VARCHAR(20), summary_date DATE, status VARCHAR(10),
+        checkin_count INT NOT NULL DEFAULT 0, updated_at DATETIME,
+        PRIMARY KEY (class_id, summary_date, status)
+    ) ENGINE=InnoDB
+    """,
+]
+
+
+def _prepare(engine, ddl, monkeypatch):
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+    # Cache schema ở mức module: probe lại trên DB test
+    monkeypatch.setattr(attendance_router, "_attendance_columns", None)
+    monkeypatch.setattr(attendance_router, "_attendance_unique_keys", None)
+    monkeypatch.setattr(attendance_router, "_after_attendance_write", lambda *args: None)
+    return sessionmaker(bind=engine)
+
+
+def _checkin(factory, *, session_id, status, at):
+    db = factory()
+    try:
+        return attendance_router._upsert_attendance_compatible(
+            db,
+            student=STUDENT,
+            session_id=session_id,
+            class_id=None,
+            checkin_at=at,
+            status=status,
+            confidence=0.9,
+        )
+    finally:
+        db.close()
+
+
+def _concurrent_first_checkins(factory, *, session_id, workers=2):
+    barrier = threading.Barrier(workers)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(_checkin(factory, session_id=session_id, status="ON_TIME", at=datetime(2024, 3, 4, 8, 0)))
+        except Exception as exc:  # noqa: BLE001 - gom lỗi để assert ở thread chính
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def _rows(engine):
+    with engine.connect() as conn:
+        attendance = conn.execute(text("SELECT attendance_id, status FROM attendance")).fetchall()
+        summary = conn.execute(
+            text("SELECT status, checkin_count FROM attendance_daily_summary WHERE checkin_count > 0")
+        ).fetchall()
+    return attendance, sorted(tuple(r) for r in summary)
+
+
+@pytest.mark.parametrize("session_id", [7, None])
+def test_concurrent_first_checkins_create_one_row(sqlite_engine, monkeypatch, session_id):
+    factory = _prepare(sqlite_engine, SQLITE_DDL, monkeypatch)
+
+    results, errors = _concurrent_first_checkins(factory, session_id=session_id)
+
+    assert errors == []
+    attendance, summary = _rows(sqlite_engine)
+    assert len(attendance) == 1
+    assert sorted(results) == [(attendance[0][0], False), (attendance[0][0], True)]
+    assert summary == [("ON_TIME", 1)]
+
+
+def test_recheckin_updates_status_and_summary(sqlite_engine, monkeypatch):
+    factory = _prepare(sqlite_engine, SQLITE_DDL, monkeypatch)
+
+    first = _checkin(factory, session_id=7, status="ON_TIME", at=datetime(2024, 3, 4, 8, 0))
+    second = _checkin(factory, session_id=7, status="LATE", at=datetime(2024, 3, 4, 8, 20))
+
+    attendance, summary = _rows(sqlite_engine)
+    assert first == (attendance[0][0], True)
+    assert second == (attendance[0][0], False)
+    assert attendance[0][1] == "LATE"
+    assert summary == [("LATE", 1)]
+
+
+@pytest.mark.parametrize("session_id", [7, None])
+def test_concurrent_first_checkins_mysql(mysql_engine, monkeypatch, session_id):
+    factory = _prepare(mysql_engine, MYSQL_DDL, monkeypatch)
+
+    results, errors = _concurrent_first_checkins(factory, session_id=session_id, workers=8)
+
+    assert errors == []
+    attendance, summary = _rows(mysql_engine)
+    assert len(attendance) == 1
+    assert {attendance_id for attendance_id, _ in results} == {attendance[0][0]}
+    assert sum(created for _, created in results) == 1
+    assert summary == [("ON_TIME", 1)]
+
+
+def _prepare_date_schema(engine, monkeypatch):
+    from benchmarks.sqlite_standin import create_schema
+
+    create_schema(engine)
+    return _prepare(engine, [], monkeypatch)
+
+
+def test_date_schema_concurrent_first_checkins_create_one_row(sqlite_engine, monkeypatch):
+    factory = _prepare_date_schema(sqlite_engine, monkeypatch)
+
+    results, errors = _concurrent_first_checkins(factory, session_id=None)
+
+    assert errors == []
+    with sqlite_engine.connect() as conn:
+        ids = [r[0] for r in conn.execute(text("SELECT id FROM attendance"))]
+        summary = conn.execute(text("SELECT status, checkin_count FROM attendance_daily_summary")).fetchall()
+    assert len(ids) == 1
+    assert sorted(results) == [(ids[0], False), (ids[0], True)]
+    assert [tuple(r) for r in summary] == [("ON_TIME", 1)]
+
+
+def test_date_schema_recheckin_moves_summary(sqlite_engine, monkeypatch):
+    factory = _prepare_date_schema(sqlite_engine, monkeypatch)
+
+    _checkin(factory, session_id=None, status="ON_TIME", at=datetime(2024, 3, 4, 8, 0))
+    _checkin(factory, session_id=None, status="LATE", at=datetime(2024, 3, 4, 8, 20))
+
+    with sqlite_engine.connect() as conn:
+        statuses = [r[0] for r in conn.execute(text("SELECT status FROM attendance"))]
+        summary = conn.execute(
+            text("SELECT status, checkin_count FROM attendance_daily_summary WHERE checkin_count > 0")
+        ).fetchall()
+    assert statuses == ["late"]
+    assert [tuple(r) for r in summary] == [("LATE", 1)]
@@ -0,0 +1,79 @@
+"""Import CSV/NDJSON: file thiếu cột không được xoá dữ liệu cũ của các cột đó."""
+import io
+
+from fastapi import UploadFile
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from models.student import Student
+from schemas.student_schema import StudentCreate
+from services.bulk_import import import_records, timestamp_values
+
+COLUMNS = ["student_id", "name", "email", "phone", "class_id"]
+
+
+def _import(db, content: str, filename: str):
+    upload = UploadFile(file=io.BytesIO(content.encode("utf-8")), filename=filename)
+    return import_records(
+        db,
+        upload,
+        fmt=None,
+        schema=StudentCreate,
+        table="students",
+        key="student_id",
+        columns=COLUMNS,
+        extra_values=timestamp_values(),
+        insert_only=["created_at"],
+    )
+
+
+def _students(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT student_id, name, email, phone, class_id FROM students ORDER BY student_id"))
+        return [tuple(r) for r in rows]
+
+
+def _session(engine):
+    # Không bật FK của SQLite: chỉ cần bảng students
+    Student.__table__.create(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_partial_csv_reimport_keeps_missing_columns(sqlite_engine):
+    db = _session(sqlite_engine)
+
+    full = _import(
+        db,
+        "student_id,name,email,phone,class_id\n"
+        "SV01,An,an@example.edu,0901,LT01\n"
+        "SV02,Binh,binh@example.edu,0902,LT01\n",
+        "students.csv",
+    )
+    partial = _import(db, "student_id,name\nSV01,An Nguyen\nSV03,Chi\n", "students.csv")
+    db.close()
+
+    assert (full["inserted"], partial["inserted"], partial["updated"], partial["invalid"]) == (2, 1, 1, 0)
+    assert _students(sqlite_engine) == [
+        ("SV01", "An Nguyen", "an@example.edu", "0901", "LT01"),
+        ("SV02", "Binh", "binh@example.edu", "0902", "LT01"),
+        ("SV03", "Chi", None, None, None),
+    ]
+
+
+def test_ndjson_rows_only_write_their_own_keys(sqlite_engine):
+    db = _session(sqlite_engine)
+
+    _import(db, '{"student_id": "SV01", "name": "An", "email": "an@example.edu", "phone": "0901"}\n', "s.ndjson")
+    result = _import(
+        db,
+        '{"student_id": "SV01", "name": "An", "class_id": "LT02"}\n'
+        '{"student_id": "SV02", "name": "Binh", "phone": null}\n',
+        "s.ndjson",
+    )
+    db.close()
+
+    assert (result["inserted"], result["updated"], result["invalid"]) == (1, 1, 0)
+    assert _students(sqlite_engine) == [
+        ("SV01", "An", "an@example.edu", "0901", "LT02"),
+        ("SV02", "Binh", None, None, None),
+    ]